@@ -0,0 +1,4 @@
+"""Benchmarks do pipeline de currículos (validações, conversa e geração do PDF).
+
+Uso: python -m benchmarks --saida resultados.json [--baseline anterior.json --limite 0.15]
+"""
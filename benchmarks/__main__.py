@@ -0,0 +1,380 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import timeit
+from types import SimpleNamespace
+
+from telegram.ext import ApplicationBuilder
+
+import bot_curriculo
+import formatos
+import layout_cv
+import pdf_cv
+from modelo import Curriculo, Experiencia
+from pool_render import PoolAquecido
+from benchmarks.perfis import ficha_texto, gerar_perfil, roteiro_conversa
+from benchmarks.telegram_falso import TOKEN_FALSO, TelegramFalso, update_botao, update_documento, update_texto
+
+# --- Execução dos benchmarks ---
+# Cada métrica tem um sentido ("menor" ou "maior" é melhor) usado na checagem de regressão.
+
+ENTRADAS_VALIDACAO = {
+    'validar_texto': ("Maria da Silva", "Ana"),
+    'validar_email': ("maria.silva@exemplo.com.br", "maria@@exemplo"),
+    'validar_telefone': ("11987654321", "1198x"),
+    'validar_ano': ("2020", "20a0"),
+    'validar_ano_ou_cursando': ("Cursando", "1899"),
+    'validar_nivel_idioma': ("i", "x"),
+    'validar_mes_ano': ("03/2021", "13/2021"),
+}
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+def bench_validacoes(metricas, repeticoes=20000):
+    for nome, entradas in ENTRADAS_VALIDACAO.items():
+        func = getattr(bot_curriculo, nome)
+        total = min(timeit.repeat(lambda: [func(e) for e in entradas], number=repeticoes, repeat=3))
+        metricas[f"{nome}_ns"] = (total / (repeticoes * len(entradas)) * 1e9, "ns", "menor")
+
+async def _bench_handler_conversa(repeticoes):
+    async def reply_text(*args, **kwargs):
+        pass
+
+    # Resposta de texto livre dentro de uma repetição (cargo da experiência atual)
+    user_data = {'cv': Curriculo(experiencias=[Experiencia(empresa="Empresa de Teste Ltda")]),
+                 'current_state': bot_curriculo.CARGO}
+    context = SimpleNamespace(user_data=user_data)
+    update = SimpleNamespace(message=SimpleNamespace(text="  Analista de Sistemas  ", reply_text=reply_text))
+    handler = bot_curriculo.HANDLERS[bot_curriculo.CARGO]
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        await handler(update, context)
+    return (time.perf_counter() - inicio) / repeticoes
+
+def bench_handler_conversa(metricas, repeticoes=20000):
+    metricas["handler_conversa_us"] = (asyncio.run(_bench_handler_conversa(repeticoes)) * 1e6, "us", "menor")
+
+# Nomes fora do recorte latino da fonte: o PDF embute um recorte da fonte inteira
+NOMES_UNICODE = ("Иван Петров", "Ελένη Παπαδοπούλου", "Łukasz Wróbel", "Nguyễn Thị Hương")
+
+def bench_gerar_pdf(metricas, perfis):
+    # A fonte é lida uma vez por processo (nos workers, antes do primeiro pedido)
+    inicio = time.perf_counter()
+    pdf_cv.preparar_fontes()
+    metricas["fonte_carga_ms"] = ((time.perf_counter() - inicio) * 1000, "ms", "menor")
+
+    tempos, tamanhos = [], []
+    for cv in map(Curriculo.de_dict, perfis):
+        inicio = time.perf_counter()
+        pdf_bytes = pdf_cv.gerar_pdf(cv).output()
+        tempos.append(time.perf_counter() - inicio)
+        tamanhos.append(len(pdf_bytes))
+    media = statistics.mean(tempos)
+    metricas["gerar_pdf_media_ms"] = (media * 1000, "ms", "menor")
+    metricas["gerar_pdf_p95_ms"] = (_percentil(tempos, 0.95) * 1000, "ms", "menor")
+    metricas["cvs_por_segundo_por_core"] = (1 / media, "cv/s", "maior")
+    metricas["pdf_tamanho_medio_bytes"] = (statistics.mean(tamanhos), "bytes", "menor")
+
+    # Edição de um campo: só a seção de dados pessoais é refeita, as outras vêm do cache de layout
+    tempos = []
+    for data in perfis[:20]:
+        cv = Curriculo.de_dict(dict(data, telefone="11900000000"))
+        inicio = time.perf_counter()
+        pdf_cv.gerar_pdf(cv).output()
+        tempos.append(time.perf_counter() - inicio)
+    metricas["gerar_pdf_edicao_media_ms"] = (statistics.mean(tempos) * 1000, "ms", "menor")
+
+    pdf_cv._secoes_dispostas.clear()
+    tempos = []
+    for n, data in enumerate(perfis[:20]):
+        cv = Curriculo.de_dict(dict(data, nome=NOMES_UNICODE[n % len(NOMES_UNICODE)]))
+        inicio = time.perf_counter()
+        pdf_cv.gerar_pdf(cv).output()
+        tempos.append(time.perf_counter() - inicio)
+    metricas["gerar_pdf_unicode_media_ms"] = (statistics.mean(tempos) * 1000, "ms", "menor")
+
+def bench_perfis_saida(metricas, perfis):
+    # Mesmos currículos em cada perfil de saída: CPU do render contra bytes do upload
+    familia = pdf_cv.familia_pdf()
+    cvs = [Curriculo.de_dict(data) for data in perfis]
+    for nome, perfil in layout_cv.PERFIS_SAIDA.items():
+        if familia is not None:
+            familia.aquecer(perfil.hinting)
+        pdf_cv._secoes_dispostas.clear()  # render completo em todos os perfis
+        tempos, tamanhos = [], []
+        for cv in cvs:
+            inicio = time.perf_counter()
+            pdf_bytes = pdf_cv.gerar_pdf(cv, perfil).output()
+            tempos.append(time.perf_counter() - inicio)
+            tamanhos.append(len(pdf_bytes))
+        metricas[f"pdf_{nome}_media_ms"] = (statistics.mean(tempos) * 1000, "ms", "menor")
+        metricas[f"pdf_{nome}_tamanho_medio_bytes"] = (statistics.mean(tamanhos), "bytes", "menor")
+
+def _contexto_frio():
+    # Processos filhos de um forkserver que só importou o bot, como os do bot em produção (que
+    # nunca renderiza): sem herdar as fontes, glifos e layouts que este processo já aqueceu
+    contexto = multiprocessing.get_context("forkserver")
+    contexto.set_forkserver_preload(["bot_curriculo"])
+    processo = contexto.Process(target=int)  # sobe o forkserver fora da medida
+    processo.start()
+    processo.join()
+    return contexto
+
+async def _render_pool(perfis, max_pdfs=0):
+    pool = bot_curriculo.RenderPool(workers=1, contexto=_contexto_frio())
+    pool.processos.max_tarefas = max_pdfs
+    inicio = time.perf_counter()
+    pool.iniciar()
+    await pool.processos.aguardar_prontos()
+    aquecimento = time.perf_counter() - inicio
+    tempos = []
+    try:
+        for cv in map(Curriculo.de_dict, perfis):
+            # Com max_pdfs=1, cada PDF sai de um processo novo: espera o substituto aquecer
+            await pool.processos.aguardar_prontos()
+            inicio = time.perf_counter()
+            await pool.renderizar(cv)
+            tempos.append(time.perf_counter() - inicio)
+    finally:
+        pool.shutdown()
+    return aquecimento, tempos
+
+async def _edicao_pool(perfis, afinidade):
+    # Cada usuário gera o PDF e depois edita um campo; o tempo é o do PDF editado, pelo pool
+    pool = bot_curriculo.RenderPool(workers=2, contexto=_contexto_frio())
+    pool.iniciar()
+    await pool.processos.aguardar_prontos()
+    tempos = []
+    try:
+        for user_id, data in enumerate(perfis, 1):
+            await pool.renderizar(Curriculo.de_dict(data), user_id if afinidade else None)
+            inicio = time.perf_counter()
+            await pool.renderizar(Curriculo.de_dict(dict(data, telefone="11900000000")),
+                                  user_id if afinidade else None)
+            tempos.append(time.perf_counter() - inicio)
+    finally:
+        pool.shutdown()
+    return tempos
+
+async def _pai_grande(max_rss_mb, tarefas):
+    # O bot com o heap acima do limite (cache de PDFs, sessões): os processos herdam esse heap
+    # pelo fork e só podem ser trocados pelo que cresceram depois do aquecimento
+    lastro = b"\x01" * ((max_rss_mb + 64) * 1024 * 1024)
+    pool = PoolAquecido(1, len, None, 0, max_rss_mb, multiprocessing.get_context("fork"))
+    pool.iniciar()
+    try:
+        await pool.aguardar_prontos()
+        for _ in range(tarefas):
+            await pool.executar("x")
+    finally:
+        pool.shutdown()
+    del lastro
+    return pool.estatisticas
+
+def bench_render_pool(metricas, perfis):
+    # Os mesmos currículos num processo de vida longa e, um a um, em processos recém-aquecidos:
+    # o primeiro PDF de um processo deve custar o mesmo que os seguintes
+    aquecimento, tempos = asyncio.run(_render_pool(perfis))
+    _, tempos_novos = asyncio.run(_render_pool(perfis, max_pdfs=1))
+    metricas["render_pool_aquecimento_ms"] = (aquecimento * 1000, "ms", "menor")
+    metricas["render_pool_pdf_mediana_ms"] = (statistics.median(tempos) * 1000, "ms", "menor")
+    metricas["render_pool_processo_novo_mediana_ms"] = (statistics.median(tempos_novos) * 1000, "ms", "menor")
+    # Pai acima de RENDER_MAX_RSS_MB: nenhuma tarefa deve trocar o processo por memória
+    estatisticas = asyncio.run(_pai_grande(bot_curriculo.RENDER_MAX_RSS_MB or 256, 20))
+    if estatisticas['reciclados_rss']:
+        raise RuntimeError(f"Processos trocados pela memória herdada do pai: {estatisticas}")
+    metricas["render_pool_pai_grande_reciclados"] = (estatisticas['reciclados_rss'], "processos", "menor")
+    # Edição pelo pool de 2 processos: com afinidade o PDF editado cai no processo com o layout em cache
+    metricas["render_pool_edicao_afinidade_mediana_ms"] = (statistics.median(asyncio.run(_edicao_pool(perfis, True))) * 1000, "ms", "menor")
+    metricas["render_pool_edicao_sem_afinidade_mediana_ms"] = (statistics.median(asyncio.run(_edicao_pool(perfis, False))) * 1000, "ms", "menor")
+
+async def _formatos(perfis, formatos):
+    # Com um worker por formato: todos de uma vez contra um formato por pedido, em sequência
+    pool = bot_curriculo.RenderPool(workers=len(formatos))
+    pool.iniciar()
+    await pool.processos.aguardar_prontos()
+    paralelo, serial = [], []
+    try:
+        for cv in map(Curriculo.de_dict, perfis):
+            inicio = time.perf_counter()
+            await pool.renderizar_formatos(cv, formatos)
+            paralelo.append(time.perf_counter() - inicio)
+            inicio = time.perf_counter()
+            for formato in formatos:
+                await pool.renderizar_formatos(cv, (formato,))
+            serial.append(time.perf_counter() - inicio)
+    finally:
+        pool.shutdown()
+    return paralelo, serial
+
+def bench_formatos(metricas, perfis):
+    # O documento do currículo e o custo de cada formato a partir dele, no próprio processo
+    documentos = [layout_cv.documento_cv(Curriculo.de_dict(data)) for data in perfis]
+    for nome in formatos.FORMATOS_SAIDA:
+        tempos = []
+        for documento in documentos:
+            inicio = time.perf_counter()
+            formatos.renderizar(nome, documento)
+            tempos.append(time.perf_counter() - inicio)
+        metricas[f"formato_{nome}_media_ms"] = (statistics.mean(tempos) * 1000, "ms", "menor")
+    paralelo, serial = asyncio.run(_formatos(perfis, tuple(formatos.FORMATOS_SAIDA)))
+    metricas["formatos_todos_paralelo_mediana_ms"] = (statistics.median(paralelo) * 1000, "ms", "menor")
+    metricas["formatos_todos_serial_mediana_ms"] = (statistics.median(serial) * 1000, "ms", "menor")
+
+async def _replay_conversas(perfis, botoes=False):
+    telegram = TelegramFalso()
+    # Sem a fila de envio: o replay mede o custo do bot, não os limites de taxa do Telegram
+    application = bot_curriculo.criar_aplicacao(TOKEN_FALSO, ApplicationBuilder().updater(None), request=telegram,
+                                                limitar_envio=False)
+    await application.initialize()
+    latencias = []
+    try:
+        for user_id, data in enumerate(perfis, 1):
+            for texto in roteiro_conversa(data):
+                update = update_texto(application.bot, user_id, texto)
+                if botoes:
+                    # Respostas de Escolha vão pelo botão do teclado inline, como um usuário tocando nele
+                    estado = application.user_data.get(user_id, {}).get('current_state')
+                    passo = bot_curriculo.PASSOS.get(estado)
+                    if passo is not None and passo.botoes and texto.upper() in passo.botoes:
+                        update = update_botao(application.bot, user_id, f"{estado}:{texto.upper()}")
+                inicio = time.perf_counter()
+                await application.process_update(update)
+                latencias.append(time.perf_counter() - inicio)
+    finally:
+        await application.shutdown()
+        bot_curriculo.render_pool.shutdown()
+    return telegram, latencias
+
+def bench_conversas(metricas, perfis):
+    inicio = time.perf_counter()
+    telegram, latencias = asyncio.run(_replay_conversas(perfis))
+    total = time.perf_counter() - inicio
+    enviados = telegram.chamadas.get("sendDocument", 0)
+    if enviados != len(perfis):
+        raise RuntimeError(f"Replay incompleto: {enviados} de {len(perfis)} PDFs enviados")
+    metricas["conversa_update_media_ms"] = (statistics.mean(latencias) * 1000, "ms", "menor")
+    metricas["conversa_update_p99_ms"] = (_percentil(latencias, 0.99) * 1000, "ms", "menor")
+    metricas["conversa_updates_por_segundo"] = (len(latencias) / total, "updates/s", "maior")
+    metricas["conversa_chamadas_api_por_cv"] = (sum(telegram.chamadas.values()) / len(perfis), "chamadas", "menor")
+    metricas["conversa_mensagens_por_cv"] = (telegram.chamadas.get("sendMessage", 0) / len(perfis), "mensagens", "menor")
+
+    # As mesmas conversas com as Escolhas respondidas pelos botões (a pergunta seguinte edita a mensagem)
+    telegram, latencias = asyncio.run(_replay_conversas(perfis, botoes=True))
+    enviados = telegram.chamadas.get("sendDocument", 0)
+    if enviados != len(perfis):
+        raise RuntimeError(f"Replay com botões incompleto: {enviados} de {len(perfis)} PDFs enviados")
+    metricas["conversa_botoes_update_media_ms"] = (statistics.mean(latencias) * 1000, "ms", "menor")
+    metricas["conversa_botoes_mensagens_por_cv"] = (telegram.chamadas.get("sendMessage", 0) / len(perfis), "mensagens", "menor")
+    metricas["conversa_botoes_chamadas_api_por_cv"] = (sum(telegram.chamadas.values()) / len(perfis), "chamadas", "menor")
+
+async def _replay_fichas(perfis):
+    telegram = TelegramFalso()
+    application = bot_curriculo.criar_aplicacao(TOKEN_FALSO, ApplicationBuilder().updater(None), request=telegram,
+                                                limitar_envio=False)
+    await application.initialize()
+    latencias = []
+    try:
+        for user_id, data in enumerate(perfis, 1):
+            # Metade por /rapido, metade como arquivo .txt (getFile + download)
+            if user_id % 2:
+                update = update_texto(application.bot, user_id, "/rapido\n" + ficha_texto(data))
+            else:
+                update = update_documento(application.bot, telegram, user_id, "ficha.txt", ficha_texto(data).encode())
+            inicio = time.perf_counter()
+            await application.process_update(update)
+            latencias.append(time.perf_counter() - inicio)
+    finally:
+        await application.shutdown()
+        bot_curriculo.render_pool.shutdown()
+    return telegram, latencias
+
+def bench_fichas(metricas, perfis):
+    telegram, latencias = asyncio.run(_replay_fichas(perfis))
+    enviados = telegram.chamadas.get("sendDocument", 0)
+    if enviados != len(perfis):
+        raise RuntimeError(f"Fichas incompletas: {enviados} de {len(perfis)} PDFs enviados")
+    metricas["ficha_update_media_ms"] = (statistics.mean(latencias) * 1000, "ms", "menor")
+    metricas["ficha_chamadas_api_por_cv"] = (sum(telegram.chamadas.values()) / len(perfis), "chamadas", "menor")
+
+def pico_rss_mb():
+    proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return max(proprio, filhos) / divisor
+
+def checar_regressao(metricas, baseline, limite):
+    regressoes = []
+    for nome, anterior in baseline.get("metricas", {}).items():
+        atual = metricas.get(nome)
+        if atual is None or not anterior["valor"]:
+            continue
+        variacao = atual["valor"] / anterior["valor"] - 1
+        if atual["melhor"] == "maior":
+            variacao = -variacao
+        if variacao > limite:
+            regressoes.append((nome, anterior["valor"], atual["valor"], variacao))
+    return regressoes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks do bot de currículos.")
+    parser.add_argument("--perfis", type=int, default=100, help="Perfis sintéticos para o gerar_pdf")
+    parser.add_argument("--conversas", type=int, default=20, help="Conversas completas reproduzidas")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--saida", default="bench_output.json")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--limite", type=float, default=0.15, help="Piora relativa tolerada (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    metricas = {}
+    bench_validacoes(metricas)
+    bench_handler_conversa(metricas)
+    bench_gerar_pdf(metricas, [gerar_perfil(args.seed + i) for i in range(args.perfis)])
+    bench_perfis_saida(metricas, [gerar_perfil(args.seed + i) for i in range(min(args.perfis, 30))])
+    bench_render_pool(metricas, [gerar_perfil(args.seed + 30_000 + i) for i in range(min(args.perfis, 20))])
+    bench_formatos(metricas, [gerar_perfil(args.seed + 40_000 + i) for i in range(min(args.perfis, 20))])
+    bench_conversas(metricas, [gerar_perfil(args.seed + 10_000 + i, max_exp=5) for i in range(args.conversas)])
+    bench_fichas(metricas, [gerar_perfil(args.seed + 20_000 + i, max_exp=5) for i in range(args.conversas)])
+    metricas["pico_rss_mb"] = (pico_rss_mb(), "MB", "menor")
+
+    resultado = {
+        "meta": {
+            "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "perfis": args.perfis,
+            "conversas": args.conversas,
+        },
+        "metricas": {nome: {"valor": round(valor, 4), "unidade": unidade, "melhor": melhor}
+                     for nome, (valor, unidade, melhor) in metricas.items()},
+    }
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    for nome, m in resultado["metricas"].items():
+        print(f"{nome:32} {m['valor']:>14,.4f} {m['unidade']}")
+    print(f"Resultados gravados em {args.saida}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressoes = checar_regressao(resultado["metricas"], json.load(f), args.limite)
+        for nome, anterior, atual, variacao in regressoes:
+            print(f"❌ Regressão em {nome}: {anterior} -> {atual} ({variacao:+.1%})")
+        if regressoes:
+            return 1
+        print("✅ Nenhuma regressão acima do limite.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Boot a frio do bot: as fases do boot em processos novos, contra um orçamento de tempo.
+
+Uso: python -m benchmarks.boot --rodadas 5 --orcamento-ms 1500
+
+Cada rodada sobe um interpretador novo que importa o bot, constrói a Application do modo
+polling (com o TelegramFalso no lugar da API) e a inicia como o main(), até o primeiro
+getUpdates. O tempo de cada fase vem da linha do tempo do boot do próprio bot; o total é
+medido aqui, do início do processo até o getUpdates, e inclui a partida do interpretador.
+Sai com código 1 se a mediana do total passar do orçamento: é o teste de regressão do boot.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# O processo do boot não abre a porta de métricas nem grava persistência ou sessões
+AMBIENTE = dict(METRICS_PORT="0", PERSISTENCE_URL="", SESSAO_DIR="")
+
+async def _boot():
+    # O bot é o primeiro import do processo: a fase 'imports' inclui o telegram, como no main()
+    import bot_curriculo
+    from benchmarks.telegram_falso import TOKEN_FALSO, TelegramFalso
+
+    telegram = TelegramFalso()
+    application = bot_curriculo.criar_aplicacao(TOKEN_FALSO, bot_curriculo.criar_builder_polling(telegram),
+                                                request=telegram)
+    # A sequência do run_polling
+    await application.initialize()
+    await application.post_init(application)
+    await application.updater.start_polling()
+    await application.start()
+    while 'primeiro_getupdates' not in bot_curriculo.boot.fases:
+        await asyncio.sleep(0.001)
+    print(json.dumps(bot_curriculo.boot.fases), flush=True)
+
+    await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
+    await application.post_shutdown(application)
+
+def rodar_boot():
+    """Um boot a frio; devolve (segundos até o primeiro getUpdates, fases do boot em segundos)."""
+    inicio = time.perf_counter()
+    processo = subprocess.Popen([sys.executable, "-m", "benchmarks.boot", "--filho"], stdout=subprocess.PIPE,
+                                env=dict(os.environ, **AMBIENTE), text=True)
+    linha = processo.stdout.readline()
+    total = time.perf_counter() - inicio
+    processo.communicate()
+    if processo.returncode or not linha:
+        raise RuntimeError(f"O boot falhou (código {processo.returncode})")
+    fases = json.loads(linha)
+    # O que o bot não vê: partida do interpretador e o import do próprio benchmark
+    return total, dict(interpretador=total - sum(fases.values()), **fases)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.boot", description=__doc__.splitlines()[0])
+    parser.add_argument("--rodadas", type=int, default=5, help="Boots a frio (vale a mediana)")
+    parser.add_argument("--orcamento-ms", type=float, default=float(os.getenv("BOOT_ORCAMENTO_MS", "1500")),
+                        help="Tempo máximo até o primeiro getUpdates (0 = não checa)")
+    parser.add_argument("--saida", default="boot_output.json")
+    parser.add_argument("--filho", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.filho:
+        asyncio.run(_boot())
+        return 0
+
+    totais, fases = [], {}
+    for _ in range(args.rodadas):
+        total, rodada = rodar_boot()
+        totais.append(total)
+        for fase, segundos in rodada.items():
+            fases.setdefault(fase, []).append(segundos)
+    mediana = statistics.median(totais) * 1000
+    medianas = {fase: statistics.median(valores) * 1000 for fase, valores in fases.items()}
+    for fase, ms in medianas.items():
+        print(f"{fase:20} {ms:>9.1f} ms")
+    print(f"{'total':20} {mediana:>9.1f} ms (mediana de {args.rodadas}; mín {min(totais) * 1000:.1f} ms)")
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump({"parametros": vars(args), "total_ms": mediana, "fases_ms": medianas,
+                   "totais_ms": [t * 1000 for t in totais]}, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.saida}")
+
+    if args.orcamento_ms and mediana > args.orcamento_ms:
+        print(f"❌ Boot a frio acima do orçamento: {mediana:.1f} ms > {args.orcamento_ms:.0f} ms")
+        return 1
+    if args.orcamento_ms:
+        print(f"✅ Boot a frio dentro do orçamento ({args.orcamento_ms:.0f} ms).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""Gerador de carga offline: milhares de usuários simulados conversando com o bot ao mesmo tempo.
+
+Uso: python -m benchmarks.carga --niveis 50,200,1000,2000 --duracao 20 --pensar 3 --escala 0.05
+
+Cada usuário simulado percorre o roteiro de um perfil sintético, esperando a resposta do bot e
+um tempo de "digitação" (exponencial, média --pensar segundos, multiplicada por --escala) antes de
+cada mensagem. Os updates passam pela update_queue da Application real criada por
+criar_aplicacao(), com a API do Telegram substituída pelo TelegramFalso.
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder, TypeHandler
+
+import bot_curriculo
+from benchmarks.perfis import gerar_perfil, roteiro_conversa
+from benchmarks.telegram_falso import TOKEN_FALSO, TelegramFalso, update_texto
+
+ESTADOS = (
+    "ESCOLHA", "NOME", "IDADE", "ESTADO_CIVIL", "TELEFONE", "EMAIL", "FORMA_2GRAU", "ANO_2GRAU",
+    "ASK_QTD_GRAD", "ASK_FACULDADE", "ASK_CURSO", "ASK_SITUACAO", "ASK_ANO_GRAD",
+    "ASK_QTD_POS", "ASK_POS_FACULDADE", "ASK_POS_CURSO", "ASK_POS_SITUACAO", "ASK_POS_ANO",
+    "ADD_ACADEMIC_ITEM", "TIPO_CONTRATO", "EMPRESA", "CARGO", "ADM", "DEM", "ATIVIDADES",
+    "RESULTADOS", "ADD_EMP", "MEI_TRABALHOS", "IDIOMAS_SIM", "ASK_IDIOMA_INST", "ASK_IDIOMA_NOME",
+    "ASK_IDIOMA_NIVEL", "ASK_IDIOMA_INI", "ASK_IDIOMA_FIM", "ADD_IDIOMA", "CURSOS",
+)
+NOME_ESTADO = {getattr(bot_curriculo, nome): nome for nome in ESTADOS}
+
+# Flood limit da API falsa com --limitador (envios por janela de 1 s)
+LIMITE_API_GLOBAL = 30
+LIMITE_API_CHAT = 4
+
+# Limites superiores (ms) dos baldes do histograma de latência
+BALDES_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+def rss_atual_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Medidor:
+    """Registra, via TypeHandlers antes e depois do ConversationHandler, a latência por estado."""
+
+    def __init__(self):
+        self.inicio_handler = {}
+        self.enfileirado = {}
+        self.pendentes = {}
+        self.estado_do_update = {}
+        self.latencias = {}  # estado -> [segundos]
+        self.ponta_a_ponta = []
+        self.processados = 0
+
+    def registrar(self, application):
+        application.add_handler(TypeHandler(Update, self._antes), group=-1)
+        application.add_handler(TypeHandler(Update, self._depois), group=1)
+
+    async def _antes(self, update, context):
+        estado = context.user_data.get('current_state') if update.message.text != "/start" else None
+        self.estado_do_update[update.update_id] = NOME_ESTADO.get(estado, "START")
+        self.inicio_handler[update.update_id] = time.perf_counter()
+
+    async def _depois(self, update, context):
+        fim = time.perf_counter()
+        uid = update.update_id
+        estado = self.estado_do_update.pop(uid)
+        self.latencias.setdefault(estado, []).append(fim - self.inicio_handler.pop(uid))
+        self.ponta_a_ponta.append(fim - self.enfileirado.pop(uid))
+        self.processados += 1
+        futuro = self.pendentes.pop(uid, None)
+        if futuro is not None and not futuro.done():
+            futuro.set_result(None)
+
+    async def enviar(self, application, update):
+        futuro = asyncio.get_running_loop().create_future()
+        self.pendentes[update.update_id] = futuro
+        self.enfileirado[update.update_id] = time.perf_counter()
+        await application.update_queue.put(update)
+        await futuro
+
+
+async def usuario_simulado(application, medidor, user_id, seeds, pensar, ativos, parar):
+    rng = random.Random(user_id)
+    while not parar.is_set():
+        ativos[0] += 1
+        try:
+            for texto in roteiro_conversa(gerar_perfil(next(seeds), max_exp=4, max_grad=3)):
+                await asyncio.sleep(rng.expovariate(1 / pensar) if pensar else 0)
+                if parar.is_set():
+                    return
+                await medidor.enviar(application, update_texto(application.bot, user_id, texto))
+        finally:
+            ativos[0] -= 1
+
+
+async def rodar_nivel(usuarios, duracao, pensar, seeds, limitador=False):
+    if limitador:
+        # API com flood limit e o bot com a fila de envio: mede a vazão no teto da plataforma
+        telegram = TelegramFalso(limite_global=LIMITE_API_GLOBAL, limite_chat=LIMITE_API_CHAT)
+    else:
+        telegram = TelegramFalso()
+    application = bot_curriculo.criar_aplicacao(TOKEN_FALSO, ApplicationBuilder().updater(None), request=telegram,
+                                                limitar_envio=limitador)
+    medidor = Medidor()
+    medidor.registrar(application)
+    await application.initialize()
+    await application.start()
+
+    rss_inicial = rss_atual_mb()
+    ativos = [0]
+    parar = asyncio.Event()
+    tarefas = [asyncio.create_task(usuario_simulado(application, medidor, 10_000 + i, seeds, pensar, ativos, parar))
+               for i in range(usuarios)]
+    # Janela de medição: descarta o primeiro quarto (aquecimento)
+    await asyncio.sleep(duracao / 4)
+    processados_ini = medidor.processados
+    medidor.ponta_a_ponta.clear()
+    inicio = time.perf_counter()
+    enviadas_ini = len(telegram.enviadas)
+    await asyncio.sleep(duracao * 3 / 4)
+    decorrido = time.perf_counter() - inicio
+    processados = medidor.processados - processados_ini
+    enviadas = len(telegram.enviadas) - enviadas_ini
+    rss_pico, ativos_pico = rss_atual_mb(), ativos[0]
+
+    parar.set()
+    for futuro in medidor.pendentes.values():
+        futuro.cancel()
+    for tarefa in tarefas:
+        tarefa.cancel()
+    await asyncio.gather(*tarefas, return_exceptions=True)
+    await application.stop()
+    await application.shutdown()
+
+    e2e = medidor.ponta_a_ponta or [0.0]
+    return {
+        "usuarios": usuarios,
+        "carga_oferecida_msgs_s": usuarios / pensar if pensar else None,
+        "msgs_por_segundo": processados / decorrido,
+        "envios_api_por_segundo": enviadas / decorrido,
+        "respostas_429": telegram.respostas_429,
+        "ponta_a_ponta_p50_ms": statistics.median(e2e) * 1000,
+        "ponta_a_ponta_p99_ms": sorted(e2e)[int(len(e2e) * 0.99)] * 1000,
+        "conversas_ativas": ativos_pico,
+        "memoria_por_conversa_kb": max(0.0, rss_pico - rss_inicial) * 1024 / max(1, ativos_pico),
+        "chamadas_api": dict(telegram.chamadas),
+        "latencia_por_estado": resumo_estados(medidor.latencias),
+    }
+
+
+def resumo_estados(latencias):
+    resumo = {}
+    for estado, valores in sorted(latencias.items()):
+        valores.sort()
+        histograma = [0] * len(BALDES_MS)
+        for v in valores:
+            histograma[bisect.bisect_left(BALDES_MS, v * 1000)] += 1
+        resumo[estado] = {
+            "n": len(valores),
+            "p50_ms": valores[len(valores) // 2] * 1000,
+            "p99_ms": valores[int(len(valores) * 0.99)] * 1000,
+            "histograma": {f"<={b}ms": c for b, c in zip(BALDES_MS, histograma) if c},
+        }
+    return resumo
+
+
+def encontrar_joelho(resultados, tolerancia=0.9):
+    """Último nível em que o bot ainda acompanha a carga oferecida (>= 90% dela).
+
+    Sem tempo de digitação, usa o ponto em que a vazão para de crescer mais de 10%.
+    """
+    joelho = None
+    for anterior, atual in zip([None] + resultados, resultados):
+        if atual["carga_oferecida_msgs_s"]:
+            saturado = atual["msgs_por_segundo"] < tolerancia * atual["carga_oferecida_msgs_s"]
+        else:
+            saturado = anterior is not None and atual["msgs_por_segundo"] < anterior["msgs_por_segundo"] * 1.1
+        if saturado:
+            break
+        joelho = atual["usuarios"]
+    return joelho
+
+
+async def rodar(niveis, duracao, pensar, limitador=False):
+    seeds = itertools.count(1)
+    resultados = []
+    for usuarios in niveis:
+        resultado = await rodar_nivel(usuarios, duracao, pensar, seeds, limitador)
+        resultados.append(resultado)
+        print(f"{usuarios:>6} usuários | {resultado['msgs_por_segundo']:>9.1f} msgs/s | "
+              f"API {resultado['envios_api_por_segundo']:>7.1f} envios/s, {resultado['respostas_429']} x 429 | "
+              f"p50 {resultado['ponta_a_ponta_p50_ms']:>8.2f} ms | p99 {resultado['ponta_a_ponta_p99_ms']:>8.2f} ms | "
+              f"{resultado['memoria_por_conversa_kb']:>7.1f} KB/conversa")
+    bot_curriculo.render_pool.shutdown()
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.carga", description=__doc__.splitlines()[0])
+    parser.add_argument("--niveis", default="50,200,500,1000,2000", help="Usuários simultâneos por rodada")
+    parser.add_argument("--duracao", type=float, default=20.0, help="Segundos por rodada")
+    parser.add_argument("--pensar", type=float, default=3.0, help="Tempo médio de digitação real (s)")
+    parser.add_argument("--escala", type=float, default=0.05, help="Fator de compressão do tempo de digitação")
+    parser.add_argument("--limitador", action="store_true",
+                        help="Liga a fila de envio do bot e o flood limit na API falsa")
+    parser.add_argument("--saida", default="carga_output.json")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    niveis = [int(n) for n in args.niveis.split(",")]
+    resultados = asyncio.run(rodar(niveis, args.duracao, args.pensar * args.escala, args.limitador))
+    joelho = encontrar_joelho(resultados)
+    print(f"Joelho da curva de vazão: {joelho} usuários simultâneos" if joelho else "Saturado já no primeiro nível")
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump({"parametros": vars(args), "joelho_usuarios": joelho, "niveis": resultados}, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.saida}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
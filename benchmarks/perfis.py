@@ -0,0 +1,135 @@
+import random
+
+# --- Perfis sintéticos ---
+# Geram user_data no mesmo formato que a conversa produz, e o roteiro de mensagens que um
+# usuário digitaria para chegar nele.
+
+PALAVRAS = (
+    "gestão projetos equipe vendas cliente sistema processo qualidade análise dados relatório "
+    "atendimento logística financeiro marketing desenvolvimento suporte treinamento operação "
+    "planejamento estoque contratos auditoria compras indicadores melhoria"
+).split()
+NOMES = "Ana Bruno Carla Diego Elisa Fábio Gabriela Hugo Isabela João Larissa Marcos".split()
+SOBRENOMES = "Silva Souza Oliveira Santos Lima Pereira Costa Rodrigues Almeida Nascimento".split()
+IDIOMAS = "Inglês Espanhol Francês Alemão Italiano Japonês Mandarim Libras".split()
+
+def _frase(r, n):
+    return " ".join(r.choice(PALAVRAS) for _ in range(n)).capitalize()
+
+def gerar_perfil(seed, max_grad=10, max_pos=3, max_exp=20, max_idiomas=8, max_cursos=15):
+    r = random.Random(seed)
+    data = {
+        'nome': f"{r.choice(NOMES)} {r.choice(SOBRENOMES)} {r.choice(SOBRENOMES)}",
+        'idade': str(r.randint(16, 65)),
+        'estado_civil': r.choice(["Solteiro(A)", "Casado(A)", "Divorciado(A)"]),
+        'telefone': str(r.randint(11_900_000_000, 99_999_999_999)),
+        'email': f"usuario{seed}@exemplo.com.br",
+    }
+    if r.random() < 0.9:
+        data['forma_2grau'] = 'S'
+        data['ano_2grau'] = str(r.randint(1980, 2023))
+        data['graduacoes'] = [_item_academico(r) for _ in range(r.randint(0, max_grad))]
+        data['pos_graduacoes'] = [_item_academico(r) for _ in range(r.randint(0, max_pos))]
+    else:
+        data['forma_2grau'] = 'N'
+        data['ano_2grau'] = ''
+        data['graduacoes'] = []
+        data['pos_graduacoes'] = []
+
+    if r.random() < 0.8:
+        data['tipo_contrato'] = '1'
+        data['experiencias'] = [{
+            'empresa': f"{r.choice(SOBRENOMES)} {r.choice(['Ltda', 'S.A.', 'Comércio', 'Serviços'])}".title(),
+            'cargo': _frase(r, 2).title(),
+            'adm': f"{r.randint(1, 12):02d}/{r.randint(2000, 2020)}",
+            'dem': r.choice(["ATUAL", f"{r.randint(1, 12):02d}/{r.randint(2021, 2024)}"]).title(),
+            'atividades': "\n".join(_frase(r, r.randint(4, 40)) for _ in range(r.randint(0, 8))),
+            'resultados': "\n".join(_frase(r, r.randint(4, 20)) for _ in range(r.randint(0, 4))),
+        } for _ in range(r.randint(0, max_exp))]
+        data['mei_trabalhos'] = ''
+    else:
+        data['tipo_contrato'] = '2'
+        data['experiencias'] = []
+        data['mei_trabalhos'] = ", ".join(_frase(r, 3) for _ in range(r.randint(1, 10)))
+
+    data['idiomas'] = [{
+        'instituicao': _frase(r, 2).title(),
+        'nome_idioma': r.choice(IDIOMAS),
+        'nivel': r.choice("BIA"),
+        'ini': str(r.randint(2000, 2020)),
+        'fim': r.choice(["CURSANDO", str(r.randint(2021, 2024))]),
+    } for _ in range(r.randint(0, max_idiomas))]
+    data['cursos'] = ", ".join(_frase(r, r.randint(1, 4)) for _ in range(r.randint(0, max_cursos)))
+    return data
+
+def _item_academico(r):
+    situacao = r.choice("CI")
+    return {
+        'faculdade': f"Universidade {r.choice(SOBRENOMES)}",
+        'curso': _frase(r, 2).title(),
+        'situacao': situacao,
+        'ano': str(r.randint(1990, 2024)) if situacao == 'C' else '',
+    }
+
+def roteiro_conversa(data):
+    """Mensagens, na ordem, que levam a conversa do /start até o envio do PDF com este perfil."""
+    msgs = ["/start", "S", data['nome'], data['idade'], data['estado_civil'], data['telefone'],
+            data['email'], data['forma_2grau']]
+    if data['forma_2grau'] == 'S':
+        msgs.append(data['ano_2grau'])
+        for chave in ('graduacoes', 'pos_graduacoes'):
+            itens = data[chave]
+            msgs.append(str(len(itens)))
+            for i, item in enumerate(itens):
+                msgs += [item['faculdade'], item['curso'], item['situacao']]
+                if item['situacao'] == 'C':
+                    msgs.append(item['ano'])
+                msgs.append('S' if i < len(itens) - 1 else 'N')
+
+    msgs.append(data['tipo_contrato'])
+    if data['tipo_contrato'] == '2':
+        msgs.append(data['mei_trabalhos'])
+    elif not data['experiencias']:
+        msgs.append('N')
+    else:
+        for i, exp in enumerate(data['experiencias']):
+            msgs += [exp['empresa'], exp['cargo'], exp['adm'], exp['dem'],
+                     exp['atividades'] or 'N', exp['resultados'] or 'N']
+            msgs.append('S' if i < len(data['experiencias']) - 1 else 'N')
+
+    if data['idiomas']:
+        msgs.append('S')
+        for i, lang in enumerate(data['idiomas']):
+            msgs += [lang['instituicao'], lang['nome_idioma'], lang['nivel'], lang['ini'], lang['fim']]
+            msgs.append('S' if i < len(data['idiomas']) - 1 else 'N')
+    else:
+        msgs.append('N')
+    msgs.append(data['cursos'] or '-')
+    msgs.append('1')  # formato: só o PDF
+    return msgs
+
+def ficha_texto(data):
+    """O mesmo perfil como ficha do /rapido: linhas "campo: valor" e uma [seção] por item."""
+    linhas = [f"nome: {data['nome']}", f"idade: {data['idade']}", f"estado civil: {data['estado_civil']}",
+              f"telefone: {data['telefone']}", f"email: {data['email']}", f"ensino medio: {data['forma_2grau']}"]
+    if data['forma_2grau'] == 'S':
+        linhas.append(f"ano ensino medio: {data['ano_2grau']}")
+    linhas.append("contrato: " + ("MEI" if data['tipo_contrato'] == '2' else "CLT"))
+    if data['tipo_contrato'] == '2':
+        linhas.append(f"trabalhos mei: {data['mei_trabalhos']}")
+    linhas.append(f"cursos: {data['cursos']}")
+
+    for secao, chave in (("graduacao", 'graduacoes'), ("pos-graduacao", 'pos_graduacoes')):
+        for item in data[chave]:
+            linhas += ["", f"[{secao}]", f"faculdade: {item['faculdade']}", f"curso: {item['curso']}",
+                       f"situacao: {item['situacao']}", f"ano: {item['ano']}"]
+    for exp in data['experiencias']:
+        linhas += ["", "[experiencia]", f"empresa: {exp['empresa']}", f"cargo: {exp['cargo']}",
+                   f"admissao: {exp['adm']}", f"saida: {exp['dem']}", "atividades:"]
+        linhas += [f"- {a}" for a in exp['atividades'].splitlines()]
+        linhas.append("resultados:")
+        linhas += [f"- {r}" for r in exp['resultados'].splitlines()]
+    for lang in data['idiomas']:
+        linhas += ["", "[idioma]", f"instituicao: {lang['instituicao']}", f"idioma: {lang['nome_idioma']}",
+                   f"nivel: {lang['nivel']}", f"inicio: {lang['ini']}", f"fim: {lang['fim']}"]
+    return "\n".join(linhas)
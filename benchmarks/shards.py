@@ -0,0 +1,94 @@
+"""Vazão do modo shards: os mesmos updates com 1, 2, 4... workers.
+
+Uso: python -m benchmarks.shards --workers 1,2,4 --conversas 300
+
+Cada rodada sobe os workers (processos com a Application real e o TelegramFalso no lugar da
+API), espera que fiquem prontos e então roteia pelo Ingresso as conversas completas de
+--conversas usuários sintéticos, intercaladas, sem a última resposta (a que gera o PDF: a
+renderização já escala pelo RenderPool). O tempo vai até o último worker terminar de
+processar e sair. A escala é a vazão da rodada dividida pela vazão com 1 worker.
+"""
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+# Os workers leem a configuração ao importar o bot: sem fila de envio, métricas ou disco
+os.environ.update(ENVIO_TAXA_GLOBAL="0", METRICS_PORT="0", PERSISTENCE_URL="", SESSAO_DIR="")
+
+import bot_curriculo
+import shards
+from benchmarks.perfis import gerar_perfil, roteiro_conversa
+from benchmarks.telegram_falso import TOKEN_FALSO, TelegramFalso, update_texto
+
+def montar_updates(conversas):
+    roteiros = [roteiro_conversa(gerar_perfil(seed, max_exp=4, max_grad=3))[:-1] for seed in range(1, conversas + 1)]
+    updates = []
+    # Uma mensagem de cada usuário por vez, como usuários conversando ao mesmo tempo
+    for textos in itertools.zip_longest(*roteiros):
+        for user_id, texto in enumerate(textos, 10_000):
+            if texto is not None:
+                updates.append(update_texto(None, user_id, texto).to_dict())
+    return updates
+
+def rodar_nivel(workers, updates):
+    contexto = multiprocessing.get_context("spawn")
+    fila = shards.FilaLocal(workers, contexto)
+    ingresso = shards.Ingresso(fila, workers, fila_max=len(updates))
+    prontos = [contexto.Event() for _ in range(workers)]
+    processos = [contexto.Process(target=bot_curriculo.processo_worker,
+                                  args=(TOKEN_FALSO, fila, n, workers, 1, True, prontos[n],
+                                        TelegramFalso))
+                 for n in range(workers)]
+    for processo in processos:
+        processo.start()
+    for pronto in prontos:
+        pronto.wait()
+
+    inicio = time.perf_counter()
+    for i in range(0, len(updates), 100):
+        ingresso.rotear(updates[i:i + 100])
+    while any(ingresso.profundidades()):
+        time.sleep(0.01)
+    for processo in processos:
+        processo.terminate()  # o worker processa o que já tirou da fila antes de sair
+    for processo in processos:
+        processo.join()
+    decorrido = time.perf_counter() - inicio
+    return {
+        "workers": workers,
+        "updates": len(updates),
+        "segundos": decorrido,
+        "updates_por_segundo": len(updates) / decorrido,
+        "por_shard": [sum(1 for u in updates if ingresso.anel.shard(shards.chave_do_update(u)) == n)
+                      for n in range(workers)],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.shards", description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="Número de workers por rodada")
+    parser.add_argument("--conversas", type=int, default=300, help="Usuários sintéticos (uma conversa cada)")
+    parser.add_argument("--saida", default="shards_output.json")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    updates = montar_updates(args.conversas)
+    resultados = []
+    for workers in (int(n) for n in args.workers.split(",")):
+        resultado = rodar_nivel(workers, updates)
+        resultado["escala"] = resultado["updates_por_segundo"] / resultados[0]["updates_por_segundo"] if resultados else 1.0
+        resultados.append(resultado)
+        print(f"{workers:>3} workers | {resultado['updates_por_segundo']:>9.1f} updates/s | "
+              f"escala {resultado['escala']:.2f}x | updates por shard {resultado['por_shard']}")
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump({"parametros": vars(args), "cpus": os.cpu_count(), "rodadas": resultados}, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.saida}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
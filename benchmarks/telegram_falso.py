@@ -0,0 +1,137 @@
+import asyncio
+import collections
+import itertools
+import json
+import time
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+# --- API do Telegram falsa ---
+# Substitui o HTTPXRequest do bot: responde localmente às chamadas da Bot API usadas pelo
+# bot_curriculo, sem rede, e guarda quantas chamadas e bytes passaram por ela.
+# Com limite_global/limite_chat, imita o flood limit do Telegram: acima de N envios na
+# última janela de 1 s (no total ou no mesmo chat), responde 429 com retry_after.
+
+BOT_ID = 123456
+TOKEN_FALSO = f"{BOT_ID}:TESTE"
+
+class TelegramFalso(BaseRequest):
+    def __init__(self, latencia=0.0, limite_global=None, limite_chat=None, retry_after=1):
+        self.latencia = latencia
+        self.limite_global = limite_global
+        self.limite_chat = limite_chat
+        self.retry_after = retry_after
+        self.respostas_429 = 0
+        self._janela_global = collections.deque()
+        self._janelas_chat = collections.defaultdict(collections.deque)
+        self.chamadas = {}
+        self.bytes_enviados = 0
+        self.enviadas = []  # (método, chat_id) na ordem em que chegaram
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self.arquivos = {}  # file_id -> bytes dos documentos "enviados pelo usuário" (getFile + download)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        if "/file/bot" in url:
+            # Download do arquivo: o caminho devolvido pelo getFile é o próprio file_id
+            self.chamadas["download"] = self.chamadas.get("download", 0) + 1
+            return 200, self.arquivos[url.rsplit("/", 1)[-1]]
+        metodo = url.rsplit("/", 1)[-1]
+        self.chamadas[metodo] = self.chamadas.get(metodo, 0) + 1
+        params = request_data.parameters if request_data else {}
+        if metodo == "getUpdates":
+            # Long polling sem updates: a resposta (vazia) só vem depois do timeout pedido
+            await asyncio.sleep(params.get("timeout") or 0)
+        if request_data and request_data.contains_files:
+            self.bytes_enviados += sum(len(f[1]) for f in request_data.multipart_data.values())
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        if "chat_id" in params and self._estourou_limite(params["chat_id"]):
+            self.respostas_429 += 1
+            return 429, json.dumps({
+                "ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }).encode()
+        self.enviadas.append((metodo, params.get("chat_id")))
+        return 200, json.dumps({"ok": True, "result": self._resultado(metodo, params)}).encode()
+
+    def _estourou_limite(self, chat_id):
+        agora = time.monotonic()
+        janelas = [(self._janela_global, self.limite_global), (self._janelas_chat[chat_id], self.limite_chat)]
+        for janela, limite in janelas:
+            while janela and janela[0] <= agora - 1:
+                janela.popleft()
+            if limite is not None and len(janela) >= limite:
+                return True
+        for janela, _ in janelas:
+            janela.append(agora)
+        return False
+
+    def _resultado(self, metodo, params):
+        if metodo == "getMe":
+            return {"id": BOT_ID, "is_bot": True, "first_name": "Bot", "username": "curriculo_bot",
+                    "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False}
+        if metodo in ("setWebhook", "deleteWebhook", "answerCallbackQuery"):
+            return True
+        if metodo == "getUpdates":
+            return []
+        if metodo == "getFile":
+            file_id = params["file_id"]
+            return {"file_id": file_id, "file_unique_id": f"U{file_id}", "file_size": len(self.arquivos[file_id]),
+                    "file_path": file_id}
+        mensagem = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": params.get("chat_id", 0), "type": "private"},
+            "from": {"id": BOT_ID, "is_bot": True, "first_name": "Bot"},
+        }
+        if metodo == "sendDocument":
+            n = next(self._file_ids)
+            mensagem["document"] = {"file_id": f"DOC{n}", "file_unique_id": f"U{n}", "file_name": "curriculo.pdf"}
+        elif "text" in params:
+            mensagem["text"] = params["text"]
+        return mensagem
+
+
+_update_ids = itertools.count(1)
+
+def _mensagem(user_id, **campos):
+    return {
+        "message_id": next(_update_ids),
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "Teste"},
+        **campos,
+    }
+
+def update_texto(bot, user_id, texto):
+    """Monta um Update de mensagem privada, como o Telegram entregaria."""
+    data = {"update_id": next(_update_ids), "message": _mensagem(user_id, text=texto)}
+    if texto.startswith("/"):
+        comando = texto.split()[0]
+        data["message"]["entities"] = [{"type": "bot_command", "offset": 0, "length": len(comando)}]
+    return Update.de_json(data, bot)
+
+def update_documento(bot, telegram, user_id, nome, conteudo, mime_type="text/plain"):
+    """Update de um arquivo enviado pelo usuário; o conteúdo fica no TelegramFalso para o download."""
+    file_id = f"ARQ{next(_update_ids)}"
+    telegram.arquivos[file_id] = conteudo
+    documento = {"file_id": file_id, "file_unique_id": f"U{file_id}", "file_name": nome,
+                 "mime_type": mime_type, "file_size": len(conteudo)}
+    return Update.de_json({"update_id": next(_update_ids), "message": _mensagem(user_id, document=documento)}, bot)
+
+def update_botao(bot, user_id, dados):
+    """Update de um toque em botão de teclado inline (callback_query) na última pergunta do bot."""
+    mensagem = _mensagem(user_id, text="pergunta")
+    mensagem["from"] = {"id": BOT_ID, "is_bot": True, "first_name": "Bot"}
+    consulta = {"id": str(next(_update_ids)), "chat_instance": str(user_id), "data": dados,
+                "from": {"id": user_id, "is_bot": False, "first_name": "Teste"}, "message": mensagem}
+    return Update.de_json({"update_id": next(_update_ids), "callback_query": consulta}, bot)
@@ -1,14 +1,50 @@
+import time
+
+# A fase 'imports' do boot vai daqui até o fim dos imports (ver "Linha do tempo do boot")
+_INICIO_BOOT = time.perf_counter()
+
+import argparse
+import asyncio
+import csv
+import hmac
+import json
 import logging
+import multiprocessing
 import os
-from telegram import Update
+import pickle
+import re
+import signal
+import string
+import sys
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import (
-    ApplicationBuilder, CommandHandler, MessageHandler,
+    Application, ApplicationBuilder, CallbackQueryHandler, CommandHandler, MessageHandler,
     filters, ContextTypes, ConversationHandler
 )
-from fpdf import FPDF
-from fpdf.enums import XPos, YPos
-import io
-import re
+from telegram.error import BadRequest, TelegramError
+from telegram.request import HTTPXRequest
+from telegram.warnings import PTBUserWarning
+import metricas
+import shards
+from cache_pdf import CachePDF, chave_conteudo
+from envio import LimitadorEnvio
+from ficha import MODELO_FICHA, ler_ficha
+from formatos import FORMATOS_SAIDA, renderizar
+from layout_cv import NIVEIS_IDIOMA, PDF_FONTE, PDF_PERFIL, _Valores, documento_cv
+from modelo import CAMPOS_CURRICULO, LISTAS, Curriculo
+from persistencia import criar_persistencia
+from pool_render import PoolAquecido
+from sessoes import GerenciadorSessoes
+
+# --- Linha do tempo do boot ---
+# O boot é medido por fases (imports, montagem do módulo, construção da Application, registro
+# dos handlers e primeiro getUpdates), logado ao final e exportado em bot_boot_segundos.
+# O fpdf2 e o fontTools (a maior parte dos imports) ficam no pdf_cv, importado só pelos
+# processos de render, que aquecem em paralelo com o início do polling.
+boot = metricas.LinhaDoTempo(_INICIO_BOOT)
+boot.marcar('imports')
 
 # --- Configuração do Logger ---
 logging.basicConfig(
@@ -16,6 +52,7 @@ logging.basicConfig(
     level=logging.INFO
 )
 logger = logging.getLogger(__name__)
+logging.getLogger("fontTools").setLevel(logging.WARNING)  # o recorte das fontes do PDF loga cada tabela em INFO
 
 # --- Constantes para Estados da Conversa ---
 (
@@ -36,15 +73,41 @@ logger = logging.getLogger(__name__)
     IDIOMAS_SIM, ASK_IDIOMA_INST, ASK_IDIOMA_NOME, ASK_IDIOMA_NIVEL, ASK_IDIOMA_INI, ASK_IDIOMA_FIM, 
     ADD_IDIOMA,
 
-    CURSOS, CANCEL
-) = range(37) 
+    CURSOS, CANCEL,
+
+    # Edição de uma seção de um currículo já gerado (no fim: os números dos estados persistidos não mudam)
+    EDITAR,
+
+    # Formatos dos arquivos, escolhidos depois dos cursos
+    FORMATOS
+) = range(39)
+
+# Nome de cada estado (rótulo do handler nas métricas), na ordem das constantes
+NOMES_ESTADOS = (
+    'escolha', 'nome', 'idade', 'estado_civil', 'telefone', 'email', 'forma_2grau', 'ano_2grau',
+    'ask_qtd_grad', 'ask_faculdade', 'ask_curso', 'ask_situacao', 'ask_ano_grad',
+    'ask_qtd_pos', 'ask_pos_faculdade', 'ask_pos_curso', 'ask_pos_situacao', 'ask_pos_ano',
+    'add_academic_item',
+    'tipo_contrato', 'empresa', 'cargo', 'adm', 'dem', 'atividades', 'resultados', 'add_emp',
+    'mei_trabalhos',
+    'idiomas_sim', 'ask_idioma_inst', 'ask_idioma_nome', 'ask_idioma_nivel', 'ask_idioma_ini', 'ask_idioma_fim',
+    'add_idioma',
+    'cursos', 'cancel', 'editar', 'formatos',
+)
 
 # --- Validações ---
 def validar_texto(texto, min_palavras=2):
     return len(texto.strip().split()) >= min_palavras
 
+# Compiladas uma vez: re.match procura o padrão no cache do módulo re a cada chamada
+_RE_EMAIL = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
+_RE_MES_ANO = re.compile(r"^(0[1-9]|1[0-2])\/\d{4}$")
+
 def validar_email(texto):
-    return re.match(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$", texto) is not None
+    return _RE_EMAIL.match(texto) is not None
+
+def validar_idade(texto):
+    return texto.isdecimal() and 14 <= int(texto) <= 99
 
 def validar_telefone(texto):
     return texto.isdigit() and 8 <= len(texto) <= 15
@@ -67,782 +130,1495 @@ def validar_nivel_idioma(nivel):
     return nivel.upper() in ['B', 'I', 'A']
 
 def validar_mes_ano(texto):
-    return re.match(r"^(0[1-9]|1[0-2])\/\d{4}$", texto) is not None or texto.upper() == 'ATUAL'
-
-# --- PDF Personalizado ---
-class PDF(FPDF):
-    def header(self):
-        self.set_fill_color(70, 130, 180) # SteelBlue
-        self.rect(0, 0, self.w, 20, 'F')
-        self.set_font('helvetica', 'B', 16)
-        self.set_text_color(255, 255, 255) # White
-        self.cell(0, 10, 'Currículo Profissional', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('helvetica', 'I', 8)
-        self.set_text_color(128) # Gray
-        self.cell(0, 10, f'Página {self.page_no()}', new_x=XPos.RIGHT, new_y=YPos.TOP, align='C')
-
-def gerar_pdf(data):
-    pdf = PDF()
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.set_text_color(0) # Black
-    
-    left_margin = 20 
-    pdf.set_left_margin(left_margin)
-    pdf.set_x(left_margin)
-
-    def secao(titulo):
-        pdf.ln(4)
-        pdf.set_font('helvetica', 'B', 14)
-        pdf.set_text_color(70, 130, 180) # SteelBlue
-        pdf.cell(0, 12, titulo, new_x=XPos.LMARGIN, new_y=YPos.NEXT) # Altura do título da seção (mantido em 12mm)
-        pdf.set_text_color(0) # Black
-        pdf.set_font('helvetica', '', 12)
-        pdf.set_x(left_margin)
-
-    secao("Dados Pessoais")
-    # Itens de dados pessoais com altura reduzida para 6mm
-    pdf.cell(0, 6, f"Nome: {data.get('nome', 'Não informado')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT) 
-    pdf.set_x(left_margin)
-    pdf.cell(0, 6, f"Idade: {data.get('idade', 'Não informada')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT) 
-    pdf.set_x(left_margin)
-    pdf.cell(0, 6, f"Estado Civil: {data.get('estado_civil', 'Não informado')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT) 
-    pdf.set_x(left_margin)
-    pdf.cell(0, 6, f"Telefone: {data.get('telefone', 'Não informado')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT) 
-    pdf.set_x(left_margin)
-    pdf.cell(0, 6, f"E-mail: {data.get('email', 'Não informado')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT) 
-    pdf.set_x(left_margin)
-
-    secao("Formação Acadêmica")
-    if data.get('forma_2grau') == 'S':
-        ano_2g = data.get('ano_2grau', 'Não informado')
-        pdf.cell(0, 6, f"Ensino Médio: Concluído em {ano_2g}", new_x=XPos.LMARGIN, new_y=YPos.NEXT) 
-    else:
-        pdf.cell(0, 6, f"Ensino Médio: Incompleto", new_x=XPos.LMARGIN, new_y=YPos.NEXT) 
-    pdf.set_x(left_margin)
-
-    graduacoes = data.get('graduacoes', [])
-    if graduacoes:
-        for i, grad in enumerate(graduacoes):
-            pdf.ln(1) # Pequeno espaçamento entre as graduações
-            pdf.set_x(left_margin)
-            pdf.set_font('helvetica', 'B', 11) 
-            pdf.cell(0, 7, f"Graduação {i+1}:", new_x=XPos.LMARGIN, new_y=YPos.NEXT) # Título de graduação maior
-            pdf.set_font('helvetica', '', 11)
-            
-            pdf.set_x(left_margin + 5) 
-            pdf.cell(0, 5, f"Universidade: {grad.get('faculdade', '')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT) # Reduzido para 5mm
-            pdf.set_x(left_margin + 5)
-            pdf.cell(0, 5, f"Curso: {grad.get('curso', '')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT) # Reduzido para 5mm
-            pdf.set_x(left_margin + 5)
-            sit = grad.get('situacao', '')
-            if sit == 'C':
-                pdf.cell(0, 5, f"Situação: Concluído em {grad.get('ano', '')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT) # Reduzido para 5mm
-            else:
-                pdf.cell(0, 5, f"Situação: Cursando", new_x=XPos.LMARGIN, new_y=YPos.NEXT) # Reduzido para 5mm
-            pdf.set_x(left_margin) 
-    else:
-        pdf.cell(0, 6, "", new_x=XPos.LMARGIN, new_y=YPos.NEXT) # "Caso não tenha graduação"
-        pdf.set_x(left_margin)
-
-    pos_graduacoes = data.get('pos_graduacoes', [])
-    if pos_graduacoes:
-        for i, pos in enumerate(pos_graduacoes):
-            pdf.ln(1) # Pequeno espaçamento entre as pós-graduações
-            pdf.set_x(left_margin)
-            pdf.set_font('Arial', 'B', 11)
-            pdf.cell(0, 7, f"Pós-Graduação {i+1}:", 0, 1) # Título de pós-graduação maior
-            pdf.set_font('Arial', '', 11)
-
-            pdf.set_x(left_margin + 5) 
-            pdf.cell(0, 5, f"Universidade: {pos.get('faculdade', '')}", 0, 1) # Reduzido para 5mm
-            pdf.set_x(left_margin + 5)
-            pdf.cell(0, 5, f"Curso: {pos.get('curso', '')}", 0, 1) # Reduzido para 5mm
-            pdf.set_x(left_margin + 5)
-            sit = pos.get('situacao', '')
-            if sit == 'C':
-                pdf.cell(0, 5, f"Situação: Concluído em {pos.get('ano', '')}", 0, 1) # Reduzido para 5mm
-            else:
-                pdf.cell(0, 5, f"Situação: Cursando", 0, 1) # Reduzido para 5mm
-            pdf.set_x(left_margin) 
+    return _RE_MES_ANO.match(texto) is not None or texto.upper() == 'ATUAL'
+
+def _preenchido(texto):
+    return bool(texto.strip())
+
+# Regras de cada item das listas do currículo: campo -> (validação, mensagem)
+REGRAS_ACADEMICO = {
+    'faculdade': (_preenchido, "faculdade vazia"),
+    'curso': (_preenchido, "curso vazio"),
+    'situacao': (lambda s: s.upper() in ('C', 'I'), "situação deve ser C ou I"),
+}
+REGRAS_EXPERIENCIA = {
+    'empresa': (_preenchido, "empresa vazia"),
+    'cargo': (_preenchido, "cargo vazio"),
+    'adm': (validar_mes_ano, "admissão fora do formato MM/AAAA"),
+    'dem': (validar_mes_ano, "saída fora do formato MM/AAAA ou 'Atual'"),
+}
+REGRAS_IDIOMA = {
+    'instituicao': (_preenchido, "instituição vazia"),
+    'nome_idioma': (_preenchido, "idioma vazio"),
+    'nivel': (validar_nivel_idioma, "nível deve ser B, I ou A"),
+    'ini': (validar_ano, "ano de início inválido"),
+    'fim': (validar_ano_ou_cursando, "conclusão deve ser um ano ou 'Cursando'"),
+}
+
+def _validar_itens(data, chave, regras, rotulo, erros):
+    itens = data.get(chave) or []
+    if not isinstance(itens, list):
+        erros.append(f"{chave}: deve ser uma lista")
+        return
+    for n, item in enumerate(itens, 1):
+        if not isinstance(item, dict):
+            erros.append(f"{rotulo} {n}: deve ser um objeto")
+            continue
+        for campo, (validacao, mensagem) in regras.items():
+            if not validacao(str(item.get(campo, ''))):
+                erros.append(f"{rotulo} {n}: {mensagem}")
+
+def validar_registro(data):
+    """Valida um currículo em dict (mesmas regras da conversa); devolve a lista de erros."""
+    erros = []
+    if not validar_texto(str(data.get('nome', ''))):
+        erros.append("nome: informe o nome completo (mínimo 2 palavras)")
+    if not validar_idade(str(data.get('idade', ''))):
+        erros.append("idade: deve ser um número entre 14 e 99")
+    if not validar_telefone(str(data.get('telefone', ''))):
+        erros.append("telefone: apenas números, 8 a 15 dígitos")
+    if not validar_email(str(data.get('email', ''))):
+        erros.append("email: endereço inválido")
+
+    forma_2grau = str(data.get('forma_2grau', '')).upper()
+    if forma_2grau not in ('S', 'N'):
+        erros.append("forma_2grau: deve ser S ou N")
+    elif forma_2grau == 'S' and not validar_ano(str(data.get('ano_2grau', ''))):
+        erros.append("ano_2grau: ano com 4 dígitos")
+
+    tipo_contrato = str(data.get('tipo_contrato', ''))
+    if tipo_contrato not in ('1', '2'):
+        erros.append("tipo_contrato: deve ser 1 (CLT) ou 2 (MEI)")
+
+    # As listas são validadas mesmo quando forma_2grau ou tipo_contrato as dispensam: o
+    # Curriculo.de_dict lê todas, e um item que não é objeto derrubaria a montagem
+    _validar_itens(data, 'graduacoes', REGRAS_ACADEMICO, "Graduação", erros)
+    _validar_itens(data, 'pos_graduacoes', REGRAS_ACADEMICO, "Pós-Graduação", erros)
+    for chave, rotulo in (('graduacoes', "Graduação"), ('pos_graduacoes', "Pós-Graduação")):
+        itens = data.get(chave) or []
+        for n, item in enumerate(itens if isinstance(itens, list) else [], 1):
+            if isinstance(item, dict) and str(item.get('situacao', '')).upper() == 'C' and not validar_ano(str(item.get('ano', ''))):
+                erros.append(f"{rotulo} {n}: ano de conclusão inválido")
+    _validar_itens(data, 'experiencias', REGRAS_EXPERIENCIA, "Experiência", erros)
+    _validar_itens(data, 'idiomas', REGRAS_IDIOMA, "Idioma", erros)
+    return erros
+
+# --- Renderização do PDF fora do event loop ---
+# O fpdf2 é CPU-bound: rodar gerar_pdf no loop do asyncio trava a conversa de todos os usuários.
+# O PDF é montado num pool de processos limitado por RENDER_WORKERS e RENDER_QUEUE_MAX. Os
+# processos sobem com o bot e renderizam um currículo de exemplo antes do primeiro pedido; cada
+# um é trocado depois de RENDER_MAX_PDFS PDFs ou quando a memória cresce RENDER_MAX_RSS_MB
+# desde o aquecimento (0 desliga cada limite).
+# Os outros formatos (DOCX, HTML, texto) passam pelo mesmo pool: o documento do currículo é
+# montado uma vez, aqui, e cada formato pedido vira uma tarefa, em paralelo nos processos livres.
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", os.cpu_count() or 1))
+RENDER_QUEUE_MAX = int(os.getenv("RENDER_QUEUE_MAX", "32"))
+RENDER_MAX_PDFS = int(os.getenv("RENDER_MAX_PDFS", "1000"))
+RENDER_MAX_RSS_MB = int(os.getenv("RENDER_MAX_RSS_MB", "256"))
+
+class FilaRenderCheia(Exception):
+    """Todas as vagas do pool de renderização (workers + fila) estão ocupadas."""
+
+def serializar_dados(cv):
+    # Só o currículo vai para o worker (o resto do user_data é estado da conversa), na forma posicional
+    return pickle.dumps(cv.para_tupla(), protocol=pickle.HIGHEST_PROTOCOL)
+
+def serializar_documento(cv):
+    # O documento já resolvido (templates, condições, listas): o mesmo payload vai para cada formato
+    return pickle.dumps(documento_cv(cv), protocol=pickle.HIGHEST_PROTOCOL)
+
+def _renderizar_no_worker(formato, payload, enviado_em):
+    # Executado dentro do processo do pool (que já importou o pdf_cv no aquecimento)
+    inicio = time.time()
+    # bytes imutáveis: o processo principal entrega o mesmo objeto ao cache e ao upload, sem cópias
+    dados = renderizar(formato, pickle.loads(payload))
+    fim = time.time()
+    return dados, inicio - enviado_em, fim - inicio
+
+def aquecer_render():
+    """Aquecimento dos processos de render: o fpdf2, as fontes e um PDF do currículo de exemplo da ficha."""
+    from pdf_cv import gerar_pdf, preparar_fontes
+
+    preparar_fontes()
+    cv, _ = montar_curriculo(ler_ficha(MODELO_FICHA)[0])
+    gerar_pdf(cv).output()
+
+class RenderPool:
+    def __init__(self, workers=RENDER_WORKERS, queue_max=RENDER_QUEUE_MAX, contexto=None):
+        self.workers = max(1, workers)
+        self.queue_max = max(0, queue_max)
+        self.pendentes = 0
+        self.processos = PoolAquecido(self.workers, _renderizar_no_worker, aquecer_render,
+                                      RENDER_MAX_PDFS, RENDER_MAX_RSS_MB, contexto)
+
+    def iniciar(self):
+        self.processos.iniciar()
+
+    async def renderizar(self, cv, afinidade=None):
+        return (await self.renderizar_formatos(cv, ('pdf',), afinidade))['pdf']
+
+    async def renderizar_formatos(self, cv, formatos, afinidade=None):
+        """O currículo em cada formato pedido, renderizados em paralelo; devolve formato -> bytes.
+
+        `afinidade` (o user_id) leva o PDF, de preferência, ao processo que renderizou os anteriores do usuário.
+        """
+        if self.pendentes >= self.workers + self.queue_max:
+            raise FilaRenderCheia()
+        self.pendentes += len(formatos)
+        try:
+            # Serializa já aqui: o currículo pode mudar enquanto os arquivos estão na fila
+            payload = serializar_documento(cv)
+            enviado_em = time.time()
+            # Só o PDF usa o cache de layout do processo; os outros formatos vão para qualquer um
+            resultados = await asyncio.gather(*(
+                self.processos.executar(formato, payload, enviado_em,
+                                        afinidade=afinidade if formato == 'pdf' else None)
+                for formato in formatos))
+        finally:
+            self.pendentes -= len(formatos)
+        arquivos = {}
+        for formato, (dados, espera, render) in zip(formatos, resultados):
+            metricas.arquivos_gerados.inc(formato)
+            if formato == 'pdf':
+                metricas.pdf_fila_segundos.observar(max(0.0, espera))
+                metricas.pdf_render_segundos.observar(render)
+                metricas.pdf_bytes.observar(len(dados))
+            logger.info("%s renderizado: fila %.1f ms, render %.1f ms, %d bytes", FORMATOS_SAIDA[formato].rotulo,
+                        espera * 1000, render * 1000, len(dados))
+            arquivos[formato] = dados
+        return arquivos
+
+    def shutdown(self):
+        self.processos.shutdown()
+
+render_pool = RenderPool()
+
+# --- Cache de PDFs já gerados ---
+# Muda sempre que o layout muda, para não reaproveitar PDFs antigos do cache em disco
+VERSAO_LAYOUT = '2'
+PDF_CACHE_MB = int(os.getenv("PDF_CACHE_MB", "64"))
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "")
+
+cache_pdf = CachePDF(PDF_CACHE_MB * 1024 * 1024, PDF_CACHE_DIR or None)
+
+def chave_render(cv, formato='pdf', tupla=None):
+    # Os outros formatos dividem o cache com os PDFs; só o PDF depende da fonte e do perfil
+    versao = f"{VERSAO_LAYOUT}/{PDF_FONTE}/{PDF_PERFIL}" if formato == 'pdf' else f"{VERSAO_LAYOUT}/{formato}"
+    return chave_conteudo(cv.para_tupla() if tupla is None else tupla, versao)
+
+# Contadores de entrega dos PDFs (uploads de fato vs reenvios pelo file_id)
+entregas = {'uploads': 0, 'bytes_enviados': 0, 'reenvios_file_id': 0, 'file_ids_recusados': 0}
+
+metrica_cache_pdf = metricas.Gauge('bot_pdf_cache', 'Estatísticas do cache de PDFs.', ('tipo',))
+metrica_entregas = metricas.Gauge('bot_pdf_entregas', 'Entregas de PDF (uploads vs reenvios por file_id).', ('tipo',))
+
+def _coletar_cache_pdf():
+    for tipo, valor in cache_pdf.estatisticas().items():
+        metrica_cache_pdf.set(valor, tipo)
+    for tipo, valor in entregas.items():
+        metrica_entregas.set(valor, tipo)
+
+metricas.COLETORES.append(_coletar_cache_pdf)
+
+# --- Currículo em construção e entrega dos arquivos ---
+
+def curriculo(context):
+    cv = context.user_data.get('cv')
+    if cv is None:
+        cv = context.user_data['cv'] = Curriculo()
+    return cv
+
+async def obter_arquivos(cv, formatos, afinidade=None):
+    """Arquivos do currículo, na ordem de `formatos`: do cache ou renderizados juntos no pool.
+
+    Devolve [(formato, chave, entrada do cache)]. Pode levantar FilaRenderCheia.
+    """
+    tupla = cv.para_tupla()
+    chaves = {formato: chave_render(cv, formato, tupla) for formato in formatos}
+    entradas = {formato: cache_pdf.get(chave, formato) for formato, chave in chaves.items()}
+    faltando = [formato for formato, entrada in entradas.items() if entrada is None]
+    if faltando:
+        for formato, dados in (await render_pool.renderizar_formatos(cv, faltando, afinidade)).items():
+            entradas[formato] = cache_pdf.put(chaves[formato], dados, formato)
+    return [(formato, chaves[formato], entradas[formato]) for formato in formatos]
+
+async def obter_pdf(cv, afinidade=None):
+    """PDF do currículo: do cache ou renderizado no pool; devolve (chave, entrada do cache). Pode levantar FilaRenderCheia."""
+    _, chave, entrada = (await obter_arquivos(cv, ('pdf',), afinidade))[0]
+    return chave, entrada
+
+async def enviar_arquivo(mensagem, chave, entrada, formato='pdf', legenda=None):
+    if entrada.file_id:
+        # Mesmo arquivo já enviado antes: o Telegram reaproveita o arquivo, sem novo upload
+        try:
+            await mensagem.reply_document(document=entrada.file_id, caption=legenda)
+            entregas['reenvios_file_id'] += 1
+            return
+        except BadRequest as e:
+            # file_id de outro token (o .fileid do disco sobrevive à troca) ou que o Telegram não
+            # reconhece mais: esquece o id e envia os bytes
+            logger.warning("file_id recusado pelo Telegram (%s); o arquivo vai por upload", e)
+            entregas['file_ids_recusados'] += 1
+            cache_pdf.descartar_file_id(chave)
+    # Os bytes vão direto para o InputFile (sem BytesIO, que copiaria o arquivo de novo)
+    enviada = await mensagem.reply_document(document=entrada.dados, filename=f"curriculo.{formato}", caption=legenda)
+    entregas['uploads'] += 1
+    entregas['bytes_enviados'] += len(entrada.dados)
+    if enviada.document:
+        cache_pdf.registrar_file_id(chave, enviada.document.file_id)
+
+async def entregar_curriculo(update, context):
+    # Também encerra uma edição, que pode terminar num botão (sem update.message)
+    mensagem = update.effective_message
+    user_data = context.user_data
+    formatos = user_data.get('formatos') or ['pdf']
+    try:
+        arquivos = await obter_arquivos(curriculo(context), formatos, update.effective_user.id)
+    except FilaRenderCheia:
+        await mensagem.reply_text("⏳ Muitos currículos sendo gerados agora. Escolha os **formatos** de novo em alguns instantes.",
+                                  parse_mode='Markdown', reply_markup=PASSOS[FORMATOS].teclado)
+        user_data['current_state'] = FORMATOS
+        return FORMATOS
+    except Exception:
+        # Processo de render perdido (WorkerPerdido, ex: OOM killer) ou erro do renderizador: a
+        # conversa fica na escolha dos formatos, com o teclado, em vez de parar sem resposta
+        logger.exception("Falha ao gerar o currículo (formatos %s)", formatos)
+        await mensagem.reply_text("⚠️ Não foi possível gerar o currículo agora. Escolha os **formatos** para tentar de novo.",
+                                  parse_mode='Markdown', reply_markup=PASSOS[FORMATOS].teclado)
+        user_data['current_state'] = FORMATOS
+        return FORMATOS
+
+    editado = user_data.pop('editando', None) is not None
+    user_data.pop('cv_salvo', None)
+    user_data['cv_pronto'] = True
+    if editado:
+        await mensagem.reply_text("✏️ **Alteração salva!** Aqui está o seu currículo atualizado.", parse_mode='Markdown')
+    elif formatos == ['pdf']:
+        await mensagem.reply_text("🎉 **Parabéns!** Seu currículo foi **gerado com sucesso** e está sendo enviado para você agora mesmo!\n\nPor favor, **verifique o arquivo PDF** anexo.", parse_mode='Markdown')
     else:
-        pdf.cell(0, 6, "", 0, 1) # Nenhuma pós-graduação informada
-        pdf.set_x(left_margin)
-
-
-    secao("Experiência Profissional")
-    
-    if data.get('tipo_contrato') == '2':
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(0, 7, "Tipo de Contrato: Microempreendedor Individual (MEI)", 0, 1) 
-        pdf.set_x(left_margin)
-        pdf.set_font('Arial', '', 12)
-        tipos_trabalho = data.get('mei_trabalhos', '')
-        if tipos_trabalho:
-            pdf.set_font('Arial', 'B', 10)
-            pdf.cell(0, 6, "Principais Trabalhos/Serviços:", 0, 1) 
-            pdf.set_x(left_margin)
-            pdf.set_font('Arial', '', 10)
-            for item in tipos_trabalho.split(','):
-                if item.strip():
-                    pdf.set_x(left_margin + 5) 
-                    pdf.multi_cell(0, 5, f"- {item.strip()}", 0, 'L') # Reduzido para 5mm
-            pdf.set_x(left_margin) 
+        rotulos = ", ".join(FORMATOS_SAIDA[formato].rotulo for formato in formatos)
+        await mensagem.reply_text(f"🎉 **Parabéns!** Seu currículo foi **gerado com sucesso** e está sendo enviado para você agora mesmo!\n\nPor favor, **verifique os arquivos** anexos: {rotulos}.", parse_mode='Markdown')
+    for formato, chave, entrada in arquivos:
+        await enviar_arquivo(mensagem, chave, entrada, formato)
+    await mensagem.reply_text(
+        "---"
+        "✨ **Processo concluído!** Para corrigir uma seção, use */editar*; para um currículo novo, */start*.",
+        parse_mode='Markdown'
+    )
+
+    return ConversationHandler.END
+
+# --- Conversa declarativa ---
+# Cada estado é descrito uma única vez na tabela CONVERSA_CV (pergunta, validação, campo de
+# destino, próximo estado) e a tabela é compilada no import em PASSOS: estado -> Passo com
+# tudo já resolvido. Um único handler genérico atende todos os estados.
+# O item sendo preenchido é sempre o último da lista: entrar na primeira pergunta de uma
+# Repeticao cria o item (graduação, experiência, idioma), então não há índices no user_data.
+
+ERRO_ENTRADA = "⚠️ Entrada inválida! Tente novamente."
+ERRO_SIM_NAO = "⚠️ **Opção inválida!** Digite *S* para Sim ou *N* para Não:"
+
+class Pergunta:
+    """Resposta livre: validada, tratada e gravada em `campo` do item atual (ou do currículo).
+
+    `proximo`: estado seguinte (padrão: o próximo da tabela) ou função (valor, user_data) -> estado.
+    `zera`: campos do currículo esvaziados ao entrar no estado. `acao`: encerra a pergunta no lugar do `proximo`.
+    """
+    def __init__(self, estado, prompt, campo=None, validacao=None, erro=ERRO_ENTRADA, tratar=str.title,
+                 proximo=None, zera=(), acao=None):
+        self.estado = estado
+        self.prompt = prompt
+        self.campo = campo
+        self.validacao = validacao
+        self.erro = erro
+        self.tratar = tratar
+        self.proximo = proximo
+        self.zera = zera
+        self.acao = acao
+
+class Escolha:
+    """Resposta entre opções fixas: `opcoes` leva a resposta (em maiúsculas) ao próximo estado.
+
+    Respostas fora das opções vão para `senao` ou, sem ele, repetem a pergunta com `erro`.
+    `limpa`: por resposta, campos do item atual (ou do currículo) que ficam vazios.
+    `botoes`: rótulo do botão de cada resposta no teclado da pergunta (padrão: Sim/Não).
+    `acao`: encerra a escolha no lugar de um próximo estado; recebe o valor da opção, `acao(valor, update, context)`.
+    """
+    def __init__(self, estado, prompt, opcoes, campo=None, erro=ERRO_SIM_NAO, senao=None, limpa=None, zera=(),
+                 botoes=None, acao=None):
+        self.estado = estado
+        self.prompt = prompt
+        self.opcoes = opcoes
+        self.campo = campo
+        self.erro = erro
+        self.senao = senao
+        self.limpa = limpa
+        self.zera = zera
+        self.botoes = botoes
+        self.acao = acao
+
+class Repeticao:
+    """Perguntas repetidas para cada item de uma lista do currículo (entrar na primeira abre um item novo).
+
+    As respostas em `sair`, dadas na primeira pergunta, descartam o item aberto e levam ao estado indicado.
+    """
+    def __init__(self, lista, perguntas, sair=None):
+        self.lista = lista
+        self.perguntas = perguntas
+        self.sair = sair
+
+class Fim:
+    """Mensagem de despedida; entrar neste estado encerra a conversa."""
+    def __init__(self, estado, mensagem):
+        self.estado = estado
+        self.mensagem = mensagem
+
+def _atividades(texto):
+    # Uma por linha ou separadas por ';'; 'N' = não informar
+    return '' if texto.upper() == 'N' else texto.replace(';', '\n')
+
+def _rotulo_academico(user_data):
+    return "Graduação" if user_data.get('grupo_atual') == 'graduacoes' else "Pós-Graduação"
+
+PROMPT_TIPO_CONTRATO = (
+    "💼 Agora vamos para a **Experiência Profissional**.\nVocê se identifica como **trabalhador CLT** ou "
+    "**Microempreendedor Individual (MEI)**?\n\n*1* para **CLT**\n*2* para **MEI**"
+)
+PROMPT_OPCAO_SIM_NAO = "Digite *S* para Sim ou *N* para Não."
+BOTOES_SIM_NAO = {'S': "✅ Sim", 'N': "❌ Não"}
+BOTOES_POR_LINHA = 3
+PROMPT_SITUACAO = "Digite *C* para Concluído ou *I* para Incompleto (Cursando)."
+ERRO_SITUACAO = "⚠️ **Opção inválida!** " + PROMPT_SITUACAO
+
+def _prompt_empresa(user_data):
+    n = len(user_data['cv'].experiencias)
+    if n == 1:
+        return ("🏢 Perfeito! Qual o **nome da última empresa** que você trabalhou com **carteira assinada**?\n\n"
+                "*Se não houver, digite N para pular esta seção.*")
+    return f"Qual o **nome da próxima empresa** (Experiência {n})?\n\n*Se não houver, digite N para pular esta seção.*"
+
+def _bloco_formacao(rotulo, faculdade, curso, situacao, ano, exemplo_curso):
+    return (
+        Pergunta(faculdade, f"Qual o nome da **Universidade** ou **Faculdade** da {rotulo} {{n}}?", 'faculdade',
+                 _preenchido, "⚠️ **Nome da faculdade inválido!** Por favor, digite o nome da Universidade ou Faculdade."),
+        Pergunta(curso, f"Qual é o **Curso** da {rotulo} {{n}}? (Ex: {exemplo_curso})", 'curso',
+                 _preenchido, "⚠️ **Nome do curso inválido!** Por favor, digite o curso."),
+        Escolha(situacao, f"Qual a **situação** da {rotulo} {{n}}? {PROMPT_SITUACAO}",
+                {'C': ano, 'I': ADD_ACADEMIC_ITEM}, 'situacao', ERRO_SITUACAO, limpa={'I': ('ano',)},
+                botoes={'C': "Concluído", 'I': "Cursando"}),
+        Pergunta(ano, f"Em que **ano** a {rotulo} {{n}} foi **concluída**? (Ex: 2025)", 'ano',
+                 validar_ano, "⚠️ **Ano inválido!** Digite o ano com 4 dígitos. Ex: 2025", tratar=None,
+                 proximo=ADD_ACADEMIC_ITEM),
+    )
+
+# Primeiro estado de cada seção, pela opção do /editar
+SECOES_EDITAVEIS = {'1': NOME, '2': FORMA_2GRAU, '3': TIPO_CONTRATO, '4': IDIOMAS_SIM, '5': CURSOS}
+INICIO_SECOES = frozenset(SECOES_EDITAVEIS.values())
+
+def _editar_secao(inicio):
+    def editar(valor, user_data):
+        user_data['editando'] = inicio
+        return inicio
+    return editar
+
+# Formatos de cada opção do fim da conversa (lista: o user_data é gravado como JSON)
+OPCOES_FORMATOS = {'1': ['pdf'], '2': ['docx'], '3': ['pdf', 'docx'], '4': ['txt'], '5': ['pdf', 'docx', 'html', 'txt']}
+
+async def depois_dos_cursos(update, context):
+    # Na edição dos cursos os formatos já foram escolhidos: entrega direto
+    if context.user_data.get('editando') is not None:
+        return await entregar_curriculo(update, context)
+    return await entrar(FORMATOS, update, context)
+
+async def escolher_formatos(formatos, update, context):
+    context.user_data['formatos'] = list(formatos)
+    return await entregar_curriculo(update, context)
+
+CONVERSA_CV = (
+    Escolha(ESCOLHA,
+            "👋 **Olá!** Que bom ter você aqui! Vamos criar seu **Currículo** de forma **simples e gratuita** em poucos minutos.\n\n"
+            "Para **começar**, digite *S*. Se preferir sair, digite *N*.\n\n"
+            "⚡ Já tem tudo em mãos? Use /rapido para enviar o currículo inteiro numa única mensagem.",
+            {'S': NOME}, senao=CANCEL, botoes={'S': "✅ Começar", 'N': "❌ Sair"}),
+    Pergunta(NOME, "📌 Agora, me diga seu **nome completo**, por favor:", 'nome', validar_texto,
+             "⚠️ **Nome inválido!** Por favor, digite seu nome completo (mínimo 2 palavras)."),
+    Pergunta(IDADE, "🎂 Qual a sua **idade**? (Apenas números, entre 14 e 99 anos)", 'idade', validar_idade,
+             "⚠️ **Idade inválida!** Digite apenas números entre 14 e 99 anos.", tratar=None),
+    Pergunta(ESTADO_CIVIL, "💍 Para seguirmos, qual o seu **estado civil**? (Ex: Solteiro(a), Casado(a))", 'estado_civil'),
+    Pergunta(TELEFONE, "📞 Certo! Agora, me informe seu **telefone** (apenas números, com DDD):", 'telefone',
+             validar_telefone, "⚠️ **Telefone inválido!** Use apenas números (8 a 15 dígitos) com DDD.", tratar=None),
+    Pergunta(EMAIL, "📧 Por favor, digite seu **melhor e-mail** para contato:", 'email', validar_email,
+             "⚠️ **E-mail inválido!** Por favor, verifique e tente novamente. Ex: seu.email@dominio.com", tratar=str.lower),
+
+    # Formação Acadêmica
+    Escolha(FORMA_2GRAU,
+            "✅ Vamos para a **Formação Acadêmica**.\nVocê **concluiu** o **Ensino Médio**? " + PROMPT_OPCAO_SIM_NAO,
+            {'S': ANO_2GRAU, 'N': TIPO_CONTRATO}, 'forma_2grau',
+            limpa={'N': ('ano_2grau', 'graduacoes', 'pos_graduacoes')}),
+    Pergunta(ANO_2GRAU, "Ótimo! Em que **ano** você **concluiu** o Ensino Médio? (Ex: 2020)", 'ano_2grau', validar_ano,
+             "⚠️ **Ano inválido!** Digite o ano com 4 dígitos. Ex: 2020", tratar=None),
+    Pergunta(ASK_QTD_GRAD, "Interessante! Quantas **Graduações** você possui atualmente? (Digite *0* se não tiver nenhuma)",
+             validacao=str.isdecimal, erro="⚠️ **Quantidade inválida!** Digite um número inteiro (Ex: 0, 1, 2).", tratar=None,
+             proximo=lambda qtd, user_data: ASK_FACULDADE if int(qtd) > 0 else ASK_QTD_POS,
+             zera=('graduacoes', 'pos_graduacoes')),
+    Repeticao('graduacoes', _bloco_formacao("Graduação", ASK_FACULDADE, ASK_CURSO, ASK_SITUACAO, ASK_ANO_GRAD,
+                                            "Engenharia Civil")),
+    Pergunta(ASK_QTD_POS, "Ótimo! Quantas **Pós-Graduações** você possui? (Digite *0* se não tiver nenhuma)",
+             validacao=str.isdecimal, erro="⚠️ **Quantidade inválida!** Digite um número inteiro (Ex: 0, 1, 2).", tratar=None,
+             proximo=lambda qtd, user_data: ASK_POS_FACULDADE if int(qtd) > 0 else TIPO_CONTRATO),
+    Repeticao('pos_graduacoes', _bloco_formacao("Pós-Graduação", ASK_POS_FACULDADE, ASK_POS_CURSO, ASK_POS_SITUACAO,
+                                                ASK_POS_ANO, "MBA em Gestão")),
+    # Graduação e pós-graduação compartilham o "adicionar outra"; o grupo aberto decide o destino
+    Escolha(ADD_ACADEMIC_ITEM,
+            lambda user_data: f"Deseja adicionar **outra {_rotulo_academico(user_data)}**? {PROMPT_OPCAO_SIM_NAO}", {
+                'S': lambda valor, user_data: ASK_FACULDADE if user_data.get('grupo_atual') == 'graduacoes' else ASK_POS_FACULDADE,
+                'N': lambda valor, user_data: ASK_QTD_POS if user_data.get('grupo_atual') == 'graduacoes' else TIPO_CONTRATO,
+            }),
+
+    # Experiência Profissional
+    Escolha(TIPO_CONTRATO, PROMPT_TIPO_CONTRATO, {'1': EMPRESA, '2': MEI_TRABALHOS}, 'tipo_contrato',
+            "⚠️ **Opção inválida!** Digite *1* para CLT ou *2* para Microempreendedor Individual.",
+            zera=('experiencias', 'mei_trabalhos'), botoes={'1': "CLT", '2': "MEI"}),
+    Pergunta(MEI_TRABALHOS,
+             "Entendido! Como **MEI**, quais são os principais **tipos de trabalho** ou serviços que você realiza? "
+             "Liste-os **separados por vírgula**.\n\n*Ex: Desenvolvedor Web, Consultor de Marketing, Designer Gráfico*",
+             'mei_trabalhos', tratar=None, proximo=IDIOMAS_SIM),
+    Repeticao('experiencias', (
+        Pergunta(EMPRESA, _prompt_empresa, 'empresa', _preenchido,
+                 "⚠️ **Nome da empresa inválido!** Por favor, digite o nome da empresa ou 'N' para pular."),
+        Pergunta(CARGO, "Qual o **cargo exercido** na {empresa}?", 'cargo', _preenchido,
+                 "⚠️ **Cargo inválido!** Por favor, digite o cargo exercido."),
+        Pergunta(ADM, "Agora, qual a **data de admissão**? (Formato obrigatório MM/YYYY. Ex: 01/2020)", 'adm',
+                 validar_mes_ano, "⚠️ **Data inválida!** Formato obrigatório MM/YYYY ou 'Atual'."),
+        Pergunta(DEM, "E a **data de demissão ou saída**? (Formato obrigatório MM/YYYY ou 'Atual'. Ex: 12/2022 ou Atual)", 'dem',
+                 validar_mes_ano, "⚠️ **Data inválida!** Formato obrigatório MM/YYYY ou 'Atual'."),
+        Pergunta(ATIVIDADES,
+                 "Liste suas **principais atividades e responsabilidades** neste cargo.\nVocê pode usar uma por linha ou "
+                 "separá-las por ponto e vírgula (;).\n\n*Exemplo:*\n*- Gestão de projetos*\n*- Desenvolvimento de software*\n\n"
+                 "*Se preferir não informar, digite N.*",
+                 'atividades', tratar=_atividades),
+        Pergunta(RESULTADOS,
+                 "Excelente! E quais foram seus **principais resultados ou conquistas** nessa experiência? (Seja específico, "
+                 "com números se possível!)\n\nVocê pode usar uma por linha ou separá-las por ponto e vírgula (;).\n\n"
+                 "*Exemplo:*\n*- Redução de custos em 15%*\n*- Aumento de vendas em 20%*\n\n*Se preferir não informar, digite N.*",
+                 'resultados', tratar=_atividades),
+    ), sair={'N': IDIOMAS_SIM}),
+    Escolha(ADD_EMP, "Deseja adicionar **outra Experiência Profissional**? " + PROMPT_OPCAO_SIM_NAO,
+            {'S': EMPRESA, 'N': IDIOMAS_SIM}),
+
+    # Idiomas
+    Escolha(IDIOMAS_SIM,
+            "🗣️ Chegamos na seção de **Idiomas**! Você possui algum **curso de idioma**?\n\n" + PROMPT_OPCAO_SIM_NAO,
+            {'S': ASK_IDIOMA_INST, 'N': CURSOS}, erro="⚠️ **Opção inválida!** Responda *S* para Sim ou *N* para Não:",
+            zera=('idiomas',)),
+    Repeticao('idiomas', (
+        Pergunta(ASK_IDIOMA_INST, "Qual a **instituição** do idioma {n}?", 'instituicao', _preenchido,
+                 "⚠️ **Instituição inválida!** Por favor, digite o nome da instituição do idioma."),
+        Pergunta(ASK_IDIOMA_NOME, "Qual o **nome do idioma** {n}? (Ex: Inglês)", 'nome_idioma', _preenchido,
+                 "⚠️ **Nome do idioma inválido!** Por favor, digite o nome do idioma."),
+        Escolha(ASK_IDIOMA_NIVEL,
+                "Qual o **nível de proficiência** do idioma {n}? Digite a letra correspondente:\n\n"
+                "*B* para **Básico**\n*I* para **Intermediário**\n*A* para **Avançado**",
+                dict.fromkeys(NIVEIS_IDIOMA, ASK_IDIOMA_INI), 'nivel',
+                "⚠️ **Nível inválido!** Digite *B* (Básico), *I* (Intermediário) ou *A* (Avançado).", botoes=NIVEIS_IDIOMA),
+        Pergunta(ASK_IDIOMA_INI, "Em que **ano** você **iniciou** o curso de idioma {n}? (Ex: 2020)", 'ini',
+                 validar_ano, "⚠️ **Ano inválido!** Digite o ano com 4 dígitos. Ex: 2020.", tratar=None),
+        Pergunta(ASK_IDIOMA_FIM,
+                 "Em que **ano** você **concluiu** o idioma {n}? Ou digite **Cursando** se ainda estiver estudando.\n\n"
+                 "*Ex: 2018 ou Cursando*",
+                 'fim', validar_ano_ou_cursando,
+                 "⚠️ **Entrada inválida!** Digite o ano com 4 dígitos (Ex: 2018) ou 'Cursando'.", tratar=str.upper),
+    )),
+    Escolha(ADD_IDIOMA, "Deseja adicionar **outro idioma**? " + PROMPT_OPCAO_SIM_NAO, {'S': ASK_IDIOMA_INST, 'N': CURSOS}),
+
+    # Cursos adicionais e, por fim, os formatos: a escolha dispara a geração dos arquivos
+    Pergunta(CURSOS,
+             "📚 Para finalizar, liste seus **cursos adicionais** e **certificações** (se houver), separados por vírgula.\n\n"
+             "*Ex: Java, JavaScript, Excel Avançado, Liderança e Gestão de Equipes*",
+             'cursos', tratar=None, acao=depois_dos_cursos),
+    Escolha(FORMATOS,
+            "📎 Em qual **formato** você quer o currículo?\n\n"
+            "*1* PDF\n*2* Word (DOCX), para editar\n*3* PDF e Word\n*4* Texto, para colar em sites de vagas\n"
+            "*5* Todos (PDF, Word, HTML e texto)",
+            OPCOES_FORMATOS, erro="⚠️ **Opção inválida!** Digite um número de *1* a *5*.", acao=escolher_formatos,
+            botoes={'1': "📄 PDF", '2': "📝 Word", '3': "📄 PDF + Word", '4': "🔤 Texto", '5': "📦 Todos"}),
+    Fim(CANCEL, "✅ Processo encerrado. Use /start para começar novamente."),
+
+    # /editar: refaz só as perguntas de uma seção; chegar ao início de outra seção gera o PDF
+    Escolha(EDITAR,
+            "✏️ Qual **seção** você quer corrigir? As outras continuam como estão.\n\n"
+            "*1* Dados pessoais\n*2* Formação acadêmica\n*3* Experiência profissional\n*4* Idiomas\n*5* Cursos adicionais",
+            {opcao: _editar_secao(inicio) for opcao, inicio in SECOES_EDITAVEIS.items()},
+            erro="⚠️ **Opção inválida!** Digite um número de *1* a *5*.",
+            botoes={'1': "👤 Dados pessoais", '2': "🎓 Formação", '3': "💼 Experiência", '4': "🗣️ Idiomas",
+                    '5': "📚 Cursos"}),
+)
+
+class Passo:
+    # Estado compilado: o que o handler genérico precisa, sem nenhuma busca na tabela
+    __slots__ = ('estado', 'nome', 'pergunta', 'prompt', 'lista', 'campo', 'validacao', 'erro', 'tratar', 'opcoes',
+                 'senao', 'limpa', 'proximo', 'zera', 'abre', 'ao_entrar', 'sair', 'acao', 'fim', 'botoes', 'teclado')
+
+    def __init__(self, estado, prompt, lista=None):
+        self.estado = estado
+        self.nome = NOMES_ESTADOS[estado]
+        # Pergunta fixa já pronta; as que dependem do item atual são montadas por self.prompt
+        if isinstance(prompt, str) and '{' not in prompt:
+            self.pergunta, self.prompt = prompt, None
         else:
-            pdf.cell(0, 6, "", 0, 1) # "Nenhum tipo de trabalho MEI informado"
-            pdf.set_x(left_margin)
-    
-    elif data.get('tipo_contrato') == '1': 
-        experiencias = data.get('experiencias', [])
-        if experiencias:
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(0, 7, "Tipo de Contrato: CLT", 0, 1) 
-            pdf.set_x(left_margin)
-            for i, exp in enumerate(experiencias):
-                pdf.ln(1) # Pequeno espaçamento entre as experiências
-                pdf.set_x(left_margin)
-                pdf.set_font('Arial', 'B', 12)
-                pdf.cell(0, 7, f"Empresa {i+1}: {exp.get('empresa', '')}", 0, 1) 
-                pdf.set_x(left_margin)
-                pdf.set_font('Arial', '', 12)
-                pdf.cell(0, 5, f"Período: {exp.get('adm', '')} a {exp.get('dem', '')}", 0, 1) # Reduzido para 5mm
-                pdf.set_x(left_margin)
-                
-                atividades = exp.get('atividades', '')
-                if atividades:
-                    pdf.set_font('Arial', 'B', 10)
-                    pdf.cell(0, 6, "Principais Atividades:", 0, 1) 
-                    pdf.set_x(left_margin)
-                    pdf.set_font('Arial', '', 10)
-                    for item in atividades.split('\n'):
-                        if item.strip():
-                            pdf.set_x(left_margin + 5) 
-                            pdf.multi_cell(0, 5, f"- {item.strip()}", 0, 'L') # Reduzido para 5mm
-                    pdf.set_x(left_margin) 
-                
-                resultados = exp.get('resultados', '')
-                if resultados:
-                    pdf.set_font('Arial', 'B', 10)
-                    pdf.cell(0, 6, "Principais Resultados:", 0, 1) 
-                    pdf.set_x(left_margin)
-                    pdf.set_font('Arial', '', 10)
-                    for item in resultados.split('\n'):
-                        if item.strip():
-                            pdf.set_x(left_margin + 5) 
-                            pdf.multi_cell(0, 5, f"- {item.strip()}", 0, 'L') # Reduzido para 5mm
-                    pdf.set_x(left_margin) 
-                pdf.ln(1) # Espaçamento entre blocos de experiência
+            self.pergunta, self.prompt = None, _prompt_fn(prompt, lista)
+        self.lista = lista
+        self.campo = self.validacao = self.tratar = self.opcoes = self.senao = None
+        self.limpa = self.proximo = self.abre = self.sair = self.acao = None
+        self.botoes = self.teclado = None
+        self.erro = ERRO_ENTRADA
+        self.zera = ()
+        self.ao_entrar = self.fim = False
+
+def _vazio_do_campo(campo):
+    return list if campo in LISTAS else str
+
+def _prompt_fn(prompt, lista):
+    # Função user_data -> texto da pergunta (perguntas fixas ficam em Passo.pergunta)
+    if callable(prompt):
+        return prompt
+    if lista is None:
+        return lambda user_data: prompt.format_map(_Valores(user_data['cv'], 0))
+    partes = list(string.Formatter().parse(prompt))
+    if len(partes) == 2 and partes[0][1] == 'n' and partes[1][1] is None:
+        # Só o número do item: concatenação direta, sem o parse do str.format a cada mensagem
+        antes, depois = partes[0][0], partes[1][0]
+        return lambda user_data: antes + str(len(getattr(user_data['cv'], lista))) + depois
+    def formatar(user_data):
+        itens = getattr(user_data['cv'], lista)
+        return prompt.format_map(_Valores(itens[-1], len(itens)))
+    return formatar
+
+def _achatar(nos, lista=None, sair=None):
+    for no in nos:
+        if isinstance(no, Repeticao):
+            yield from _achatar(no.perguntas[:1], no.lista, no.sair)
+            yield from _achatar(no.perguntas[1:], no.lista)
         else:
-            pdf.cell(0, 6, "", 0, 1) # "Nenhuma experiência profissional CLT informada"
-            pdf.set_x(left_margin)
-    else: 
-        pdf.cell(0, 6, "", 0, 1) # "Nenhuma experiência profissional informada" 
-        pdf.set_x(left_margin)
-
-
-    secao("Idiomas")
-    idiomas = data.get('idiomas', [])
-    if idiomas:
-        nivel_map = {'B': 'Básico', 'I': 'Intermediário', 'A': 'Avançado'}
-        for i, lang in enumerate(idiomas):
-            pdf.ln(1) # Pequeno espaçamento entre os idiomas
-            pdf.set_x(left_margin)
-            pdf.set_font('Arial', 'B', 11)
-            pdf.cell(0, 7, f"Idioma {i+1}:", 0, 1) # Título de idioma ligeiramente maior
-            pdf.set_font('Arial', '', 11)
-
-            pdf.set_x(left_margin + 5) 
-            pdf.cell(0, 5, f"Instituição: {lang.get('instituicao', '')}", 0, 1) # Reduzido para 5mm
-            pdf.set_x(left_margin + 5)
-            pdf.cell(0, 5, f"Idioma: {lang.get('nome_idioma', '')}", 0, 1) # CORRIGIDO AQUI!
-            pdf.set_x(left_margin + 5)
-            nivel = lang.get('nivel', '').upper()
-            pdf.cell(0, 5, f"Nível: {nivel_map.get(nivel, nivel)}", 0, 1) # Reduzido para 5mm
-            pdf.set_x(left_margin + 5)
-            
-            fim_idioma = lang.get('fim', '')
-            if fim_idioma.upper() == 'CURSANDO':
-                pdf.cell(0, 5, f"Início: {lang.get('ini', '')}    |    Situação: Cursando", 0, 1) # Reduzido para 5mm
-            else:
-                pdf.cell(0, 5, f"Início: {lang.get('ini', '')}    |    Conclusão: {fim_idioma}", 0, 1) # Reduzido para 5mm
-            pdf.set_x(left_margin) 
-    else:
-        pdf.cell(0, 6, "", 0, 1) # "Nenhum idioma informado"
-        pdf.set_x(left_margin)
-
-    secao("Cursos Adicionais")
-    cursos = data.get('cursos', '')
-    if cursos:
-        for item in cursos.split(','):
-            if item.strip(): 
-                pdf.set_x(left_margin + 5) 
-                pdf.cell(0, 6, f"- {item.strip()}", 0, 1) # Reduzido para 6mm
-        pdf.set_x(left_margin) 
-    else:
-        pdf.cell(0, 6, "", 0, 1) # "Nenhum curso adicional informado" 
-        pdf.set_x(left_margin)
-
-    return pdf
-
-# --- Funções Auxiliares Genéricas para Perguntas (Refatoradas) ---
-
-async def ask_text_standard(update: Update, context: ContextTypes.DEFAULT_TYPE, prompt: str, field_key: str, next_state, validation_func=None, error_message: str = "⚠️ Entrada inválida! Tente novamente."):
-    text = update.message.text.strip()
-
-    if validation_func and not validation_func(text):
-        await update.message.reply_text(error_message)
-        return context.user_data.get('current_state')
-
-    if field_key not in ['faculdade', 'curso', 'situacao', 'ano', 'empresa', 'cargo', 'adm', 'dem', 'atividades', 'resultados', 'instituicao', 'nome_idioma', 'nivel', 'ini', 'fim', 'mei_trabalhos']:
-        context.user_data[field_key] = text.title() if field_key not in ['email'] else text.lower()
-    else: # Lida com os campos dentro de listas (acadêmico, experiência, idioma)
-        current_level = context.user_data.get('current_academic_level')
-        current_emp_index = context.user_data.get('current_emp_index')
-        current_idioma_index = context.user_data.get('current_idioma_index')
-
-        if field_key in ['faculdade', 'curso', 'situacao', 'ano']:
-            idx = context.user_data['current_academic_index']
-            if idx >= len(context.user_data.get('graduacoes', [])):
-                context.user_data.setdefault('graduacoes', []).append({})
-            if current_level == 'graduacao':
-                context.user_data['graduacoes'][idx][field_key] = text.title()
-            elif current_level == 'pos_graduacao':
-                context.user_data['pos_graduacoes'][idx][field_key] = text.title()
-        elif field_key in ['empresa', 'cargo', 'adm', 'dem', 'atividades', 'resultados']:
-            idx = current_emp_index
-            if idx >= len(context.user_data.get('experiencias', [])):
-                context.user_data.setdefault('experiencias', []).append({})
-            
-            if field_key in ['atividades', 'resultados'] and text.upper() != 'N':
-                context.user_data['experiencias'][idx][field_key] = text.replace(';', '\n')
-            elif field_key in ['atividades', 'resultados'] and text.upper() == 'N':
-                context.user_data['experiencias'][idx][field_key] = ''
+            yield no, lista, sair
+
+def compilar_conversa(nos):
+    sequencia = list(_achatar(nos))
+    primeiras = {no.perguntas[0].estado for no in nos if isinstance(no, Repeticao)}
+    passos = {}
+    for i, (no, lista, sair) in enumerate(sequencia):
+        if no.estado in passos:
+            raise ValueError(f"Estado repetido na conversa: {NOMES_ESTADOS[no.estado]}")
+        if isinstance(no, Fim):
+            passo = Passo(no.estado, no.mensagem)
+            passo.fim = True
+        elif isinstance(no, (Pergunta, Escolha)):
+            passo = Passo(no.estado, no.prompt, lista)
+            passo.campo = no.campo
+            passo.erro = no.erro
+            passo.zera = tuple((campo, _vazio_do_campo(campo)) for campo in no.zera)
+            passo.acao = no.acao
+            if no.estado in primeiras:
+                passo.abre = LISTAS[lista]
+            if isinstance(no, Escolha):
+                passo.opcoes = dict(no.opcoes)
+                passo.senao = no.senao
+                passo.botoes = dict(no.botoes or {opcao: BOTOES_SIM_NAO.get(opcao) for opcao in no.opcoes})
+                if None in passo.botoes.values():
+                    raise ValueError(f"{passo.nome}: opções sem rótulo de botão")
+                # callback_data "estado:resposta": o botão só vale na pergunta que o criou
+                botoes = [InlineKeyboardButton(rotulo, callback_data=f"{no.estado}:{opcao}")
+                          for opcao, rotulo in passo.botoes.items()]
+                passo.teclado = InlineKeyboardMarkup([botoes[i:i + BOTOES_POR_LINHA]
+                                                      for i in range(0, len(botoes), BOTOES_POR_LINHA)])
+                if no.limpa:
+                    if no.campo is None:
+                        raise ValueError(f"{passo.nome}: 'limpa' exige 'campo'")
+                    campos = LISTAS[lista].__slots__ if lista else CAMPOS_CURRICULO
+                    passo.limpa = {
+                        resposta: tuple((campo, _vazio_do_campo(campo)) for campo in limpar)
+                        for resposta, limpar in no.limpa.items()
+                    }
+                    desconhecidos = {c for limpar in no.limpa.values() for c in limpar} - set(campos)
+                    if desconhecidos:
+                        raise ValueError(f"Campos desconhecidos em {passo.nome}: {sorted(desconhecidos)}")
             else:
-                context.user_data['experiencias'][idx][field_key] = text.title()
-        elif field_key in ['instituicao', 'nome_idioma', 'nivel', 'ini', 'fim']:
-            idx = current_idioma_index
-            if idx >= len(context.user_data.get('idiomas', [])):
-                context.user_data.setdefault('idiomas', []).append({})
-            context.user_data['idiomas'][idx][field_key] = text.title() if field_key not in ['nivel', 'ini', 'fim'] else text.upper()
-
-
-    await update.message.reply_text(prompt, parse_mode='Markdown')
-    context.user_data['current_state'] = next_state
-    return next_state
+                passo.sair = sair
+                passo.validacao = no.validacao
+                passo.tratar = no.tratar
+                if no.proximo is not None:
+                    passo.proximo = no.proximo
+                elif no.acao is None:
+                    if i + 1 == len(sequencia):
+                        raise ValueError(f"{passo.nome} não tem próximo estado")
+                    passo.proximo = sequencia[i + 1][0].estado
+        else:
+            raise TypeError(f"Nó de conversa desconhecido: {no!r}")
+        passo.ao_entrar = bool(passo.zera) or passo.abre is not None
+        passos[no.estado] = passo
+
+    # Todo destino citado na tabela precisa existir
+    for passo in passos.values():
+        # Com `acao`, as opções da Escolha são valores para a ação, não estados
+        opcoes = passo.opcoes if passo.acao is None else None
+        destinos = [passo.proximo, passo.senao, *(opcoes or {}).values(), *(passo.sair or {}).values()]
+        for destino in destinos:
+            if destino is not None and not callable(destino) and destino not in passos:
+                raise ValueError(f"{passo.nome} leva a um estado fora da conversa: {destino}")
+    return passos
+
+PASSOS = compilar_conversa(CONVERSA_CV)
+
+def _abrir(passo, user_data):
+    # Ações de entrada no estado: esvazia campos e abre o item novo da repetição
+    cv = user_data.get('cv')
+    if cv is None:
+        cv = user_data['cv'] = Curriculo()
+    for campo, vazio in passo.zera:
+        setattr(cv, campo, vazio())
+    if passo.abre is not None:
+        getattr(cv, passo.lista).append(passo.abre())
+        user_data['grupo_atual'] = passo.lista
+
+async def entrar(estado, update, context):
+    """Leva a conversa para `estado`: prepara o currículo, faz a pergunta e devolve o estado."""
+    user_data = context.user_data
+    if estado in INICIO_SECOES and user_data.get('editando', estado) != estado:
+        return await entregar_curriculo(update, context)
+    passo = PASSOS[estado]
+    if passo.ao_entrar:
+        _abrir(passo, user_data)
+    await update.message.reply_text(passo.pergunta or passo.prompt(user_data), parse_mode='Markdown',
+                                    reply_markup=passo.teclado)
+    if passo.fim:
+        return ConversationHandler.END
+    user_data['current_state'] = estado
+    return estado
+
+def criar_handler(passo):
+    """Handler do estado: o mesmo corpo genérico para todos, com o Passo já compilado."""
+    # Os atributos do passo viram variáveis da closure (mais baratas que o acesso ao atributo)
+    estado, lista, campo, erro, sair = passo.estado, passo.lista, passo.campo, passo.erro, passo.sair
+    opcoes, senao, limpa = passo.opcoes, passo.senao, passo.limpa
+    validacao, tratar, proximo, acao = passo.validacao, passo.tratar, passo.proximo, passo.acao
+
+    async def responder(update, context):
+        mensagem = update.message
+        texto = mensagem.text.strip()
+        user_data = context.user_data
+
+        if opcoes is not None:
+            valor = texto.upper()
+            destino = opcoes.get(valor, senao)
+            if destino is None:
+                await mensagem.reply_text(erro, parse_mode='Markdown')
+                return estado
+        else:
+            if sair is not None and texto.upper() in sair:
+                # O item aberto para esta pergunta fica de fora
+                getattr(curriculo(context), lista).pop()
+                return await entrar(sair[texto.upper()], update, context)
+            if validacao is not None and not validacao(texto):
+                await mensagem.reply_text(erro, parse_mode='Markdown')
+                return estado
+            valor = texto if tratar is None else tratar(texto)
+            destino = proximo
+
+        if campo is not None:
+            cv = user_data.get('cv') or curriculo(context)
+            alvo = cv if lista is None else getattr(cv, lista)[-1]
+            setattr(alvo, campo, valor)
+            if limpa is not None:
+                for nome_campo, vazio in limpa.get(valor, ()):
+                    setattr(alvo, nome_campo, vazio())
+
+        if acao is not None:
+            return await (acao(update, context) if opcoes is None else acao(destino, update, context))
+        if type(destino) is not int:
+            destino = destino(valor, user_data)
+        if destino in INICIO_SECOES and user_data.get('editando', destino) != destino:
+            # Fim da seção editada: as seguintes ficam como estavam
+            return await entregar_curriculo(update, context)
+        # Mesmo que entrar(), sem a corrotina extra no caminho de toda mensagem
+        seguinte = PASSOS[destino]
+        if seguinte.ao_entrar:
+            _abrir(seguinte, user_data)
+        await mensagem.reply_text(seguinte.pergunta or seguinte.prompt(user_data), parse_mode='Markdown',
+                                  reply_markup=seguinte.teclado)
+        if seguinte.fim:
+            return ConversationHandler.END
+        user_data['current_state'] = destino
+        return destino
+
+    responder.__name__ = responder.__qualname__ = passo.nome
+    return responder
+
+def criar_handler_botao(passo):
+    """Handler dos botões de uma Escolha: a mensagem da pergunta é editada com a próxima, sem mensagem nova."""
+    estado, lista, campo, limpa = passo.estado, passo.lista, passo.campo, passo.limpa
+    opcoes, senao, botoes, acao = passo.opcoes, passo.senao, passo.botoes, passo.acao
+
+    async def escolher(update, context):
+        consulta = update.callback_query
+        user_data = context.user_data
+        valor = consulta.data.partition(':')[2]
+        try:
+            await consulta.answer()
+        except BadRequest:
+            pass  # consulta antiga demais; a resposta vale do mesmo jeito
+        destino = opcoes.get(valor, senao)
+        if destino is None:
+            return estado
+
+        if campo is not None:
+            cv = user_data.get('cv') or curriculo(context)
+            alvo = cv if lista is None else getattr(cv, lista)[-1]
+            setattr(alvo, campo, valor)
+            if limpa is not None:
+                for nome_campo, vazio in limpa.get(valor, ()):
+                    setattr(alvo, nome_campo, vazio())
+
+        if acao is not None:
+            # A pergunta fica com a resposta escolhida, sem o teclado
+            try:
+                await consulta.edit_message_text(f"*{botoes[valor]}*", parse_mode='Markdown')
+            except BadRequest:
+                pass
+            return await acao(destino, update, context)
+        if type(destino) is not int:
+            destino = destino(valor, user_data)
+        if destino in INICIO_SECOES and user_data.get('editando', destino) != destino:
+            return await entregar_curriculo(update, context)
+        seguinte = PASSOS[destino]
+        if seguinte.ao_entrar:
+            _abrir(seguinte, user_data)
+        texto = f"*{botoes[valor]}*\n\n{seguinte.pergunta or seguinte.prompt(user_data)}"
+        try:
+            await consulta.edit_message_text(texto, parse_mode='Markdown', reply_markup=seguinte.teclado)
+        except BadRequest:
+            # Mensagem que não pode mais ser editada (antiga ou apagada): a pergunta vai numa nova
+            await consulta.message.reply_text(texto, parse_mode='Markdown', reply_markup=seguinte.teclado)
+        if seguinte.fim:
+            return ConversationHandler.END
+        user_data['current_state'] = destino
+        return destino
+
+    escolher.__name__ = escolher.__qualname__ = passo.nome
+    return escolher
+
+HANDLERS = {estado: criar_handler(passo) for estado, passo in PASSOS.items() if not passo.fim}
+HANDLERS_BOTAO = {estado: criar_handler_botao(passo) for estado, passo in PASSOS.items() if passo.teclado is not None}
+
+async def botao_expirado(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Botão de uma pergunta que já foi respondida (ou de uma conversa encerrada)
+    await update.callback_query.answer("Essa pergunta já foi respondida. Responda a última mensagem ou use /start.")
 
 # --- FUNÇÕES DO BOT ---
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.clear()
-    await update.message.reply_text(
-        "👋 **Olá!** Que bom ter você aqui! Vamos criar seu **Currículo** de forma **simples e gratuita** em poucos minutos.\n\n"
-        "Para **começar**, digite *S*. Se preferir sair, digite *N*.",
-        parse_mode='Markdown'
-    )
-    context.user_data['current_state'] = ESCOLHA
-    return ESCOLHA
+    context.user_data['cv'] = Curriculo()
+    return await entrar(ESCOLHA, update, context)
 
-async def escolha(update, context):
-    resposta = update.message.text.strip().upper()
-    if resposta != 'S':
-        await update.message.reply_text("✅ Processo encerrado. Use /start para começar novamente.")
+async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    user_data = context.user_data
+    if 'cv_salvo' in user_data:
+        # Edição interrompida: o currículo volta a ser o do último PDF
+        user_data['cv'] = Curriculo.de_tupla(user_data.pop('cv_salvo'))
+        user_data.pop('editando', None)
+        await update.message.reply_text("Edição cancelada; o currículo continua como estava. Use /editar para tentar de novo.")
         return ConversationHandler.END
-    await update.message.reply_text("📌 Agora, me diga seu **nome completo**, por favor:", parse_mode='Markdown')
-    context.user_data['current_state'] = NOME
-    return NOME
-
-async def nome(update, context):
-    return await ask_text_standard(update, context, "🎂 Qual a sua **idade**? (Apenas números, entre 14 e 99 anos)", 'nome', IDADE, validar_texto, "⚠️ **Nome inválido!** Por favor, digite seu nome completo (mínimo 2 palavras).")
-
-async def idade(update, context):
-    idade_text = update.message.text.strip()
-    if not idade_text.isdigit() or not (14 <= int(idade_text) <= 99):
-        await update.message.reply_text("⚠️ **Idade inválida!** Digite apenas números entre 14 e 99 anos.")
-        return IDADE
-    context.user_data['idade'] = idade_text
-    await update.message.reply_text("💍 Para seguirmos, qual o seu **estado civil**? (Ex: Solteiro(a), Casado(a))", parse_mode='Markdown')
-    context.user_data['current_state'] = ESTADO_CIVIL
-    return ESTADO_CIVIL
-
-async def estado_civil(update, context):
-    context.user_data['estado_civil'] = update.message.text.strip().title()
-    await update.message.reply_text("📞 Certo! Agora, me informe seu **telefone** (apenas números, com DDD):", parse_mode='Markdown')
-    context.user_data['current_state'] = TELEFONE
-    return TELEFONE
-
-async def telefone(update, context):
-    tel = update.message.text.strip()
-    if not validar_telefone(tel):
-        await update.message.reply_text("⚠️ **Telefone inválido!** Use apenas números (8 a 15 dígitos) com DDD.")
-        return TELEFONE
-    context.user_data['telefone'] = tel
-    await update.message.reply_text("📧 Por favor, digite seu **melhor e-mail** para contato:", parse_mode='Markdown')
-    context.user_data['current_state'] = EMAIL
-    return EMAIL
-
-async def email(update, context):
-    email_text = update.message.text.strip()
-    if not validar_email(email_text):
-        await update.message.reply_text("⚠️ **E-mail inválido!** Por favor, verifique e tente novamente. Ex: seu.email@dominio.com")
-        return EMAIL
-    context.user_data['email'] = email_text.lower()
-    await update.message.reply_text("✅ Vamos para a **Formação Acadêmica**.\nVocê **concluiu** o **Ensino Médio**? Digite *S* para Sim ou *N* para Não.", parse_mode='Markdown')
-    context.user_data['current_state'] = FORMA_2GRAU
-    return FORMA_2GRAU
-
-async def forma_2grau(update, context):
-    resposta = update.message.text.strip().upper()
-    if resposta not in ['S', 'N']:
-        await update.message.reply_text("⚠️ **Opção inválida!** Por favor, digite *S* para Sim ou *N* para Não:")
-        return FORMA_2GRAU
-    context.user_data['forma_2grau'] = resposta
-    if resposta == 'S':
-        await update.message.reply_text("Ótimo! Em que **ano** você **concluiu** o Ensino Médio? (Ex: 2020)", parse_mode='Markdown')
-        context.user_data['current_state'] = ANO_2GRAU
-        return ANO_2GRAU
-    else: 
-        context.user_data['ano_2grau'] = ''
-        context.user_data['graduacoes'] = [] 
-        context.user_data['pos_graduacoes'] = []
-        await update.message.reply_text(
-            "💼 Agora vamos para a **Experiência Profissional**.\nVocê se identifica como **trabalhador CLT** ou **Microempreendedor Individual (MEI)**?\n\n*1* para **CLT**\n*2* para **MEI**",
-            parse_mode='Markdown'
-        )
-        context.user_data['current_state'] = TIPO_CONTRATO
-        context.user_data['current_emp_index'] = 0
-        context.user_data['experiencias'] = []
-        context.user_data['mei_trabalhos'] = '' 
-        return TIPO_CONTRATO
-
-async def ano_2grau(update, context):
-    ano = update.message.text.strip()
-    if not validar_ano(ano):
-        await update.message.reply_text("⚠️ **Ano inválido!** Digite o ano com 4 dígitos. Ex: 2020")
-        return ANO_2GRAU
-    context.user_data['ano_2grau'] = ano
-    context.user_data['graduacoes'] = []
-    context.user_data['pos_graduacoes'] = []
-    await update.message.reply_text("Interessante! Quantas **Graduações** você possui atualmente? (Digite *0* se não tiver nenhuma)", parse_mode='Markdown')
-    context.user_data['current_state'] = ASK_QTD_GRAD
-    return ASK_QTD_GRAD
-
-# --- Funções para Formação Acadêmica (Graduação e Pós) ---
-
-async def ask_qtd_grad(update, context):
-    qtd = update.message.text.strip()
-    if not qtd.isdigit() or int(qtd) < 0:
-        await update.message.reply_text("⚠️ **Quantidade inválida!** Digite um número inteiro (Ex: 0, 1, 2).")
-        return ASK_QTD_GRAD
-    
-    context.user_data['qtd_grad'] = int(qtd)
-    context.user_data['current_academic_level'] = 'graduacao'
-    context.user_data['current_academic_index'] = 0
-
-    if int(qtd) > 0:
-        await update.message.reply_text(f"Por favor, digite o nome da **Universidade** ou **Faculdade** da sua Graduação {context.user_data['current_academic_index'] + 1}:", parse_mode='Markdown')
-        context.user_data['current_state'] = ASK_FACULDADE
-        return ASK_FACULDADE
-    else:
-        await update.message.reply_text("Ótimo! Quantas **Pós-Graduações** você possui? (Digite *0* se não tiver nenhuma)", parse_mode='Markdown')
-        context.user_data['current_state'] = ASK_QTD_POS
-        return ASK_QTD_POS
-
-async def ask_faculdade(update, context):
-    return await ask_text_standard(update, context, 
-                                   f"Qual é o **Curso** da Graduação {context.user_data['current_academic_index'] + 1}? (Ex: Engenharia Civil)", 
-                                   'faculdade', ASK_CURSO, 
-                                   lambda x: bool(x.strip()), "⚠️ **Nome da faculdade inválido!** Por favor, digite o nome da Universidade ou Faculdade.")
-
-async def ask_curso(update, context):
-    return await ask_text_standard(update, context, 
-                                   f"Qual a **situação** da sua Graduação {context.user_data['current_academic_index'] + 1}? Digite *C* para Concluído ou *I* para Incompleto (Cursando).", 
-                                   'curso', ASK_SITUACAO, 
-                                   lambda x: bool(x.strip()), "⚠️ **Nome do curso inválido!** Por favor, digite o curso.")
-
-async def ask_situacao(update, context):
-    sit = update.message.text.strip().upper()
-    if sit not in ['C', 'I']:
-        await update.message.reply_text("⚠️ **Opção inválida!** Digite *C* para Concluído ou *I* para Incompleto (Cursando).", parse_mode='Markdown')
-        return ASK_SITUACAO
-    
-    idx = context.user_data['current_academic_index']
-    context.user_data['graduacoes'][idx]['situacao'] = sit
-
-    if sit == 'C':
-        await update.message.reply_text(f"Em que **ano** a Graduação {idx+1} foi **concluída**? (Ex: 2025)", parse_mode='Markdown')
-        context.user_data['current_state'] = ASK_ANO_GRAD
-        return ASK_ANO_GRAD
-    else:
-        context.user_data['graduacoes'][idx]['ano'] = ''
-        await update.message.reply_text("Deseja adicionar **outra Graduação**? Digite *S* para Sim ou *N* para Não.", parse_mode='Markdown')
-        context.user_data['current_state'] = ADD_ACADEMIC_ITEM
-        return ADD_ACADEMIC_ITEM
-
-async def ask_ano_grad(update, context):
-    return await ask_text_standard(update, context, 
-                                   "Deseja adicionar **outra Graduação**? Digite *S* para Sim ou *N* para Não.", 
-                                   'ano', ADD_ACADEMIC_ITEM, 
-                                   validar_ano, "⚠️ **Ano inválido!** Digite o ano com 4 dígitos. Ex: 2025")
-
-async def add_academic_item(update, context):
-    resposta = update.message.text.strip().upper()
-    if resposta not in ['S', 'N']:
-        await update.message.reply_text("⚠️ **Opção inválida!** Digite *S* para Sim ou *N* para Não:", parse_mode='Markdown')
-        return ADD_ACADEMIC_ITEM
-
-    current_level = context.user_data['current_academic_level']
-
-    if resposta == 'S':
-        context.user_data['current_academic_index'] += 1
-        if current_level == 'graduacao':
-            await update.message.reply_text(f"Qual o nome da **Universidade** ou **Faculdade** da Graduação {context.user_data['current_academic_index'] + 1}?", parse_mode='Markdown')
-            context.user_data['current_state'] = ASK_FACULDADE
-            return ASK_FACULDADE
-        elif current_level == 'pos_graduacao':
-            await update.message.reply_text(f"Qual o nome da **Universidade** ou **Faculdade** da Pós-Graduação {context.user_data['current_academic_index'] + 1}?", parse_mode='Markdown')
-            context.user_data['current_state'] = ASK_POS_FACULDADE
-            return ASK_POS_FACULDADE
-    else: # Resposta 'N'
-        if current_level == 'graduacao':
-            await update.message.reply_text("Ótimo! Quantas **Pós-Graduações** você possui? (Digite *0* se não tiver nenhuma)", parse_mode='Markdown')
-            context.user_data['current_state'] = ASK_QTD_POS
-            return ASK_QTD_POS
-        elif current_level == 'pos_graduacao':
-            await update.message.reply_text(
-                "💼 Agora vamos para a **Experiência Profissional**.\nVocê se identifica como **trabalhador CLT** ou **Microempreendedor Individual (MEI)**?\n\n*1* para **CLT**\n*2* para **MEI**",
-                parse_mode='Markdown'
-            )
-            context.user_data['current_state'] = TIPO_CONTRATO
-            context.user_data['current_emp_index'] = 0
-            context.user_data['experiencias'] = []
-            context.user_data['mei_trabalhos'] = '' 
-            return TIPO_CONTRATO
-
-# Funções para Pós-Graduação
-async def ask_qtd_pos(update, context):
-    qtd = update.message.text.strip()
-    if not qtd.isdigit() or int(qtd) < 0:
-        await update.message.reply_text("⚠️ **Quantidade inválida!** Digite um número inteiro (Ex: 0, 1, 2).")
-        return ASK_QTD_POS
-    
-    context.user_data['qtd_pos'] = int(qtd)
-    context.user_data['current_academic_level'] = 'pos_graduacao'
-    context.user_data['current_academic_index'] = 0
-
-    if int(qtd) > 0:
-        await update.message.reply_text(f"Qual o nome da **Universidade** ou **Faculdade** da Pós-Graduação {context.user_data['current_academic_index'] + 1}?", parse_mode='Markdown')
-        context.user_data['current_state'] = ASK_POS_FACULDADE
-        return ASK_POS_FACULDADE
-    else:
-        await update.message.reply_text(
-            "💼 Agora vamos para a **Experiência Profissional**.\nVocê se identifica como **trabalhador CLT** ou **Microempreendedor Individual (MEI)**?\n\n*1* para **CLT**\n*2* para **MEI**",
-            parse_mode='Markdown'
-        )
-        context.user_data['current_state'] = TIPO_CONTRATO
-        context.user_data['current_emp_index'] = 0
-        context.user_data['experiencias'] = []
-        context.user_data['mei_trabalhos'] = '' 
-        return TIPO_CONTRATO
-
-async def ask_pos_faculdade(update, context):
-    return await ask_text_standard(update, context, 
-                                   f"Qual é o **Curso** da Pós-Graduação {context.user_data['current_academic_index'] + 1}? (Ex: MBA em Gestão)", 
-                                   'faculdade', ASK_POS_CURSO, 
-                                   lambda x: bool(x.strip()), "⚠️ **Nome da Faculdade inválido!** Por favor, digite o nome da Universidade ou Faculdade.")
-
-
-async def ask_pos_curso(update, context):
-    return await ask_text_standard(update, context, 
-                                   f"Qual a **situação** da Pós-Graduação {context.user_data['current_academic_index'] + 1}? Digite *C* para Concluído ou *I* para Incompleto (Cursando).", 
-                                   'curso', ASK_POS_SITUACAO, 
-                                   lambda x: bool(x.strip()), "⚠️ **Nome do curso inválido!** Por favor, digite o curso.")
-
-async def ask_pos_situacao(update, context):
-    sit = update.message.text.strip().upper()
-    if sit not in ['C', 'I']:
-        await update.message.reply_text("⚠️ **Opção inválida!** Digite *C* para Concluído ou *I* para Incompleto (Cursando).", parse_mode='Markdown')
-        return ASK_POS_SITUACAO
-    
-    idx = context.user_data['current_academic_index']
-    context.user_data['pos_graduacoes'][idx]['situacao'] = sit
-
-    if sit == 'C':
-        await update.message.reply_text(f"Em que **ano** a Pós-Graduação {idx+1} foi **concluída**? (Ex: 2025)", parse_mode='Markdown')
-        context.user_data['current_state'] = ASK_POS_ANO
-        return ASK_POS_ANO
-    else:
-        context.user_data['pos_graduacoes'][idx]['ano'] = ''
-        await update.message.reply_text("Deseja adicionar **outra Pós-Graduação**? Digite *S* para Sim ou *N* para Não.", parse_mode='Markdown')
-        context.user_data['current_state'] = ADD_ACADEMIC_ITEM
-        return ADD_ACADEMIC_ITEM
-
-async def ask_pos_ano(update, context):
-    return await ask_text_standard(update, context, 
-                                   "Deseja adicionar **outra Pós-Graduação**? Digite *S* para Sim ou *N* para Não.", 
-                                   'ano', ADD_ACADEMIC_ITEM, 
-                                   validar_ano, "⚠️ **Ano inválido!** Digite o ano com 4 dígitos. Ex: 2025")
-
-# --- Funções para Experiência Profissional ---
-
-async def tipo_contrato(update, context):
-    resposta = update.message.text.strip()
-    
-    if resposta == '1': 
-        context.user_data['tipo_contrato'] = '1'
-        context.user_data['experiencias'] = [] 
-        await update.message.reply_text("🏢 Perfeito! Qual o **nome da última empresa** que você trabalhou com **carteira assinada**?\n\n*Se não houver, digite N para pular esta seção.*", parse_mode='Markdown')
-        context.user_data['current_state'] = EMPRESA
-        context.user_data['current_emp_index'] = 0
-        return EMPRESA
-    elif resposta == '2': 
-        context.user_data['tipo_contrato'] = '2'
-        await update.message.reply_text(
-            "Entendido! Como **MEI**, quais são os principais **tipos de trabalho** ou serviços que você realiza? Liste-os **separados por vírgula**.\n\n*Ex: Desenvolvedor Web, Consultor de Marketing, Designer Gráfico*",
-            parse_mode='Markdown'
-        )
-        context.user_data['current_state'] = MEI_TRABALHOS
-        context.user_data['experiencias'] = [] 
-        return MEI_TRABALHOS
-    else:
-        await update.message.reply_text("⚠️ **Opção inválida!** Digite *1* para CLT ou *2* para Microempreendedor Individual.", parse_mode='Markdown')
-        return TIPO_CONTRATO
-
-async def mei_trabalhos(update, context):
-    text = update.message.text.strip()
-    context.user_data['mei_trabalhos'] = text
-    await update.message.reply_text("🗣️ Chegamos na seção de **Idiomas**! Você possui algum **curso de idioma**?\n\nDigite *S* para Sim ou *N* para Não.", parse_mode='Markdown')
-    context.user_data['current_state'] = IDIOMAS_SIM
-    context.user_data['current_idioma_index'] = 0
-    context.user_data['idiomas'] = []
-    return IDIOMAS_SIM
-
-async def empresa(update, context):
-    text = update.message.text.strip()
-    if text.upper() == 'N':
-        await update.message.reply_text("🗣️ Chegamos na seção de **Idiomas**! Você possui algum **curso de idioma**?\n\nDigite *S* para Sim ou *N* para Não.", parse_mode='Markdown')
-        context.user_data['current_state'] = IDIOMAS_SIM
-        context.user_data['current_idioma_index'] = 0
-        context.user_data['idiomas'] = []
-        return IDIOMAS_SIM
-    
-    return await ask_text_standard(update, context, 
-                                   f"Qual o **cargo exercido** na {text.title()}?", 
-                                   'empresa', CARGO, 
-                                   lambda x: bool(x.strip()), "⚠️ **Nome da empresa inválido!** Por favor, digite o nome da empresa ou 'N' para pular.")
-
-async def cargo(update, context):
-    return await ask_text_standard(update, context, 
-                                   "Agora, qual a **data de admissão**? (Fotmato obrigatório MM/YYYY. Ex: 01/2020)", 
-                                   'cargo', ADM, 
-                                   lambda x: bool(x.strip()), "⚠️ **Cargo inválido!** Por favor, digite o cargo exercido.")
-
-async def adm(update, context):
-    return await ask_text_standard(update, context, 
-                                   "E a **data de demissão ou saída**? (Formato obrigatório MM/YYYY ou 'Atual'. Ex: 12/2022 ou Atual)", 
-                                   'adm', DEM, 
-                                   validar_mes_ano, "⚠️ **Data inválida!** Fotmato obrigatório MM/YYYY ou 'Atual'.")
-
-async def dem(update, context):
-    return await ask_text_standard(update, context, 
-                                   "Liste suas **principais atividades e responsabilidades** neste cargo.\nVocê pode usar uma por linha ou separá-las por ponto e vírgula (;).\n\n*Exemplo:*\n*- Gestão de projetos*\n*- Desenvolvimento de software*\n\n*Se preferir não informar, digite N.*", 
-                                   'dem', ATIVIDADES, 
-                                   validar_mes_ano, "⚠️ **Data inválida!** Formato obrigatório MM/YYYY ou 'Atual'.")
-
-async def atividades(update, context):
-    return await ask_text_standard(update, context, 
-                                   "Excelente! E quais foram seus **principais resultados ou conquistas** nessa experiência? (Seja específico, com números se possível!)\n\nVocê pode usar uma por linha ou separá-las por ponto e vírgula (;).\n\n*Exemplo:*\n*- Redução de custos em 15%*\n*- Aumento de vendas em 20%*\n\n*Se preferir não informar, digite N.*", 
-                                   'atividades', RESULTADOS, 
-                                   lambda x: True) 
-
-async def resultados(update, context):
-    return await ask_text_standard(update, context, 
-                                   "Deseja adicionar **outra Experiência Profissional**? Digite *S* para Sim ou *N* para Não.", 
-                                   'resultados', ADD_EMP, 
-                                   lambda x: True) 
-      
-async def add_emp(update, context):
-    resposta = update.message.text.strip().upper()
-    if resposta not in ['S', 'N']:
-        await update.message.reply_text("⚠️ **Opção inválida!** Digite *S* para Sim ou *N* para Não:", parse_mode='Markdown')
-        return ADD_EMP
-    
-    if resposta == 'S':
-        context.user_data['current_emp_index'] += 1
-        await update.message.reply_text(f"Qual o **nome da próxima empresa** (Experiência {context.user_data['current_emp_index'] + 1})?\n\n*Se não houver, digite N para pular esta seção.*", parse_mode='Markdown')
-        context.user_data['current_state'] = EMPRESA
-        return EMPRESA
-    else:
-        await update.message.reply_text("🗣️ Chegamos na seção de **Idiomas**! Você possui algum **curso de idioma**?\n\nDigite *S* para Sim ou *N* para Não.", parse_mode='Markdown')
-        context.user_data['current_state'] = IDIOMAS_SIM
-        context.user_data['current_idioma_index'] = 0
-        context.user_data['idiomas'] = []
-        return IDIOMAS_SIM
-
-# --- Funções para Idiomas ---
-async def idiomas_sim(update, context):
-    resposta = update.message.text.strip().upper()
-    if resposta not in ['S', 'N']:
-        await update.message.reply_text("⚠️ **Opção inválida!** Responda *S* para Sim ou *N* para Não:", parse_mode='Markdown')
-        return IDIOMAS_SIM
-
-    if resposta == 'N':
-        await update.message.reply_text("📚 Para finalizar, liste seus **Cursos adicionais** e **Certificações** (se houver), separados por vírgula.\n\n*Ex: Java, JavaScript, Excel Avançado, Liderança e Gestão de Equipes*", parse_mode='Markdown')
-        context.user_data['current_state'] = CURSOS
-        return CURSOS
-    else:
-        context.user_data['current_idioma_index'] = 0
-        context.user_data['idiomas'] = []
-        await update.message.reply_text(f"Qual a **instituição** do idioma {context.user_data['current_idioma_index'] + 1}?", parse_mode='Markdown')
-        context.user_data['current_state'] = ASK_IDIOMA_INST
-        return ASK_IDIOMA_INST
-
-async def ask_idioma_inst(update, context):
-    return await ask_text_standard(update, context, 
-                                   f"Qual o **nome do idioma** {context.user_data['current_idioma_index'] + 1}? (Ex: Inglês)", 
-                                   'instituicao', ASK_IDIOMA_NOME, 
-                                   lambda x: bool(x.strip()), "⚠️ **Instituição inválida!** Por favor, digite o nome da instituição do idioma.")
-
-async def ask_idioma_nome(update, context):
-    # AQUI O FIELD_KEY FOI ALTERADO PARA 'nome_idioma' PARA BATER COM O PDF
-    return await ask_text_standard(update, context, 
-                                   f"Qual o **nível de proficiência** do idioma {context.user_data['current_idioma_index'] + 1}? Digite a letra correspondente:\n\n*B* para **Básico**\n*I* para **Intermediário**\n*A* para **Avançado**", 
-                                   'nome_idioma', ASK_IDIOMA_NIVEL, # <- field_key CORRIGIDO AQUI
-                                   lambda x: bool(x.strip()), "⚠️ **Nome do idioma inválido!** Por favor, digite o nome do idioma.")
-
-async def ask_idioma_nivel(update, context):
-    nivel = update.message.text.strip().upper()
-    if not validar_nivel_idioma(nivel):
-        await update.message.reply_text("⚠️ **Nível inválido!** Digite *B* (Básico), *I* (Intermediário) ou *A* (Avançado).", parse_mode='Markdown')
-        return ASK_IDIOMA_NIVEL
-    
-    idx = context.user_data['current_idioma_index']
-    context.user_data['idiomas'][idx]['nivel'] = nivel
-    await update.message.reply_text(f"Em que **ano** você **iniciou** o curso de idioma {idx+1}? (Ex: 2020)", parse_mode='Markdown') 
-    context.user_data['current_state'] = ASK_IDIOMA_INI
-    return ASK_IDIOMA_INI
-
-async def ask_idioma_ini(update, context):
-    return await ask_text_standard(update, context, 
-                                   f"Em que **ano** você **concluiu** o idioma {context.user_data['current_idioma_index'] + 1}? Ou digite **Cursando** se ainda estiver estudando.\n\n*Ex: 2018 ou Cursando*", 
-                                   'ini', ASK_IDIOMA_FIM, 
-                                   validar_ano, "⚠️ **Ano inválido!** Digite o ano com 4 dígitos. Ex: 2020.")
-
-async def ask_idioma_fim(update, context):
-    return await ask_text_standard(update, context, 
-                                   "Deseja adicionar **outro idioma**? Digite *S* para Sim ou *N* para Não.", 
-                                   'fim', ADD_IDIOMA, 
-                                   validar_ano_ou_cursando, "⚠️ **Entrada inválida!** Digite o ano com 4 dígitos (Ex: 2018) ou 'Cursando'.")
-
-async def add_idioma(update, context):
-    resposta = update.message.text.strip().upper()
-    if resposta not in ['S', 'N']:
-        await update.message.reply_text("⚠️ **Opção inválida!** Digite *S* para Sim ou *N* para Não:", parse_mode='Markdown')
-        return ADD_IDIOMA
-    
-    if resposta == 'S':
-        context.user_data['current_idioma_index'] += 1
-        await update.message.reply_text(f"Qual a **instituição** do idioma {context.user_data['current_idioma_index'] + 1}?", parse_mode='Markdown')
-        context.user_data['current_state'] = ASK_IDIOMA_INST
-        return ASK_IDIOMA_INST
-    else:
-        await update.message.reply_text("📚 Para finalizar, liste seus **cursos adicionais** e **certificações** (se houver), separados por vírgula.\n\n*Ex: Java, JavaScript, Excel Avançado, Liderança e Gestão de Equipes*", parse_mode='Markdown')
-        context.user_data['current_state'] = CURSOS
-        return CURSOS
-
-# --- Funções para Cursos Adicionais e Geração Automática do PDF ---
+    await update.message.reply_text(
+        "Processo cancelado. Use /start para recomeçar."
+    )
+    return ConversationHandler.END
 
-async def cursos(update, context):
-    cursos_texto = update.message.text.strip()
-    context.user_data['cursos'] = cursos_texto
+async def editar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_data = context.user_data
+    if not user_data.get('cv_pronto'):
+        await update.message.reply_text("Ainda não há currículo gerado para editar: termine as perguntas do /start ou use /rapido.")
+        return None
+    # Cópia do currículo entregue, restaurada se a edição for cancelada
+    if 'cv_salvo' not in user_data:
+        user_data['cv_salvo'] = curriculo(context).para_tupla()
+    user_data.pop('editando', None)
+    return await entrar(EDITAR, update, context)
+
+# --- Caminho rápido: a ficha inteira numa mensagem ou arquivo ---
+# /rapido seguido da ficha (ou um .txt/.json enviado como documento) preenche o currículo de
+# uma vez: todas as validações rodam juntas e voltam num único relatório, ou o PDF é enviado
+# direto. São 1 a 3 chamadas à Bot API por currículo, contra ~80 da conversa.
+FICHA_MAX_BYTES = int(os.getenv("FICHA_MAX_BYTES", str(64 * 1024)))
+FICHA_MAX_ERROS = 20
+
+INSTRUCOES_FICHA = (
+    "⚡ **Currículo em uma mensagem**\n\nEnvie */rapido* seguido da sua ficha, uma informação por linha, "
+    "como no modelo abaixo. Repita *[graduacao]*, *[pos-graduacao]*, *[experiencia]* ou *[idioma]* para cada item "
+    "(ou remova as seções que não se aplicam). Para MEI, use *contrato: MEI* e *trabalhos mei:* no lugar das experiências.\n\n"
+    "Também aceito a ficha como arquivo *.txt* ou *.json*.\n\n"
+    f"```\n/rapido\n{MODELO_FICHA}\n```"
+)
 
-    await update.message.reply_text("🎉 **Parabéns!** Seu currículo foi **gerado com sucesso** e está sendo enviado para você agora mesmo!\n\nPor favor, **verifique o arquivo PDF** anexo.", parse_mode='Markdown')
+# Ficha usa nomes amigáveis; as mensagens do validar_registro usam os campos internos
+ROTULOS_FICHA = {'forma_2grau': 'ensino medio', 'ano_2grau': 'ano ensino medio', 'tipo_contrato': 'contrato'}
+
+def _regras_normalizacao():
+    # Mesmo tratamento que a conversa dá a cada resposta, tirado da própria tabela: lista -> [(campo, tratar, limpa)]
+    regras = {}
+    for passo in PASSOS.values():
+        if passo.campo is not None:
+            tratar = str.upper if passo.opcoes is not None else passo.tratar
+            regras.setdefault(passo.lista, []).append((passo.campo, tratar, passo.limpa))
+    return regras
+
+REGRAS_NORMALIZACAO = _regras_normalizacao()
+
+def _normalizar(alvo, regras):
+    for campo, tratar, limpa in regras:
+        valor = getattr(alvo, campo).strip()
+        if tratar is not None:
+            valor = tratar(valor)
+        setattr(alvo, campo, valor)
+        if limpa is not None:
+            for nome_campo, vazio in limpa.get(valor, ()):
+                setattr(alvo, nome_campo, vazio())
+
+def montar_curriculo(data):
+    """Valida a ficha (dict no formato do user_data) e monta o currículo como a conversa montaria; devolve (cv, erros)."""
+    data = dict(data)
+    # Perguntas que a conversa faz mas que a ficha deixa implícitas
+    if not data.get('forma_2grau'):
+        data['forma_2grau'] = 'S' if data.get('ano_2grau') or data.get('graduacoes') or data.get('pos_graduacoes') else 'N'
+    tipo = str(data.get('tipo_contrato', '')).strip().upper()
+    data['tipo_contrato'] = {'CLT': '1', 'MEI': '2'}.get(tipo, tipo) or ('2' if data.get('mei_trabalhos') else '1')
+
+    erros = validar_registro(data)
+    if erros:
+        return None, erros
+    cv = Curriculo.de_dict(data)
+    _normalizar(cv, REGRAS_NORMALIZACAO[None])
+    for lista in LISTAS:
+        for item in getattr(cv, lista):
+            _normalizar(item, REGRAS_NORMALIZACAO[lista])
+    # A conversa só pergunta pelas experiências (CLT) ou pelos trabalhos (MEI)
+    if cv.tipo_contrato == '2':
+        cv.experiencias = []
+    else:
+        cv.mei_trabalhos = ''
+    return cv, []
+
+def relatorio_erros(erros):
+    linhas = []
+    for erro in erros[:FICHA_MAX_ERROS]:
+        campo, separador, resto = erro.partition(':')
+        linhas.append(f"• {ROTULOS_FICHA.get(campo, campo)}{separador}{resto}")
+    if len(erros) > FICHA_MAX_ERROS:
+        linhas.append(f"• ... e mais {len(erros) - FICHA_MAX_ERROS} erros")
+    # Texto puro: os valores citados vêm do usuário e quebrariam o Markdown
+    return "⚠️ A ficha tem problemas; corrija e envie de novo:\n\n" + "\n".join(linhas) + "\n\nUse /rapido para ver o modelo."
+
+async def processar_ficha(update, context, texto):
+    data, erros = ler_ficha(texto)
+    cv = None
+    if not erros:
+        cv, erros = montar_curriculo(data)
+    if erros:
+        metricas.fichas.inc('com_erros')
+        await update.message.reply_text(relatorio_erros(erros))
+        return None
+    try:
+        chave, entrada = await obter_pdf(cv, update.effective_user.id)
+    except FilaRenderCheia:
+        metricas.fichas.inc('fila_cheia')
+        await update.message.reply_text("⏳ Muitos currículos sendo gerados agora. Envie a ficha novamente em alguns instantes.")
+        return None
+    except Exception:
+        logger.exception("Falha ao gerar o PDF da ficha")
+        metricas.fichas.inc('falha')
+        await update.message.reply_text("⚠️ Não foi possível gerar o currículo agora. Envie a ficha novamente em alguns instantes.")
+        return None
+
+    # A ficha substitui qualquer conversa em andamento
+    context.user_data.clear()
+    context.user_data['cv'] = cv
+    context.user_data['cv_pronto'] = True
+    await enviar_arquivo(update.message, chave, entrada, legenda="🎉 Currículo gerado a partir da sua ficha. Use /start ou /rapido para criar outro.")
+    metricas.fichas.inc('gerada')
+    return ConversationHandler.END
 
-    pdf = gerar_pdf(context.user_data)
-    pdf_bytes = pdf.output()
-    bio = io.BytesIO(pdf_bytes)
-    bio.name = "curriculo.pdf"
-    bio.seek(0)
+async def rapido(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    partes = update.message.text.split(None, 1)
+    if len(partes) < 2:
+        await update.message.reply_text(INSTRUCOES_FICHA, parse_mode='Markdown')
+        return None
+    return await processar_ficha(update, context, partes[1])
+
+async def receber_ficha(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    documento = update.message.document
+    if documento.file_size and documento.file_size > FICHA_MAX_BYTES:
+        metricas.fichas.inc('com_erros')
+        await update.message.reply_text(f"⚠️ Arquivo grande demais para uma ficha (máximo {FICHA_MAX_BYTES // 1024} KB).")
+        return None
+    arquivo = await documento.get_file()
+    conteudo = bytes(await arquivo.download_as_bytearray())
+    try:
+        texto = conteudo.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        texto = conteudo.decode('latin-1')
+    return await processar_ficha(update, context, texto)
+
+FILTRO_FICHA = (filters.Document.FileExtension('txt') | filters.Document.FileExtension('json')
+                | filters.Document.MimeType('application/json') | filters.Document.MimeType('text/plain'))
+
+# --- Endpoint de métricas ---
+# Servidor local com o /metrics no formato do Prometheus. METRICS_PORT=0 desativa.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+_servidor_metricas = None
+
+async def ao_iniciar(application):
+    global _servidor_metricas
+    if METRICS_PORT and _servidor_metricas is None:
+        _servidor_metricas = await metricas.iniciar_servidor(METRICS_HOST, METRICS_PORT)
+    # Os processos de render aquecem enquanto o bot começa a receber updates
+    render_pool.iniciar()
+    if getattr(application, 'sessoes', None) is not None:
+        application.sessoes.iniciar()
+
+async def ao_encerrar(application):
+    global _servidor_metricas
+    if getattr(application, 'sessoes', None) is not None:
+        await application.sessoes.parar()
+    render_pool.shutdown()
+    if _servidor_metricas is not None:
+        await _servidor_metricas.cleanup()
+        _servidor_metricas = None
+
+# --- Persistência ---
+# Ex: PERSISTENCE_URL=sqlite:///curriculos.db. Sem a variável, o estado fica só em memória.
+PERSISTENCE_URL = os.getenv("PERSISTENCE_URL", "")
+PERSISTENCE_FLUSH_MS = int(os.getenv("PERSISTENCE_FLUSH_MS", "1000"))
+
+# Sessões ociosas vão para o disco após SESSAO_OCIOSA_S e são apagadas após SESSAO_TTL_S.
+# SESSAO_DIR vazio mantém as sessões na memória (ainda expiram pelo TTL).
+SESSAO_DIR = os.getenv("SESSAO_DIR", "sessoes")
+SESSAO_OCIOSA_S = float(os.getenv("SESSAO_OCIOSA_S", "900"))
+SESSAO_TTL_S = float(os.getenv("SESSAO_TTL_S", str(3 * 24 * 3600)))
+SESSAO_VARREDURA_S = float(os.getenv("SESSAO_VARREDURA_S", "60"))
+
+# Limites de envio (mensagens por segundo); ENVIO_TAXA_GLOBAL=0 desliga a fila de envio
+ENVIO_TAXA_GLOBAL = float(os.getenv("ENVIO_TAXA_GLOBAL", "30"))
+ENVIO_TAXA_CHAT = float(os.getenv("ENVIO_TAXA_CHAT", "1"))
+ENVIO_RAJADA_CHAT = int(os.getenv("ENVIO_RAJADA_CHAT", "3"))
+
+# --- Processamento concorrente dos updates ---
+# Usuários diferentes são atendidos em paralelo (até CONCURRENT_UPDATES handlers ao mesmo
+# tempo), mas os updates de um mesmo usuário passam por uma fila própria e são processados
+# um por vez, na ordem de chegada: o current_state e o currículo em construção nunca são
+# alterados por dois handlers ao mesmo tempo. UPDATES_PENDENTES_MAX (o concurrent_updates
+# do PTB) limita quantos updates estão dentro do process_update ao mesmo tempo, mas não a
+# entrada: o PTB cria uma task para cada update assim que ele sai da update_queue, então a
+# fila fica quase sempre vazia e os excedentes esperam em memória. Quem recebe updates (o
+# webhook, o consumidor de um shard) segura a entrada por AplicacaoPorUsuario.pendentes().
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "32"))
+UPDATES_PENDENTES_MAX = int(os.getenv("UPDATES_PENDENTES_MAX", "1024"))
+
+class AplicacaoPorUsuario(Application):
+    def __init__(self, limite_concorrencia=CONCURRENT_UPDATES, **kwargs):
+        super().__init__(**kwargs)
+        self._limite = asyncio.Semaphore(max(1, limite_concorrencia))
+        self._filas_usuario = {}  # user_id -> [Lock, updates esperando ou em andamento]
+        self.em_andamento = 0  # updates dentro do process_update, esperando a vez ou em andamento
+        self.sessoes = None  # GerenciadorSessoes, definido em criar_aplicacao
+
+    def pendentes(self):
+        """Updates aceitos e ainda não processados: na update_queue ou dentro do process_update."""
+        return self.update_queue.qsize() + self.em_andamento
+
+    async def process_update(self, update):
+        self.em_andamento += 1
+        user = update.effective_user if isinstance(update, Update) else None
+        if user is None:
+            try:
+                async with self._limite:
+                    return await super().process_update(update)
+            finally:
+                self.em_andamento -= 1
+
+        # Registro na fila sem nenhum await antes: as tasks começam na ordem da update_queue,
+        # e o Lock do asyncio atende quem espera na ordem em que pediu
+        fila = self._filas_usuario.get(user.id)
+        if fila is None:
+            fila = self._filas_usuario[user.id] = [asyncio.Lock(), 0]
+        fila[1] += 1
+        try:
+            async with fila[0]:
+                if self.sessoes is not None:
+                    # Sessão ociosa gravada em disco volta antes de os handlers verem o update
+                    self.sessoes.restaurar(user.id)
+                    self.sessoes.tocar(user.id)
+                async with self._limite:
+                    return await super().process_update(update)
+        finally:
+            fila[1] -= 1
+            if not fila[1]:
+                del self._filas_usuario[user.id]
+            self.em_andamento -= 1
+
+def criar_aplicacao(token, builder=None, persistence=None, request=None, limitar_envio=True,
+                    sessao_dir=SESSAO_DIR, taxa_global=ENVIO_TAXA_GLOBAL):
+    builder = builder or ApplicationBuilder()
+    builder = builder.application_class(AplicacaoPorUsuario).concurrent_updates(UPDATES_PENDENTES_MAX)
+    if limitar_envio and taxa_global > 0:
+        # Todo reply_text/reply_document passa pela fila de envio (limites de taxa e 429)
+        builder = builder.rate_limiter(LimitadorEnvio(taxa_global, ENVIO_TAXA_CHAT, ENVIO_RAJADA_CHAT))
+    persistence = persistence or criar_persistencia(PERSISTENCE_URL, PERSISTENCE_FLUSH_MS)
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    # Toda chamada à Bot API passa pelo RequestMedida (latência por método)
+    builder = builder.request(metricas.RequestMedida(request or HTTPXRequest(connection_pool_size=256)))
+    application = builder.token(token).post_init(ao_iniciar).post_shutdown(ao_encerrar).build()
+    boot.marcar('aplicacao')
+
+    # Um MessageHandler por estado da conversa, todos com o handler genérico compilado da tabela;
+    # as Escolhas também aceitam os botões do teclado da pergunta (e a resposta digitada continua valendo)
+    states = {estado: [MessageHandler(filters.TEXT & ~filters.COMMAND, handler)] for estado, handler in HANDLERS.items()}
+    for estado, handler in HANDLERS_BOTAO.items():
+        states[estado].append(CallbackQueryHandler(handler, pattern=f"^{estado}:"))
+
+    # Instrumentação: latência, falhas de validação e funil por handler
+    nomes_estados = {estado: handlers[0].callback.__name__ for estado, handlers in states.items()}
+    for estado, handlers in states.items():
+        for handler in handlers:
+            handler.callback = metricas.instrumentar(handler.callback, estado, nomes_estados)
+
+    # A ficha (/rapido ou arquivo) vale fora da conversa e também no meio dela, encerrando-a
+    ficha = [CommandHandler("rapido", rapido), MessageHandler(FILTRO_FICHA, receber_ficha)]
+    with warnings.catch_warnings():
+        # O PTB avisa que CallbackQueryHandler com per_message=False não separa as conversas por
+        # mensagem; aqui é o esperado (uma conversa por usuário, o estado está na callback_data)
+        warnings.filterwarnings("ignore", "If 'per_message=False'", PTBUserWarning)
+        conv_handler = ConversationHandler(
+            entry_points=[CommandHandler("start", metricas.instrumentar(start, None, nomes_estados)),
+                          CommandHandler("editar", editar), *ficha],
+            name="curriculo",
+            persistent=persistence is not None,
+            states=states,
+            fallbacks=[CommandHandler("cancel", cancel), CommandHandler("editar", editar), *ficha],
+        )
 
-    await update.message.reply_document(document=bio, filename="curriculo.pdf")
+    application.add_handler(conv_handler)
+    application.add_handler(CallbackQueryHandler(botao_expirado))
+    metricas.acompanhar_conversas(conv_handler)
+    application.sessoes = GerenciadorSessoes(application, [conv_handler], sessao_dir, SESSAO_OCIOSA_S,
+                                             SESSAO_TTL_S, SESSAO_VARREDURA_S)
+    boot.marcar('handlers')
+    return application
+
+def criar_builder_polling(request=None):
+    """Builder do modo polling: o getUpdates passa pelo RequestMedida e o primeiro fecha o boot."""
+    return ApplicationBuilder().get_updates_request(metricas.RequestMedida(request or HTTPXRequest(), boot))
+
+# --- Modo Webhook ---
+# Alternativa ao run_polling: um servidor aiohttp recebe os updates do Telegram e os coloca
+# na update_queue da mesma Application. Para testar localmente, basta fazer POST do JSON de
+# um update em http://localhost:PORT/WEBHOOK_PATH com o header do secret token.
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # URL pública (sem o path); vazio = não registra no Telegram
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("PORT", "8080"))
+WEBHOOK_MAX_CONCURRENT = int(os.getenv("WEBHOOK_MAX_CONCURRENT", "100"))
+
+def entregar_na_aplicacao(application, max_concurrent=WEBHOOK_MAX_CONCURRENT):
+    async def entregar(data):
+        # Updates aceitos e ainda não processados (a update_queue sozinha fica quase sempre
+        # vazia: o PTB tira cada update dela na hora); acima do limite o Telegram reenvia depois
+        if application.pendentes() >= max_concurrent:
+            return False
+        await application.update_queue.put(Update.de_json(data, application.bot))
+        return True
+    return entregar
+
+def criar_app_webhook(entregar, secret=WEBHOOK_SECRET, path=WEBHOOK_PATH):
+    """Servidor do webhook; entregar(data) devolve False quando não há vaga para o update (503)."""
+    from aiohttp import web
+
+    if not secret:
+        logger.warning("WEBHOOK_SECRET vazio: o webhook aceita updates de qualquer um que conheça a URL")
+
+    async def receber_update(request):
+        recebido = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if secret and not hmac.compare_digest(recebido, secret):
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        if not isinstance(data, dict):  # JSON válido, mas não um update ([] ou 1)
+            return web.Response(status=400)
+        if not await entregar(data):
+            return web.Response(status=503)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, receber_update)
+    return app
+
+async def registrar_webhook(bot):
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            max_connections=min(WEBHOOK_MAX_CONCURRENT, 100),
+            allowed_updates=Update.ALL_TYPES,
+        )
 
-    await update.message.reply_text(
-        "---"
-        "✨ **Processo concluído!** Sempre que precisar criar um novo currículo ou ajustar algo, é só digitar */start* novamente.",
-        parse_mode='Markdown'
+async def rodar_webhook(application):
+    from aiohttp import web
+
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+    await registrar_webhook(application.bot)
+
+    runner = web.AppRunner(criar_app_webhook(entregar_na_aplicacao(application)))
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    boot.marcar('webhook', final=True)
+    print(f"🤖 Bot rodando (webhook em {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH})...")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await application.stop()
+        await application.shutdown()
+        await application.post_shutdown(application)
+
+# --- Modo shards ---
+# Um processo de ingresso recebe os updates (polling ou webhook) e os distribui por hash do
+# user_id entre SHARDS workers, cada um com a Application inteira do bot (ver shards.py).
+# Com SHARD_FILA_URL vazio, `--mode shards` sobe o ingresso e os workers nesta máquina,
+# ligados por filas do multiprocessing, e reinicia o worker que sair. Com
+# SHARD_FILA_URL=redis://..., ingresso (`--mode ingresso`) e workers (`--mode worker --shard N`)
+# também podem rodar separados. O limite global de envio (por bot) é dividido entre os shards.
+SHARDS = int(os.getenv("SHARDS", os.cpu_count() or 1))
+SHARD_FILA_URL = os.getenv("SHARD_FILA_URL", "")
+SHARD_FILA_MAX = int(os.getenv("SHARD_FILA_MAX", "1000"))  # acima disto o ingresso segura a entrada
+SHARD_DRENAR_S = float(os.getenv("SHARD_DRENAR_S", "10"))  # espera pelas filas ao encerrar
+INGRESSO_ENTRADA = os.getenv("INGRESSO_ENTRADA", "polling")
+POLLING_TIMEOUT = 30
+
+def _ao_sinal(parar, sinais=(signal.SIGINT, signal.SIGTERM)):
+    loop = asyncio.get_running_loop()
+    for sinal in sinais:
+        loop.add_signal_handler(sinal, parar.set)
+
+async def rodar_worker(application, fila, shard, pronto=None, sinais=(signal.SIGINT, signal.SIGTERM)):
+    parar = asyncio.Event()
+    _ao_sinal(parar, sinais)
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+    logger.info("Worker do shard %d pronto", shard)
+    if pronto is not None:
+        pronto.set()
+    try:
+        await shards.consumir(application, fila, shard, parar, UPDATES_PENDENTES_MAX)
+    finally:
+        # O stop() processa o que já está na update_queue antes de encerrar
+        await application.stop()
+        await application.shutdown()
+        await application.post_shutdown(application)
+
+def processo_worker(token, fila, shard, total_shards, render_workers=RENDER_WORKERS, supervisionado=False,
+                    pronto=None, fabrica_request=None):
+    """Corpo de um worker: a Application do bot consumindo a fila de um shard."""
+    global render_pool, METRICS_PORT
+    sinais = (signal.SIGINT, signal.SIGTERM)
+    if supervisionado:
+        # O Ctrl+C chega a todo o grupo de processos; quem encerra os workers é o ingresso,
+        # depois de esvaziar as filas
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        sinais = (signal.SIGTERM,)
+    render_pool = RenderPool(render_workers)
+    if METRICS_PORT:
+        METRICS_PORT += 1 + shard  # a METRICS_PORT é do ingresso
+    application = criar_aplicacao(
+        token, ApplicationBuilder().updater(None),
+        persistence=criar_persistencia(shards.url_do_shard(PERSISTENCE_URL, shard), PERSISTENCE_FLUSH_MS),
+        request=fabrica_request() if fabrica_request else None,
+        sessao_dir=os.path.join(SESSAO_DIR, f"shard{shard}") if SESSAO_DIR else "",
+        taxa_global=ENVIO_TAXA_GLOBAL / total_shards,
     )
+    try:
+        asyncio.run(rodar_worker(application, fila, shard, pronto, sinais))
+    except KeyboardInterrupt:
+        pass
+
+async def _receber_polling(bot, ingresso):
+    # Roda até ser cancelada
+    await bot.delete_webhook()
+    offset = None
+    try:
+        while True:
+            # Filas cheias: os updates esperam no Telegram, que guarda até 24 h
+            if await asyncio.to_thread(ingresso.cheio):
+                await asyncio.sleep(0.05)
+                continue
+            try:
+                updates = await bot.get_updates(offset, timeout=POLLING_TIMEOUT, allowed_updates=Update.ALL_TYPES)
+            except TelegramError as e:
+                logger.warning("Falha no getUpdates: %s", e)
+                await asyncio.sleep(1)
+                continue
+            if updates:
+                offset = updates[-1].update_id + 1
+                await asyncio.to_thread(ingresso.rotear, [u.to_dict() for u in updates])
+    except asyncio.CancelledError:
+        # Confirma no Telegram os updates já roteados, para não recebê-los de novo
+        if offset is not None:
+            await bot.get_updates(offset, timeout=0, limit=1)
+        raise
+
+async def supervisionar(processos, iniciar_worker):
+    while True:
+        await asyncio.sleep(1)
+        for shard, processo in enumerate(processos):
+            if processo.exitcode is not None:
+                logger.warning("Worker do shard %d saiu (código %s); reiniciando", shard, processo.exitcode)
+                metricas.shard_reinicios.inc(str(shard))
+                processos[shard] = iniciar_worker(shard)
+
+async def _encerrar_workers(ingresso, processos):
+    limite = time.monotonic() + SHARD_DRENAR_S
+    while time.monotonic() < limite and any(await asyncio.to_thread(ingresso.profundidades)):
+        await asyncio.sleep(0.1)
+    for processo in processos:
+        processo.terminate()
+    for processo in processos:
+        await asyncio.to_thread(processo.join, SHARD_DRENAR_S)
+        if processo.exitcode is None:
+            processo.kill()
+
+async def rodar_ingresso(token, ingresso, entrada=INGRESSO_ENTRADA, processos=None, iniciar_worker=None):
+    """Recebe os updates e os roteia para os shards; com `processos`, também supervisiona os workers."""
+    from aiohttp import web
+
+    parar = asyncio.Event()
+    _ao_sinal(parar)
+    servidor_metricas = await metricas.iniciar_servidor(METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+    supervisor = asyncio.create_task(supervisionar(processos, iniciar_worker)) if processos else None
+    runner = None
+    async with Bot(token) as bot:
+        try:
+            if entrada == "webhook":
+                async def entregar(data):
+                    return await asyncio.to_thread(ingresso.aceitar, data)
+
+                await registrar_webhook(bot)
+                runner = web.AppRunner(criar_app_webhook(entregar))
+                await runner.setup()
+                await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+                print(f"🤖 Ingresso de {ingresso.anel.shards} shards (webhook em {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH})...")
+                await parar.wait()
+            else:
+                print(f"🤖 Ingresso de {ingresso.anel.shards} shards (polling)...")
+                polling = asyncio.create_task(_receber_polling(bot, ingresso))
+                await parar.wait()
+                polling.cancel()
+                try:
+                    await polling
+                except asyncio.CancelledError:
+                    pass
+        finally:
+            if runner is not None:
+                await runner.cleanup()
+            if supervisor is not None:
+                supervisor.cancel()
+                await _encerrar_workers(ingresso, processos)
+            if servidor_metricas is not None:
+                await servidor_metricas.cleanup()
+
+def main_shards(token, modo, total_shards, shard=None, entrada=INGRESSO_ENTRADA):
+    # spawn: os workers começam limpos, sem herdar o loop do asyncio nem as conexões do ingresso
+    contexto = multiprocessing.get_context("spawn")
+    if modo != "shards" and not SHARD_FILA_URL:
+        logger.error("--mode %s precisa de SHARD_FILA_URL (redis://...); numa máquina só, use --mode shards", modo)
+        return
+    fila = shards.criar_fila(SHARD_FILA_URL, total_shards, contexto)
 
-    return ConversationHandler.END
+    if modo == "worker":
+        processo_worker(token, fila, shard, total_shards)
+        return
 
-async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    await update.message.reply_text(
-        "Processo cancelado. Use /start para recomeçar."
-    )
-    return ConversationHandler.END
+    ingresso = shards.Ingresso(fila, total_shards, SHARD_FILA_MAX)
+    processos = iniciar_worker = None
+    if modo == "shards":
+        # Os shards dividem os processos de renderização da máquina
+        render_workers = max(1, RENDER_WORKERS // total_shards)
+
+        def iniciar_worker(n):
+            processo = contexto.Process(target=processo_worker, name=f"shard{n}",
+                                        args=(token, fila, n, total_shards, render_workers, True))
+            processo.start()
+            return processo
+
+        processos = [iniciar_worker(n) for n in range(total_shards)]
+    try:
+        asyncio.run(rodar_ingresso(token, ingresso, entrada, processos, iniciar_worker))
+    except KeyboardInterrupt:
+        pass
+
+# --- Geração em lote (offline) ---
+# Gera o mesmo PDF da conversa para cada registro de um arquivo JSONL ou CSV, sem passar pelo
+# Telegram. Os registros têm o formato de Curriculo.para_dict(); no CSV, as colunas de lista
+# (graduacoes, pos_graduacoes, experiencias, idiomas) trazem o JSON da lista. O arquivo é lido
+# em streaming e só LOTE_JANELA registros ficam em voo por worker, então a memória não cresce
+# com a entrada.
+CAMPOS_LISTA_CSV = ('graduacoes', 'pos_graduacoes', 'experiencias', 'idiomas')
+LOTE_JANELA = 4
+
+def ler_registros(caminho, formato=None):
+    """Gera (linha, dict) para cada registro; registros ilegíveis vêm como (linha, erro)."""
+    formato = formato or ('csv' if caminho.lower().endswith('.csv') else 'jsonl')
+    with open(caminho, encoding='utf-8-sig', newline='') as f:
+        if formato == 'jsonl':
+            for linha, texto in enumerate(f, 1):
+                if not texto.strip():
+                    continue
+                try:
+                    registro = json.loads(texto)
+                except ValueError as e:
+                    yield linha, f"JSON inválido: {e}"
+                    continue
+                yield linha, registro if isinstance(registro, dict) else "o registro deve ser um objeto JSON"
+        else:
+            for linha, registro in enumerate(csv.DictReader(f), 2):
+                try:
+                    for campo in CAMPOS_LISTA_CSV:
+                        registro[campo] = json.loads(registro[campo]) if registro.get(campo) else []
+                except ValueError as e:
+                    yield linha, f"{campo}: JSON inválido ({e})"
+                    continue
+                yield linha, registro
+
+def _renderizar_arquivo(payload, caminho):
+    # Executado dentro do processo do pool: o PDF vai direto para o disco, sem voltar ao processo principal
+    from pdf_cv import gerar_pdf
+
+    temporario = caminho + '.tmp'
+    gerar_pdf(Curriculo.de_tupla(pickle.loads(payload))).output(temporario)
+    os.replace(temporario, caminho)
+    return os.path.getsize(caminho)
+
+def gerar_lote(caminho, saida, workers=RENDER_WORKERS, formato=None):
+    """Renderiza todos os registros válidos em saida/cv_<linha>.pdf; erros vão para saida/erros.jsonl."""
+    from pdf_cv import preparar_fontes
+
+    os.makedirs(saida, exist_ok=True)
+    workers = max(1, workers)
+    totais = {'gerados': 0, 'invalidos': 0, 'falhas': 0, 'bytes': 0}
+    inicio = time.perf_counter()
+
+    with open(os.path.join(saida, 'erros.jsonl'), 'w', encoding='utf-8') as relatorio, \
+            ProcessPoolExecutor(max_workers=workers, initializer=preparar_fontes) as executor:
+
+        def registrar_erro(linha, erros, chave='invalidos'):
+            totais[chave] += 1
+            relatorio.write(json.dumps({'linha': linha, 'erros': erros}, ensure_ascii=False) + '\n')
+
+        def coletar(concluidos):
+            for futuro in concluidos:
+                linha = em_voo.pop(futuro)
+                try:
+                    totais['bytes'] += futuro.result()
+                    totais['gerados'] += 1
+                except Exception as e:
+                    registrar_erro(linha, [f"falha ao gerar o PDF: {e}"], 'falhas')
+            processados = totais['gerados'] + totais['falhas']
+            if processados and processados % 1000 < len(concluidos):
+                logger.info("%d currículos gerados (%.1f CVs/s)", processados, processados / (time.perf_counter() - inicio))
+
+        em_voo = {}
+        for linha, registro in ler_registros(caminho, formato):
+            # Validado e normalizado como a ficha do /rapido: o mesmo registro gera o mesmo PDF
+            try:
+                cv, erros = (None, [registro]) if isinstance(registro, str) else montar_curriculo(registro)
+                payload = None if erros else serializar_dados(cv)
+            except Exception as e:
+                # Um registro que escapa da validação não derruba o lote: vai para o erros.jsonl
+                logger.exception("Falha ao montar o currículo da linha %d", linha)
+                registrar_erro(linha, [f"falha ao montar o currículo: {e}"], 'falhas')
+                continue
+            if erros:
+                registrar_erro(linha, erros)
+                continue
+            if len(em_voo) >= workers * LOTE_JANELA:
+                concluidos, _ = wait(em_voo, return_when=FIRST_COMPLETED)
+                coletar(concluidos)
+            caminho_pdf = os.path.join(saida, f"cv_{linha:06d}.pdf")
+            em_voo[executor.submit(_renderizar_arquivo, payload, caminho_pdf)] = linha
+        coletar(wait(em_voo)[0])
+
+    totais['segundos'] = time.perf_counter() - inicio
+    totais['cvs_por_segundo'] = totais['gerados'] / totais['segundos'] if totais['segundos'] else 0.0
+    return totais
+
+def main_lote(argv=None):
+    parser = argparse.ArgumentParser(prog="bot_curriculo.py lote", description="Gera currículos em PDF a partir de um arquivo JSONL ou CSV.")
+    parser.add_argument("entrada", help="Arquivo .jsonl ou .csv com um currículo por linha")
+    parser.add_argument("--saida", default="curriculos", help="Pasta dos PDFs e do erros.jsonl")
+    parser.add_argument("--formato", choices=["jsonl", "csv"], help="Padrão: pela extensão do arquivo")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS)
+    args = parser.parse_args(argv)
+
+    totais = gerar_lote(args.entrada, args.saida, args.workers, args.formato)
+    print(f"✅ {totais['gerados']} currículos gerados em {totais['segundos']:.1f} s ({totais['cvs_por_segundo']:.1f} CVs/s), "
+          f"{totais['bytes'] / (1024 * 1024):.1f} MB")
+    if totais['invalidos'] or totais['falhas']:
+        print(f"⚠️ {totais['invalidos']} registros inválidos e {totais['falhas']} falhas; detalhes em "
+              f"{os.path.join(args.saida, 'erros.jsonl')}")
+        return 1
+    return 0
+
+# Fim do módulo: tabelas da conversa e do layout compiladas, pools e caches criados
+boot.marcar('modulo')
 
 def main():
+    parser = argparse.ArgumentParser(description="Bot do Telegram para gerar currículos em PDF.")
+    parser.add_argument("--mode", choices=["polling", "webhook", "shards", "ingresso", "worker"],
+                        default=os.getenv("BOT_MODE", "polling"))
+    parser.add_argument("--shards", type=int, default=SHARDS, help="Número de workers (modos shards, ingresso e worker)")
+    parser.add_argument("--shard", type=int, help="Shard deste worker (--mode worker)")
+    parser.add_argument("--entrada", choices=["polling", "webhook"], default=INGRESSO_ENTRADA,
+                        help="Como o ingresso recebe os updates (modos shards e ingresso)")
+    args = parser.parse_args()
+    if args.mode == "worker" and (args.shard is None or not 0 <= args.shard < args.shards):
+        parser.error("--mode worker precisa de --shard entre 0 e --shards - 1")
+
     token = os.getenv("TELEGRAM_TOKEN")
     if not token:
         logger.error("TELEGRAM_TOKEN não encontrado nas variáveis de ambiente!")
         return
-    
-    application = ApplicationBuilder().token(token).build()
-
-    conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("start", start)],
-        states={
-            ESCOLHA: [MessageHandler(filters.TEXT & ~filters.COMMAND, escolha)],
-            NOME: [MessageHandler(filters.TEXT & ~filters.COMMAND, nome)],
-            IDADE: [MessageHandler(filters.TEXT & ~filters.COMMAND, idade)],
-            ESTADO_CIVIL: [MessageHandler(filters.TEXT & ~filters.COMMAND, estado_civil)],
-            TELEFONE: [MessageHandler(filters.TEXT & ~filters.COMMAND, telefone)],
-            EMAIL: [MessageHandler(filters.TEXT & ~filters.COMMAND, email)],
-            FORMA_2GRAU: [MessageHandler(filters.TEXT & ~filters.COMMAND, forma_2grau)],
-            ANO_2GRAU: [MessageHandler(filters.TEXT & ~filters.COMMAND, ano_2grau)],
-
-            # Formação Acadêmica
-            ASK_QTD_GRAD: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_qtd_grad)],
-            ASK_FACULDADE: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_faculdade)],
-            ASK_CURSO: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_curso)],
-            ASK_SITUACAO: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_situacao)],
-            ASK_ANO_GRAD: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_ano_grad)],
-            ASK_QTD_POS: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_qtd_pos)],
-            ASK_POS_FACULDADE: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_pos_faculdade)],
-            ASK_POS_CURSO: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_pos_curso)],
-            ASK_POS_SITUACAO: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_pos_situacao)],
-            ASK_POS_ANO: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_pos_ano)],
-            ADD_ACADEMIC_ITEM: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_academic_item)],
-
-            # Experiência Profissional
-            TIPO_CONTRATO: [MessageHandler(filters.TEXT & ~filters.COMMAND, tipo_contrato)],
-            MEI_TRABALHOS: [MessageHandler(filters.TEXT & ~filters.COMMAND, mei_trabalhos)],
-            EMPRESA: [MessageHandler(filters.TEXT & ~filters.COMMAND, empresa)],
-            CARGO: [MessageHandler(filters.TEXT & ~filters.COMMAND, cargo)],
-            ADM: [MessageHandler(filters.TEXT & ~filters.COMMAND, adm)],
-            DEM: [MessageHandler(filters.TEXT & ~filters.COMMAND, dem)],
-            ATIVIDADES: [MessageHandler(filters.TEXT & ~filters.COMMAND, atividades)],
-            RESULTADOS: [MessageHandler(filters.TEXT & ~filters.COMMAND, resultados)],
-            ADD_EMP: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_emp)],
-
-            # Idiomas
-            IDIOMAS_SIM: [MessageHandler(filters.TEXT & ~filters.COMMAND, idiomas_sim)],
-            ASK_IDIOMA_INST: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_idioma_inst)],
-            ASK_IDIOMA_NOME: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_idioma_nome)],
-            ASK_IDIOMA_NIVEL: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_idioma_nivel)],
-            ASK_IDIOMA_INI: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_idioma_ini)],
-            ASK_IDIOMA_FIM: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_idioma_fim)],
-            ADD_IDIOMA: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_idioma)],
-
-            CURSOS: [MessageHandler(filters.TEXT & ~filters.COMMAND, cursos)],
-        },
-        fallbacks=[CommandHandler("cancel", cancel)],
-    )
 
-    application.add_handler(conv_handler)
+    if args.mode in ("shards", "ingresso", "worker"):
+        main_shards(token, args.mode, max(1, args.shards), args.shard, args.entrada)
+        return
+
+    if args.mode == "webhook":
+        application = criar_aplicacao(token, ApplicationBuilder().updater(None))
+        try:
+            asyncio.run(rodar_webhook(application))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    application = criar_aplicacao(token, criar_builder_polling())
     print("🤖 Bot rodando...")
     application.run_polling()
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["lote"]:
+        sys.exit(main_lote(sys.argv[2:]))
     main()
\ No newline at end of file
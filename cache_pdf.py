@@ -0,0 +1,155 @@
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# --- Cache de PDFs por conteúdo ---
+# A chave é o hash do currículo que o gerar_pdf lê: o mesmo currículo enviado de novo (ou
+# refeito com /start e os mesmos dados) não é renderizado nem enviado ao Telegram outra vez.
+# Os outros formatos do currículo (DOCX, HTML, texto) usam o mesmo cache: a chave já inclui o
+# formato, e no disco cada arquivo fica com a extensão dele (`extensao` no get/put).
+
+EXTENSOES_INTERNAS = ('fileid', 'tmp')  # arquivos do disco que não são o documento
+
+def chave_conteudo(conteudo, versao=''):
+    """SHA-256 da forma canônica (JSON ordenado) do conteúdo usado na renderização."""
+    canonico = json.dumps([versao, conteudo], sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonico.encode('utf-8')).hexdigest()
+
+
+class EntradaCache:
+    __slots__ = ('dados', 'file_id')  # dados: os bytes do arquivo, qualquer que seja o formato
+
+    def __init__(self, dados, file_id=None):
+        self.dados = dados
+        self.file_id = file_id
+
+
+class CachePDF:
+    """LRU em memória limitado por bytes, com uma camada opcional em disco (write-through)."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, diretorio=None, max_arquivos_disco=10000):
+        self.max_bytes = max_bytes
+        self.diretorio = diretorio
+        self.max_arquivos_disco = max_arquivos_disco
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._gravacoes_disco = 0
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.misses = 0
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+    def get(self, chave, extensao='pdf'):
+        entrada = self._entradas.get(chave)
+        if entrada is not None:
+            self._entradas.move_to_end(chave)
+            self.hits_memoria += 1
+            return entrada
+        entrada = self._ler_disco(chave, extensao)
+        if entrada is not None:
+            self.hits_disco += 1
+            self._guardar(chave, entrada)
+            return entrada
+        self.misses += 1
+        return None
+
+    def put(self, chave, dados, extensao='pdf'):
+        entrada = EntradaCache(dados)
+        self._guardar(chave, entrada)
+        self._gravar_disco(chave, dados=dados, extensao=extensao)
+        return entrada
+
+    def registrar_file_id(self, chave, file_id):
+        entrada = self._entradas.get(chave)
+        if entrada is not None:
+            entrada.file_id = file_id
+        self._gravar_disco(chave, file_id=file_id)
+
+    def descartar_file_id(self, chave):
+        """Esquece um file_id recusado pelo Telegram (outro token, arquivo expirado): o próximo envio faz upload."""
+        entrada = self._entradas.get(chave)
+        if entrada is not None:
+            entrada.file_id = None
+        if self.diretorio:
+            try:
+                os.remove(self._caminho(chave, 'fileid'))
+            except OSError:
+                pass
+
+    def estatisticas(self):
+        return {
+            'hits_memoria': self.hits_memoria,
+            'hits_disco': self.hits_disco,
+            'misses': self.misses,
+            'entradas': len(self._entradas),
+            'bytes': self._bytes,
+        }
+
+    def _guardar(self, chave, entrada):
+        anterior = self._entradas.pop(chave, None)
+        if anterior is not None:
+            self._bytes -= len(anterior.dados)
+        if len(entrada.dados) > self.max_bytes:
+            return
+        self._entradas[chave] = entrada
+        self._bytes += len(entrada.dados)
+        while self._bytes > self.max_bytes:
+            _, removida = self._entradas.popitem(last=False)
+            self._bytes -= len(removida.dados)
+
+    # --- Camada em disco ---
+    def _caminho(self, chave, extensao):
+        return os.path.join(self.diretorio, f"{chave}.{extensao}")
+
+    def _ler_disco(self, chave, extensao='pdf'):
+        if not self.diretorio:
+            return None
+        try:
+            with open(self._caminho(chave, extensao), 'rb') as f:
+                dados = f.read()
+            os.utime(self._caminho(chave, extensao))  # a limpeza remove os menos usados
+        except OSError:
+            return None
+        try:
+            with open(self._caminho(chave, 'fileid'), encoding='ascii') as f:
+                file_id = f.read().strip() or None
+        except OSError:
+            file_id = None
+        return EntradaCache(dados, file_id)
+
+    def _gravar_disco(self, chave, dados=None, file_id=None, extensao='pdf'):
+        if not self.diretorio:
+            return
+        try:
+            if dados is not None:
+                temporario = self._caminho(chave, 'tmp')
+                with open(temporario, 'wb') as f:
+                    f.write(dados)
+                os.replace(temporario, self._caminho(chave, extensao))
+                self._gravacoes_disco += 1
+                if self._gravacoes_disco % 100 == 0:
+                    self._limpar_disco()
+            if file_id is not None:
+                with open(self._caminho(chave, 'fileid'), 'w', encoding='ascii') as f:
+                    f.write(file_id)
+        except OSError:
+            logger.exception("Falha ao gravar o cache de PDF em disco")
+
+    def _limpar_disco(self):
+        arquivos = [e for e in os.scandir(self.diretorio)
+                    if e.name.rpartition('.')[2] not in EXTENSOES_INTERNAS]
+        if len(arquivos) <= self.max_arquivos_disco:
+            return
+        arquivos.sort(key=lambda e: e.stat().st_mtime)
+        for entrada in arquivos[:len(arquivos) - self.max_arquivos_disco]:
+            chave = entrada.name.rpartition('.')[0]
+            for caminho in (entrada.path, self._caminho(chave, 'fileid')):
+                try:
+                    os.remove(caminho)
+                except OSError:
+                    pass
@@ -0,0 +1,156 @@
+import asyncio
+import itertools
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+import metricas
+
+logger = logging.getLogger(__name__)
+
+# --- Fila central de envio ---
+# Todas as chamadas da Bot API passam pelo rate limiter do PTB; este aqui segura as que têm
+# chat_id (envio de mensagens e documentos) até haver token no balde global e no balde do
+# chat. Quando falta token, quem espera há menos tempo pode passar na frente se tiver
+# prioridade maior: o PDF do /cursos (sendDocument) sai antes das perguntas da conversa.
+# Um 429 do Telegram pausa todos os envios pelo retry_after e a chamada volta para a fila.
+
+PRIORIDADE_DOCUMENTO = 0
+PRIORIDADE_MENSAGEM = 1
+PRIORIDADES_ENDPOINT = {'sendDocument': PRIORIDADE_DOCUMENTO}
+
+
+class BaldeTokens:
+    __slots__ = ('taxa', 'capacidade', 'tokens', 'atualizado')
+
+    def __init__(self, taxa, capacidade):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.tokens = capacidade
+        self.atualizado = time.monotonic()
+
+    def espera(self, agora):
+        """Segundos até haver um token (0 se já há)."""
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.taxa
+
+    def consumir(self):
+        self.tokens -= 1
+
+    def cheio(self, agora):
+        return self.tokens + (agora - self.atualizado) * self.taxa >= self.capacidade
+
+
+class LimitadorEnvio(BaseRateLimiter):
+    def __init__(self, taxa_global=30, taxa_chat=1, rajada_chat=3, max_tentativas=3):
+        self.taxa_chat = taxa_chat
+        self.rajada_chat = rajada_chat
+        self.max_tentativas = max_tentativas
+        # Sem rajada no balde global: os envios saem espaçados, no teto da plataforma
+        self._global = BaldeTokens(taxa_global, 1)
+        self._chats = {}  # chat_id -> BaldeTokens (os que voltaram a ficar cheios são descartados)
+        self._pendentes = []  # (prioridade, ordem, chat_id, futuro), ordenada a cada despacho
+        self._ordem = itertools.count()
+        self._pausa_ate = 0.0
+        self._acordar = asyncio.Event()
+        self._despachante = None
+        self._despachados = 0
+        self.enviados = 0
+        self.respostas_429 = 0
+
+    async def initialize(self):
+        if self._despachante is None:
+            self._despachante = asyncio.get_running_loop().create_task(self._despachar())
+
+    async def shutdown(self):
+        if self._despachante is not None:
+            self._despachante.cancel()
+            try:
+                await self._despachante
+            except asyncio.CancelledError:
+                pass
+            self._despachante = None
+        for _, _, _, futuro in self._pendentes:
+            futuro.cancel()
+        self._pendentes.clear()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get('chat_id')
+        if chat_id is None:
+            # getMe, setWebhook, answerCallbackQuery...: não contam nos limites de envio
+            return await callback(*args, **kwargs)
+
+        # rate_limit_args permite ao chamador escolher a prioridade (menor sai antes)
+        prioridade = rate_limit_args if rate_limit_args is not None else \
+            PRIORIDADES_ENDPOINT.get(endpoint, PRIORIDADE_MENSAGEM)
+        ordem = next(self._ordem)
+        for tentativa in range(self.max_tentativas + 1):
+            inicio = time.monotonic()
+            await self._aguardar_vez(prioridade, ordem, chat_id)
+            metricas.envio_espera_segundos.observar(time.monotonic() - inicio, endpoint)
+            try:
+                resultado = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self.respostas_429 += 1
+                metricas.envio_429.inc(endpoint)
+                if tentativa == self.max_tentativas:
+                    raise
+                # Pausa todos os envios; a chamada volta com a mesma ordem (não perde o lugar)
+                self._pausa_ate = max(self._pausa_ate, time.monotonic() + e.retry_after)
+                logger.warning("429 em %s para o chat %s: pausando envios por %s s", endpoint, chat_id, e.retry_after)
+                continue
+            self.enviados += 1
+            return resultado
+
+    async def _aguardar_vez(self, prioridade, ordem, chat_id):
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendentes.append((prioridade, ordem, chat_id, futuro))
+        self._acordar.set()
+        await futuro
+
+    async def _dormir(self, segundos):
+        self._acordar.clear()
+        try:
+            await asyncio.wait_for(self._acordar.wait(), segundos)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _despachar(self):
+        while True:
+            self._pendentes = [p for p in self._pendentes if not p[3].cancelled()]
+            if not self._pendentes:
+                self._acordar.clear()
+                await self._acordar.wait()
+                continue
+            agora = time.monotonic()
+            espera = max(self._pausa_ate - agora, self._global.espera(agora))
+            if espera > 0:
+                await self._dormir(espera)
+                continue
+
+            # Primeiro da fila (por prioridade e chegada) cujo chat tem token
+            self._pendentes.sort()
+            escolhido, espera = None, float('inf')
+            for indice, (_, _, chat_id, _) in enumerate(self._pendentes):
+                balde = self._chats.get(chat_id)
+                if balde is None:
+                    balde = self._chats[chat_id] = BaldeTokens(self.taxa_chat, self.rajada_chat)
+                espera_chat = balde.espera(agora)
+                if espera_chat <= 0:
+                    escolhido = indice
+                    break
+                espera = min(espera, espera_chat)
+            if escolhido is None:
+                await self._dormir(espera)
+                continue
+
+            _, _, chat_id, futuro = self._pendentes.pop(escolhido)
+            self._global.consumir()
+            self._chats[chat_id].consumir()
+            futuro.set_result(None)
+            self._despachados += 1
+            if len(self._chats) > 1024 and self._despachados % 1024 == 0:
+                self._chats = {c: b for c, b in self._chats.items() if not b.cheio(agora)}
@@ -0,0 +1,182 @@
+import json
+import re
+import unicodedata
+
+# --- Ficha: o currículo inteiro numa única mensagem ---
+# Alternativa às dezenas de perguntas da conversa: o usuário manda a ficha em texto (linhas
+# "campo: valor", com [seções] abrindo cada graduação, experiência ou idioma) ou um JSON no
+# formato do user_data. Aqui só se monta o dict; a normalização e a validação são as mesmas
+# da conversa (bot_curriculo.montar_curriculo).
+
+MODELO_FICHA = """nome: Maria da Silva
+idade: 30
+estado civil: Solteira
+telefone: 11987654321
+email: maria@exemplo.com
+ensino medio: S
+ano ensino medio: 2012
+contrato: CLT
+cursos: Excel Avançado, Power BI
+
+[graduacao]
+faculdade: Universidade Federal
+curso: Administração
+situacao: C
+ano: 2017
+
+[experiencia]
+empresa: Empresa Exemplo
+cargo: Analista Administrativo
+admissao: 01/2020
+saida: Atual
+atividades: Gestão de projetos; Relatórios mensais
+resultados: Redução de custos em 15%
+
+[idioma]
+instituicao: Escola de Idiomas
+idioma: Inglês
+nivel: I
+inicio: 2015
+fim: Cursando"""
+
+# Nomes aceitos na ficha (já normalizados por _chave) -> campo do currículo
+APELIDOS_CURRICULO = {
+    'nome': 'nome', 'nome_completo': 'nome',
+    'idade': 'idade',
+    'estado_civil': 'estado_civil',
+    'telefone': 'telefone', 'celular': 'telefone',
+    'email': 'email', 'e_mail': 'email',
+    'ensino_medio': 'forma_2grau', 'forma_2grau': 'forma_2grau',
+    'ano_ensino_medio': 'ano_2grau', 'ano_do_ensino_medio': 'ano_2grau', 'ano_2grau': 'ano_2grau',
+    'contrato': 'tipo_contrato', 'tipo_contrato': 'tipo_contrato', 'tipo_de_contrato': 'tipo_contrato',
+    'trabalhos_mei': 'mei_trabalhos', 'servicos': 'mei_trabalhos', 'mei_trabalhos': 'mei_trabalhos',
+    'cursos': 'cursos', 'cursos_adicionais': 'cursos', 'certificacoes': 'cursos',
+}
+_APELIDOS_ACADEMICO = {
+    'faculdade': 'faculdade', 'universidade': 'faculdade', 'instituicao': 'faculdade',
+    'curso': 'curso',
+    'situacao': 'situacao',
+    'ano': 'ano', 'ano_conclusao': 'ano', 'ano_de_conclusao': 'ano', 'conclusao': 'ano',
+}
+APELIDOS_ITEM = {
+    'graduacoes': _APELIDOS_ACADEMICO,
+    'pos_graduacoes': _APELIDOS_ACADEMICO,
+    'experiencias': {
+        'empresa': 'empresa',
+        'cargo': 'cargo',
+        'admissao': 'adm', 'adm': 'adm', 'inicio': 'adm',
+        'saida': 'dem', 'demissao': 'dem', 'dem': 'dem', 'fim': 'dem',
+        'atividades': 'atividades',
+        'resultados': 'resultados', 'conquistas': 'resultados',
+    },
+    'idiomas': {
+        'instituicao': 'instituicao', 'escola': 'instituicao',
+        'idioma': 'nome_idioma', 'nome_idioma': 'nome_idioma',
+        'nivel': 'nivel',
+        'inicio': 'ini', 'ini': 'ini',
+        'fim': 'fim', 'conclusao': 'fim',
+    },
+}
+# Cabeçalho da seção (ou chave da lista no JSON) -> lista do currículo
+SECOES = {
+    'graduacao': 'graduacoes', 'graduacoes': 'graduacoes',
+    'pos_graduacao': 'pos_graduacoes', 'pos_graduacoes': 'pos_graduacoes', 'pos': 'pos_graduacoes',
+    'experiencia': 'experiencias', 'experiencias': 'experiencias',
+    'idioma': 'idiomas', 'idiomas': 'idiomas',
+}
+# Linhas de continuação ("- item") entram no campo anterior com este separador (padrão: uma por linha)
+SEPARADORES = {'cursos': ', ', 'mei_trabalhos': ', '}
+
+_NAO_ALFANUMERICO = re.compile(r'[^a-z0-9]+')
+
+def _chave(texto):
+    # "Pós-Graduação" -> "pos_graduacao", "E-mail" -> "e_mail"
+    sem_acento = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+    return _NAO_ALFANUMERICO.sub('_', sem_acento.lower()).strip('_')
+
+def ler_texto(texto):
+    """Lê a ficha em texto; devolve (dict no formato do user_data, erros de leitura)."""
+    data, erros = {}, []
+    item, apelidos, ultimo = None, {}, None
+    for n, linha in enumerate(texto.splitlines(), 1):
+        linha = linha.strip()
+        if not linha:
+            continue
+        if linha.startswith('[') and linha.endswith(']'):
+            lista = SECOES.get(_chave(linha[1:-1]))
+            if lista is None:
+                erros.append(f"linha {n}: seção desconhecida {linha}")
+                item, apelidos, ultimo = None, {}, None
+                continue
+            item, apelidos, ultimo = {}, APELIDOS_ITEM[lista], None
+            data.setdefault(lista, []).append(item)
+            continue
+        if linha[0] in '-•' and ultimo is not None:
+            alvo, campo = ultimo
+            parte = linha[1:].strip()
+            separador = SEPARADORES.get(campo, '\n')
+            alvo[campo] = alvo[campo] + separador + parte if alvo[campo] else parte
+            continue
+
+        nome, separador, valor = linha.partition(':')
+        if not separador:
+            erros.append(f"linha {n}: use o formato 'campo: valor'")
+            continue
+        chave = _chave(nome)
+        # Dentro de uma seção valem os campos do item; os do currículo continuam aceitos
+        if chave in apelidos and item is not None:
+            alvo, campo = item, apelidos[chave]
+        elif chave in APELIDOS_CURRICULO:
+            alvo, campo = data, APELIDOS_CURRICULO[chave]
+        else:
+            erros.append(f"linha {n}: campo desconhecido '{nome.strip()}'")
+            ultimo = None
+            continue
+        alvo[campo] = valor.strip()
+        ultimo = (alvo, campo)
+    return data, erros
+
+def _texto_json(valor, separador):
+    if isinstance(valor, list):
+        return separador.join(str(v).strip() for v in valor)
+    return '' if valor is None else str(valor).strip()
+
+def _campos_json(origem, apelidos, rotulo, erros):
+    destino = {}
+    for nome, valor in origem.items():
+        campo = apelidos.get(_chave(nome))
+        if campo is None:
+            erros.append(f"{rotulo}campo desconhecido '{nome}'")
+        else:
+            # Listas de texto (atividades, cursos...) viram o texto que a conversa guardaria
+            destino[campo] = _texto_json(valor, SEPARADORES.get(campo, '\n'))
+    return destino
+
+def ler_json(texto):
+    """Lê a ficha em JSON (mesmo formato do user_data e do modo lote)."""
+    try:
+        origem = json.loads(texto)
+    except ValueError as e:
+        return {}, [f"JSON inválido: {e}"]
+    if not isinstance(origem, dict):
+        return {}, ["JSON inválido: esperado um objeto com os campos do currículo"]
+
+    data, erros = {}, []
+    campos = {}
+    for nome, valor in origem.items():
+        lista = SECOES.get(_chave(nome))
+        if lista is None:
+            campos[nome] = valor
+        elif not isinstance(valor, list) or not all(isinstance(v, dict) for v in valor):
+            erros.append(f"{nome}: deve ser uma lista de objetos")
+        else:
+            data[lista] = [_campos_json(v, APELIDOS_ITEM[lista], f"{nome} {n}: ", erros) for n, v in enumerate(valor, 1)]
+    data.update(_campos_json(campos, APELIDOS_CURRICULO, "", erros))
+    return data, erros
+
+def ler_ficha(texto):
+    """Texto ou JSON, pelo primeiro caractere; devolve (dict, erros de leitura)."""
+    texto = texto.strip()
+    if texto.startswith('{'):
+        return ler_json(texto)
+    return ler_texto(texto)
@@ -0,0 +1,199 @@
+import copy
+import io
+import logging
+import os
+
+from fontTools import subset as ftsubset
+from fontTools import ttLib
+from fpdf import FPDF
+from fpdf.enums import TextEmphasis
+from fpdf.fonts import SubsetMap, TTFFont
+
+logger = logging.getLogger(__name__)
+
+# --- Fontes TrueType compartilhadas pelo processo ---
+# O add_font do fpdf2 lê o arquivo TTF inteiro a cada PDF (cmap, larguras dos glifos) e, na
+# saída, recorta a fonte completa para embutir só os glifos usados. Aqui cada arquivo é lido
+# uma única vez por processo: os PDFs recebem uma cópia leve da fonte que compartilha cmap,
+# larguras e glifos, e a saída parte de um recorte pequeno com os caracteres latinos, feito
+# uma vez. Só um texto com glifos fora desse recorte (cirílico, grego...) usa a fonte inteira.
+
+# Arquivos de cada estilo: <nome><sufixo>.ttf; estilos sem arquivo usam o mais próximo
+SUFIXOS = {'': ('',), 'B': ('-Bold',), 'I': ('-Oblique', '-Italic'), 'BI': ('-BoldOblique', '-BoldItalic')}
+ALTERNATIVAS = {'B': '', 'I': '', 'BI': 'B'}
+
+# Caracteres do recorte latino: ASCII, Latin-1, Latin Extended-A, pontuação tipográfica e o euro
+FAIXAS_BASE = (range(0x20, 0x7F), range(0xA0, 0x180), range(0x2010, 0x2028), range(0x2030, 0x203B), (0x20AC,))
+
+_get_glyph = SubsetMap.get_glyph.__wrapped__
+
+def _sem_cache():
+    pass
+
+class _SubsetCompartilhado(SubsetMap):
+    # O SubsetMap do fpdf2 guarda pick/get_glyph num functools.cache da classe, preso a cada
+    # documento. Aqui o glifo de cada caractere fica num dict da fonte, compartilhado por todos
+    # os PDFs; por documento fica só a numeração dos caracteres usados.
+    def __init__(self, font, glifos):
+        self._glifos = glifos
+        self._escolhidos = {}
+        super().__init__(font)
+
+    def get_glyph(self, glyph=None, unicode=None, glyph_name=None, glyph_width=None):
+        if glyph is not None or glyph_name is not None or not isinstance(unicode, int):
+            return _get_glyph(self, glyph, unicode, glyph_name, glyph_width)
+        try:
+            return self._glifos[unicode]
+        except KeyError:
+            resultado = self._glifos[unicode] = _get_glyph(self, None, unicode)
+            return resultado
+
+    def pick(self, unicode):
+        try:
+            return self._escolhidos[unicode]
+        except KeyError:
+            glifo = self.get_glyph(unicode=unicode)
+            if glifo is None and unicode not in self.font.missing_glyphs:
+                self.font.missing_glyphs.append(unicode)
+            resultado = self._escolhidos[unicode] = self.pick_glyph(glifo)
+            return resultado
+
+    # A saída do fpdf2 limpa o functools.cache dos dois métodos; aqui não há o que limpar
+    get_glyph.cache_clear = pick.cache_clear = _sem_cache
+
+class _Larguras(dict):
+    # Largura por caractere (não por código), como nas fontes core: a soma vira um map() em C
+    __slots__ = ('cw',)
+
+    def __init__(self, cw):
+        super().__init__()
+        self.cw = cw
+
+    def __missing__(self, caractere):
+        largura = self[caractere] = self.cw[ord(caractere)]
+        return largura
+
+class _FonteDocumento(TTFFont):
+    """A fonte registrada num PDF: cópia rasa do modelo, com a medição de texto das fontes core."""
+    __slots__ = ('larguras',)
+
+    # A quebra de linha do multi_cell mede o mesmo trecho várias vezes; o TTFFont faz
+    # sum(cw[ord(c)] for c in texto), um gerador em Python por medição.
+    def get_text_width(self, text, font_size_pt, text_shaping_params):
+        if text_shaping_params or self.is_symbol:
+            return super().get_text_width(text, font_size_pt, text_shaping_params)
+        if font_size_pt > self.biggest_size_pt:
+            self.biggest_size_pt = font_size_pt
+        return len(text), sum(map(self.larguras.__getitem__, text)) * font_size_pt * 0.001
+
+class FonteTTF:
+    """Um arquivo TTF lido uma vez: o modelo da fonte, os recortes e os glifos já resolvidos."""
+    def __init__(self, caminho):
+        self.caminho = caminho
+        with open(caminho, 'rb') as f:
+            self.dados = f.read()
+        self.modelo = TTFFont(FPDF(), caminho, 'modelo', '')
+        # cmap, larguras e descritor já estão no modelo; a fonte em si só é usada na saída
+        self.modelo.ttfont.close()
+        self.modelo.ttfont = None
+        self.glifos = {}
+        self.larguras = _Larguras(self.modelo.cw)
+        self._recortes = {}  # hinting -> (bytes do recorte latino, nomes dos glifos)
+
+    def recorte(self, hinting=True):
+        """Recorte latino de onde a saída parte, com ou sem hinting; (bytes, nomes dos glifos)."""
+        if hinting not in self._recortes:
+            self._recortes[hinting] = self._recortar(hinting)
+        return self._recortes[hinting]
+
+    def _recortar(self, hinting):
+        ttfont = ttLib.TTFont(io.BytesIO(self.dados), recalcTimestamp=False)
+        # glyph_names: o recorte mantém os nomes dos glifos, que o fpdf2 usa para achá-los na saída.
+        # hinting=False descarta as instruções TrueType (metade do tamanho da DejaVu); só pesa
+        # na rasterização em tamanhos pequenos, em telas de baixa resolução.
+        opcoes = ftsubset.Options(notdef_outline=True, recommended_glyphs=True, glyph_names=True, hinting=hinting)
+        opcoes.drop_tables += ['FFTM']  # o fpdf2 também descarta (carimbo de data do FontForge)
+        subsetter = ftsubset.Subsetter(opcoes)
+        subsetter.populate(unicodes=[c for faixa in FAIXAS_BASE for c in faixa])
+        subsetter.subset(ttfont)
+        saida = io.BytesIO()
+        ttfont.save(saida)
+        return saida.getvalue(), frozenset(ttfont.getGlyphOrder())
+
+    def para_documento(self, pdf, fontkey, estilo):
+        fonte = _FonteDocumento.__new__(_FonteDocumento)
+        for atributo in TTFFont.__slots__:
+            if hasattr(self.modelo, atributo):
+                setattr(fonte, atributo, getattr(self.modelo, atributo))
+        fonte.larguras = self.larguras
+        fonte.i = len(pdf.fonts) + 1
+        fonte.fontkey = fontkey
+        fonte.desc = copy.copy(self.modelo.desc)  # a saída grava nele o id do objeto e o arquivo da fonte
+        fonte.emphasis = TextEmphasis.coerce(estilo)
+        fonte.missing_glyphs = []
+        fonte.biggest_size_pt = 0
+        fonte.subset = _SubsetCompartilhado(fonte, self.glifos)
+        return fonte
+
+    def ttfont_saida(self, nomes_glifos, hinting=True):
+        # A saída do fpdf2 recorta (e altera) a fonte que recebe: cada PDF ganha a sua, lida do recorte
+        dados, nomes_base = self.recorte(hinting)
+        if not nomes_glifos <= nomes_base:
+            # Fonte inteira, sempre com hinting: tirá-lo de todos os glifos leva segundos
+            dados = self.dados
+        return ttLib.TTFont(io.BytesIO(dados), recalcTimestamp=False, lazy=True)
+
+class FamiliaTTF:
+    """Os estilos de uma família, registrados em cada PDF como fontes já prontas."""
+    def __init__(self, nome, fontes, estilos):
+        self.nome = nome.lower()
+        self.fontes = fontes  # estilo com arquivo próprio -> FonteTTF
+        # estilo pedido -> estilo desenhado; sem arquivo próprio, o alternativo (registrar os dois
+        # embutiria a mesma fonte duas vezes no PDF)
+        self.estilos = estilos
+
+    def registrar(self, pdf, estilo):
+        # Chamado no primeiro set_font de cada estilo: o fpdf2 embute toda fonte registrada, usada ou não
+        fontkey = self.nome + estilo
+        pdf.fonts[fontkey] = self.fontes[estilo].para_documento(pdf, fontkey, estilo)
+
+    def aquecer(self, hinting=True):
+        # O recorte latino de cada estilo, feito antes do primeiro PDF
+        for fonte in self.fontes.values():
+            fonte.recorte(hinting)
+
+    def preparar_saida(self, pdf, hinting=True):
+        for estilo, fonte in self.fontes.items():
+            registrada = pdf.fonts.get(self.nome + estilo)
+            if registrada is not None and registrada.ttfont is None:
+                nomes = frozenset(registrada.subset.get_all_glyph_names())
+                registrada.ttfont = fonte.ttfont_saida(nomes, hinting)
+
+_familias = {}
+
+def carregar_familia(diretorio, nome):
+    """Família `nome` de `diretorio`, lida uma vez por processo; None se o arquivo regular não existe."""
+    chave = (diretorio, nome)
+    if chave not in _familias:
+        _familias[chave] = _ler_familia(diretorio, nome)
+    return _familias[chave]
+
+def _ler_familia(diretorio, nome):
+    caminhos = {}
+    for estilo, sufixos in SUFIXOS.items():
+        for sufixo in sufixos:
+            caminho = os.path.join(diretorio, f"{nome}{sufixo}.ttf")
+            if os.path.isfile(caminho):
+                caminhos[estilo] = caminho
+                break
+    if '' not in caminhos:
+        logger.warning("Fonte %s não encontrada em %s; o PDF usa a helvetica (só Latin-1)", nome, diretorio)
+        return None
+
+    estilos = {}
+    for estilo in SUFIXOS:
+        real = estilo
+        while real not in caminhos:
+            real = ALTERNATIVAS[real]
+        estilos[estilo] = real
+    return FamiliaTTF(nome, {estilo: FonteTTF(caminho) for estilo, caminho in caminhos.items()}, estilos)
@@ -0,0 +1,205 @@
+import html
+import io
+import re
+import zipfile
+
+from layout_cv import EL_ESPACO, EL_MARCADOR, EL_TEXTO, EL_TITULO, LEFT_MARGIN, STEELBLUE, TITULO_CV
+
+# --- Formatos de saída ---
+# O mesmo documento (layout_cv.documento_cv) vai para cada formato pedido: o PDF do fpdf2
+# (pdf_cv), DOCX para editar no Word, HTML e texto puro para colar nos portais de vagas.
+# Cada formato é uma função documento -> bytes, chamada nos processos de render; o documento
+# é montado uma vez por currículo, não uma vez por formato.
+# Os espaços (EL_ESPACO) viram margem antes do elemento seguinte; linhas vazias (Vazio) e a
+# quebra de linha das listas ficam com o programa que abre o arquivo, exceto no PDF.
+
+class Formato:
+    def __init__(self, nome, rotulo, renderizar):
+        self.nome = nome  # também a extensão do arquivo
+        self.rotulo = rotulo
+        self.renderizar = renderizar
+
+def _cor_hex(cor):
+    return '%02X%02X%02X' % cor
+
+def para_pdf(documento):
+    # O fpdf2 só é importado aqui, nos processos de render
+    from pdf_cv import pdf_do_documento
+
+    return bytes(pdf_do_documento(documento).output())
+
+# --- Texto ---
+RECUO_TEXTO_MM = 2.5  # mm de recuo do layout por espaço no texto
+
+def para_texto(documento):
+    linhas = [TITULO_CV.upper()]
+    for secao in documento:
+        for elemento in secao:
+            tipo = elemento[0]
+            if tipo == EL_TITULO:
+                titulo = elemento[4]
+                linhas += ['', titulo.upper(), '-' * len(titulo)]
+            elif tipo == EL_TEXTO:
+                if elemento[5]:
+                    linhas.append(' ' * int(elemento[1] / RECUO_TEXTO_MM) + elemento[5])
+            elif tipo == EL_MARCADOR:
+                linhas.append(' ' * int(elemento[1] / RECUO_TEXTO_MM) + '- ' + elemento[5])
+    return ('\n'.join(linhas) + '\n').encode('utf-8')
+
+# --- HTML ---
+CSS_HTML = (
+    "body{font-family:'DejaVu Sans',Arial,sans-serif;max-width:180mm;margin:0 auto 10mm;padding:0 10mm 0 %dmm}"
+    "header{background:#%s;color:#fff;font-weight:bold;font-size:16pt;text-align:center;padding:3mm;"
+    "margin:0 -10mm 0 -%dmm}"
+    "h2{font-size:14pt;color:#%s;margin:0;padding:3mm 0}"
+    "p{margin:0;font-size:12pt}ul{margin:0;padding:0}li{list-style:none}li:before{content:'- '}"
+) % (LEFT_MARGIN, _cor_hex(STEELBLUE), LEFT_MARGIN, _cor_hex(STEELBLUE))
+
+def _estilo_html(estilo, recuo, espaco, tag):
+    regras = []
+    if espaco:
+        regras.append(f"margin-top:{espaco:g}mm")
+    if recuo and tag != 'li':
+        regras.append(f"margin-left:{recuo:g}mm")
+    if estilo is not None:
+        enfase, tamanho = estilo
+        if 'B' in enfase:
+            regras.append("font-weight:bold")
+        if 'I' in enfase:
+            regras.append("font-style:italic")
+        if tamanho != 12:
+            regras.append(f"font-size:{tamanho:g}pt")
+    return f' style="{";".join(regras)}"' if regras else ''
+
+def para_html(documento):
+    partes = ['<!DOCTYPE html>\n<html lang="pt-BR"><head><meta charset="utf-8">'
+              '<meta name="viewport" content="width=device-width,initial-scale=1">'
+              f'<title>{html.escape(TITULO_CV)}</title><style>{CSS_HTML}</style></head>'
+              f'<body><header>{html.escape(TITULO_CV)}</header>']
+    for secao in documento:
+        partes.append('<section>')
+        espaco, lista = 0, None  # recuo da <ul> aberta
+        for elemento in secao:
+            tipo = elemento[0]
+            if tipo == EL_ESPACO:
+                espaco += elemento[1]
+                continue
+            if lista is not None and (tipo != EL_MARCADOR or elemento[1] != lista):
+                partes.append('</ul>')
+                lista = None
+            if tipo == EL_TITULO:
+                # A margem antes do título já está no padding do h2
+                partes.append(f'<h2>{html.escape(elemento[4])}</h2>')
+            elif tipo == EL_TEXTO:
+                _, recuo, _, estilo, _, texto = elemento
+                if not texto:
+                    espaco += elemento[2]
+                    continue
+                partes.append(f'<p{_estilo_html(estilo, recuo, espaco, "p")}>{html.escape(texto)}</p>')
+            else: # EL_MARCADOR
+                _, recuo, _, estilo, _, texto, _ = elemento
+                if lista is None:
+                    partes.append(f'<ul style="margin-left:{recuo:g}mm">')
+                    lista = recuo
+                partes.append(f'<li{_estilo_html(estilo, recuo, espaco, "li")}>{html.escape(texto)}</li>')
+            espaco = 0
+        if lista is not None:
+            partes.append('</ul>')
+        partes.append('</section>')
+    partes.append('</body></html>\n')
+    return ''.join(partes).encode('utf-8')
+
+# --- DOCX ---
+# WordprocessingML mínimo, escrito direto no zip (sem o python-docx): A4 com as margens do
+# PDF, formatação direta em cada parágrafo e datas fixas no zip, como os metadados fixos do
+# PDF: o mesmo currículo gera sempre os mesmos bytes.
+TWIPS_POR_MM = 1440 / 25.4
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/></Relationships>'
+)
+_SECAO_DOCX = (
+    '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/><w:pgMar w:top="567" w:right="567" w:bottom="850" '
+    f'w:left="{round(LEFT_MARGIN * TWIPS_POR_MM)}" w:header="0" w:footer="0" w:gutter="0"/></w:sectPr>'
+)
+# Caracteres de controle não são permitidos no XML (podem vir colados pelo usuário)
+_CONTROLE_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def _twips(mm):
+    return round(mm * TWIPS_POR_MM)
+
+def _paragrafo_docx(texto, estilo, recuo=0, espaco=0, cor=None, fundo=None, centro=False):
+    propriedades = f'<w:spacing w:before="{_twips(espaco)}" w:after="0"/>'
+    if recuo:
+        propriedades += f'<w:ind w:left="{_twips(recuo)}"/>'
+    if fundo is not None:
+        propriedades = f'<w:shd w:val="clear" w:color="auto" w:fill="{_cor_hex(fundo)}"/>' + propriedades
+    if centro:
+        propriedades += '<w:jc w:val="center"/>'
+    enfase, tamanho = estilo
+    formato = ('<w:b/>' if 'B' in enfase else '') + ('<w:i/>' if 'I' in enfase else '')
+    if cor is not None and cor != (0, 0, 0):
+        formato += f'<w:color w:val="{_cor_hex(cor)}"/>'
+    formato += f'<w:sz w:val="{round(tamanho * 2)}"/>'
+    texto = html.escape(_CONTROLE_XML.sub('', texto), quote=False)
+    return (f'<w:p><w:pPr>{propriedades}</w:pPr>'
+            f'<w:r><w:rPr>{formato}</w:rPr><w:t xml:space="preserve">{texto}</w:t></w:r></w:p>')
+
+def para_docx(documento):
+    corpo = [_paragrafo_docx(TITULO_CV, ('B', 16), cor=(255, 255, 255), fundo=STEELBLUE, centro=True)]
+    for secao in documento:
+        espaco = 0
+        for elemento in secao:
+            tipo = elemento[0]
+            if tipo == EL_ESPACO:
+                espaco += elemento[1]
+                continue
+            if tipo == EL_TITULO:
+                _, h, estilo, cor, texto = elemento
+                corpo.append(_paragrafo_docx(texto, estilo, espaco=espaco + h / 4, cor=cor))
+            elif tipo == EL_TEXTO:
+                _, recuo, h, estilo, cor, texto = elemento
+                if not texto:
+                    espaco += h
+                    continue
+                corpo.append(_paragrafo_docx(texto, estilo, recuo, espaco, cor))
+            else: # EL_MARCADOR
+                _, recuo, _, estilo, cor, texto, _ = elemento
+                corpo.append(_paragrafo_docx('- ' + texto, estilo, recuo, espaco, cor))
+            espaco = 0
+    documento_xml = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+        + ''.join(corpo) + _SECAO_DOCX + '</w:body></w:document>'
+    )
+    saida = io.BytesIO()
+    with zipfile.ZipFile(saida, 'w') as arquivo:
+        for nome, conteudo in (('[Content_Types].xml', _CONTENT_TYPES), ('_rels/.rels', _RELS),
+                               ('word/document.xml', documento_xml)):
+            info = zipfile.ZipInfo(nome, date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            arquivo.writestr(info, conteudo)
+    return saida.getvalue()
+
+FORMATOS_SAIDA = {
+    'pdf': Formato('pdf', 'PDF', para_pdf),
+    'docx': Formato('docx', 'Word (DOCX)', para_docx),
+    'html': Formato('html', 'HTML', para_html),
+    'txt': Formato('txt', 'Texto', para_texto),
+}
+
+def renderizar(formato, documento):
+    return FORMATOS_SAIDA[formato].renderizar(documento)
@@ -0,0 +1,268 @@
+import os
+from datetime import datetime, timezone
+
+# --- O currículo como documento ---
+# Layout e configuração da saída, sem o fpdf: o bot importa este módulo no boot (a chave do
+# cache de PDFs depende da fonte e do perfil) e o pdf_cv, que desenha o layout, só é
+# importado no primeiro PDF, nos processos de render. O layout aplicado a um currículo
+# (documento_cv) é o documento que o PDF e os outros formatos (formatos.py) desenham.
+LEFT_MARGIN = 20
+STEELBLUE = (70, 130, 180)
+BRANCO = (255, 255, 255)
+PRETO = (0, 0, 0)
+CINZA = 128
+TITULO_CV = 'Currículo Profissional'
+
+# Fonte Unicode embutida no PDF: <PDF_FONTE>.ttf (e -Bold, -Oblique) em PDF_FONTE_DIR, lida uma
+# vez por processo (ver fontes.py). PDF_FONTE vazio ou arquivo ausente: helvetica, só Latin-1.
+PDF_FONTE_DIR = os.getenv("PDF_FONTE_DIR", "/usr/share/fonts/truetype/dejavu")
+PDF_FONTE = os.getenv("PDF_FONTE", "DejaVuSans")
+
+# Perfil de saída do PDF: troca CPU do render por bytes no upload, que domina a entrega em
+# conexões lentas. metadados_fixos fixa a data de criação (SOURCE_DATE_EPOCH, como nos builds
+# reproduzíveis) e o produtor: o mesmo currículo gera sempre os mesmos bytes.
+class PerfilSaida:
+    def __init__(self, compressao=-1, hinting=True, metadados_fixos=True):
+        self.compressao = compressao  # nível do zlib (0-9; -1 = padrão do zlib, 6)
+        self.hinting = hinting        # instruções TrueType na fonte embutida
+        self.metadados_fixos = metadados_fixos
+
+PERFIS_SAIDA = {
+    'padrao': PerfilSaida(metadados_fixos=False),  # o que o fpdf2 faz sozinho
+    'rapido': PerfilSaida(compressao=1),
+    'compacto': PerfilSaida(compressao=9, hinting=False),
+}
+PDF_PERFIL = os.getenv("PDF_PERFIL", "compacto")
+PRODUTOR_PDF = 'bot_curriculo'
+DATA_PDF_FIXA = datetime.fromtimestamp(int(os.getenv("SOURCE_DATE_EPOCH", "0")), timezone.utc)
+
+# --- Layout declarativo do currículo ---
+# O layout é descrito uma única vez (LAYOUT_CV) e compilado no import numa lista plana de
+# operações de desenho. Cada operação já carrega recuo, altura, fonte e cor resolvidos;
+# na renderização só trocamos fonte/cor quando elas realmente mudam.
+
+class Secao:
+    def __init__(self, titulo, itens):
+        self.titulo = titulo
+        self.itens = itens
+
+class Texto:
+    """Linha de texto; o template é formatado com os campos do item atual e {n} (posição na lista)."""
+    def __init__(self, template, h=5, estilo=('', 12), recuo=0):
+        self.template = template
+        self.h = h
+        self.estilo = estilo
+        self.recuo = recuo
+
+class Campo:
+    """Linha 'Rótulo: valor' lida de uma chave do item atual."""
+    def __init__(self, rotulo, chave, padrao='', formato=None, h=5, estilo=('', 12), recuo=0):
+        self.rotulo = rotulo
+        self.chave = chave
+        self.padrao = padrao
+        self.formato = formato
+        self.h = h
+        self.estilo = estilo
+        self.recuo = recuo
+
+class Vazio:
+    """Linha em branco usada quando a seção não tem conteúdo."""
+    def __init__(self, h=6):
+        self.h = h
+
+class Espaco:
+    def __init__(self, h):
+        self.h = h
+
+class Marcadores:
+    """Lista '- item' a partir de um texto separado por `separador`."""
+    def __init__(self, chave, separador, h=5, estilo=('', 10), recuo=5, quebra_linha=True):
+        self.chave = chave
+        self.separador = separador
+        self.h = h
+        self.estilo = estilo
+        self.recuo = recuo
+        self.quebra_linha = quebra_linha
+
+class Se:
+    def __init__(self, condicao, entao, senao=()):
+        self.condicao = condicao
+        self.entao = entao
+        self.senao = senao
+
+class Grupo:
+    """Bloco repetido para cada item de uma lista do user_data (graduações, experiências...)."""
+    def __init__(self, chave, itens, cabecalho=(), vazio=(Vazio(),)):
+        self.chave = chave
+        self.itens = itens
+        self.cabecalho = cabecalho
+        self.vazio = vazio
+
+NIVEIS_IDIOMA = {'B': 'Básico', 'I': 'Intermediário', 'A': 'Avançado'}
+
+def _bloco_academico(titulo):
+    return (
+        Espaco(1),
+        Texto(titulo + " {n}:", h=7, estilo=('B', 11)),
+        Campo("Universidade", 'faculdade', estilo=('', 11), recuo=5),
+        Campo("Curso", 'curso', estilo=('', 11), recuo=5),
+        Se(lambda item: item.situacao == 'C',
+           (Texto("Situação: Concluído em {ano}", estilo=('', 11), recuo=5),),
+           (Texto("Situação: Cursando", estilo=('', 11), recuo=5),)),
+    )
+
+LAYOUT_CV = (
+    Secao("Dados Pessoais", (
+        Campo("Nome", 'nome', 'Não informado', h=6),
+        Campo("Idade", 'idade', 'Não informada', h=6),
+        Campo("Estado Civil", 'estado_civil', 'Não informado', h=6),
+        Campo("Telefone", 'telefone', 'Não informado', h=6),
+        Campo("E-mail", 'email', 'Não informado', h=6),
+    )),
+    Secao("Formação Acadêmica", (
+        Se(lambda cv: cv.forma_2grau == 'S',
+           (Campo("Ensino Médio", 'ano_2grau', 'Não informado', formato="Concluído em {}".format, h=6),),
+           (Texto("Ensino Médio: Incompleto", h=6),)),
+        Grupo('graduacoes', _bloco_academico("Graduação")),
+        Grupo('pos_graduacoes', _bloco_academico("Pós-Graduação")),
+    )),
+    Secao("Experiência Profissional", (
+        Se(lambda cv: cv.tipo_contrato == '2', (
+            Texto("Tipo de Contrato: Microempreendedor Individual (MEI)", h=7, estilo=('B', 12)),
+            Se(lambda cv: bool(cv.mei_trabalhos),
+               (Texto("Principais Trabalhos/Serviços:", h=6, estilo=('B', 10)),
+                Marcadores('mei_trabalhos', ',')),
+               (Vazio(),)),
+        ), (
+            Se(lambda cv: cv.tipo_contrato == '1', (
+                Grupo('experiencias', (
+                    Espaco(1),
+                    Texto("Empresa {n}: {empresa}", h=7, estilo=('B', 12)),
+                    Texto("Período: {adm} a {dem}"),
+                    Se(lambda item: bool(item.atividades),
+                       (Texto("Principais Atividades:", h=6, estilo=('B', 10)),
+                        Marcadores('atividades', '\n'))),
+                    Se(lambda item: bool(item.resultados),
+                       (Texto("Principais Resultados:", h=6, estilo=('B', 10)),
+                        Marcadores('resultados', '\n'))),
+                    Espaco(1),
+                ), cabecalho=(Texto("Tipo de Contrato: CLT", h=7, estilo=('B', 12)),)),
+            ), (Vazio(),)),
+        )),
+    )),
+    Secao("Idiomas", (
+        Grupo('idiomas', (
+            Espaco(1),
+            Texto("Idioma {n}:", h=7, estilo=('B', 11)),
+            Campo("Instituição", 'instituicao', estilo=('', 11), recuo=5),
+            Campo("Idioma", 'nome_idioma', estilo=('', 11), recuo=5),
+            Campo("Nível", 'nivel', formato=lambda nivel: NIVEIS_IDIOMA.get(nivel.upper(), nivel.upper()), estilo=('', 11), recuo=5),
+            Se(lambda item: item.fim.upper() == 'CURSANDO',
+               (Texto("Início: {ini}    |    Situação: Cursando", estilo=('', 11), recuo=5),),
+               (Texto("Início: {ini}    |    Conclusão: {fim}", estilo=('', 11), recuo=5),)),
+        )),
+    )),
+    Secao("Cursos Adicionais", (
+        Se(lambda cv: bool(cv.cursos),
+           (Marcadores('cursos', ',', h=6, estilo=('', 12), quebra_linha=False),),
+           (Vazio(),)),
+    )),
+)
+
+# Códigos das operações compiladas
+OP_LN, OP_TEXTO, OP_MARCADORES, OP_SE, OP_GRUPO, OP_TITULO = range(6)
+
+class _Valores:
+    # Mapeamento para o format_map dos templates: campos do registro e o número do item
+    __slots__ = ('item', 'n')
+
+    def __init__(self, item, n):
+        self.item = item
+        self.n = n
+
+    def __getitem__(self, chave):
+        return self.n if chave == 'n' else getattr(self.item, chave, '')
+
+def _texto_fn(no):
+    if isinstance(no, Texto):
+        template = no.template
+        if '{' not in template:
+            return lambda item, n: template
+        return lambda item, n: template.format_map(_Valores(item, n))
+    rotulo, chave, padrao, formato = no.rotulo, no.chave, no.padrao, no.formato
+    if formato is None:
+        return lambda item, n: f"{rotulo}: {getattr(item, chave) or padrao}"
+    return lambda item, n: f"{rotulo}: {formato(getattr(item, chave) or padrao)}"
+
+def compilar_layout(nos):
+    ops = []
+    for no in nos:
+        if isinstance(no, Secao):
+            ops.append((OP_LN, 4))
+            ops.append((OP_TITULO, 0, 12, ('B', 14), STEELBLUE, no.titulo))
+            ops.extend(compilar_layout(no.itens))
+        elif isinstance(no, (Texto, Campo)):
+            ops.append((OP_TEXTO, no.recuo, no.h, no.estilo, PRETO, _texto_fn(no)))
+        elif isinstance(no, Vazio):
+            # Texto vazio: fonte e cor não importam, então não forçam troca de estado
+            ops.append((OP_TEXTO, 0, no.h, None, None, lambda item, n: ""))
+        elif isinstance(no, Espaco):
+            ops.append((OP_LN, no.h))
+        elif isinstance(no, Marcadores):
+            ops.append((OP_MARCADORES, no.recuo, no.h, no.estilo, PRETO, no.chave, no.separador, no.quebra_linha))
+        elif isinstance(no, Se):
+            ops.append((OP_SE, no.condicao, tuple(compilar_layout(no.entao)), tuple(compilar_layout(no.senao))))
+        elif isinstance(no, Grupo):
+            ops.append((OP_GRUPO, no.chave, tuple(compilar_layout(no.itens)),
+                        tuple(compilar_layout(no.cabecalho)), tuple(compilar_layout(no.vazio))))
+        else:
+            raise TypeError(f"Nó de layout desconhecido: {no!r}")
+    return ops
+
+# Cada seção compilada à parte: os formatos percorrem o documento seção a seção
+SECOES_CV = tuple(tuple(compilar_layout((secao,))) for secao in LAYOUT_CV)
+
+# --- Documento: o layout aplicado a um currículo ---
+# O layout resolvido para um currículo (condições, repetições e templates), sem medir nem
+# desenhar nada: uma tupla de seções, cada uma uma tupla de elementos. É a entrada comum de
+# todos os formatos de saída (PDF, DOCX, HTML e texto, ver formatos.py): montado uma vez por
+# currículo e percorrido seção a seção por cada formato.
+
+# Elementos: (EL_TITULO, h, estilo, cor, texto), (EL_TEXTO, recuo, h, estilo, cor, texto),
+# (EL_MARCADOR, recuo, h, estilo, cor, texto, quebra_linha) e (EL_ESPACO, h). Medidas em mm;
+# estilo = (ênfase, tamanho em pt), None numa linha vazia (assim como a cor).
+EL_TITULO, EL_TEXTO, EL_MARCADOR, EL_ESPACO = range(4)
+
+def _elementos(ops, item, n, saida):
+    for op in ops:
+        codigo = op[0]
+        if codigo == OP_TEXTO:
+            saida.append((EL_TEXTO, op[1], op[2], op[3], op[4], op[5](item, n)))
+        elif codigo == OP_TITULO:
+            saida.append((EL_TITULO, op[2], op[3], op[4], op[5]))
+        elif codigo == OP_MARCADORES:
+            for parte in getattr(item, op[5]).split(op[6]):
+                parte = parte.strip()
+                if parte:
+                    saida.append((EL_MARCADOR, op[1], op[2], op[3], op[4], parte, op[7]))
+        elif codigo == OP_LN:
+            saida.append((EL_ESPACO, op[1]))
+        elif codigo == OP_SE:
+            _elementos(op[2] if op[1](item) else op[3], item, n, saida)
+        else: # OP_GRUPO
+            lista = getattr(item, op[1])
+            if lista:
+                _elementos(op[3], item, n, saida)
+                for i, sub in enumerate(lista, 1):
+                    _elementos(op[2], sub, i, saida)
+            else:
+                _elementos(op[4], item, n, saida)
+
+def documento_cv(cv):
+    """O currículo como documento: uma tupla de elementos por seção do LAYOUT_CV."""
+    secoes = []
+    for ops in SECOES_CV:
+        saida = []
+        _elementos(ops, cv, 0, saida)
+        secoes.append(tuple(saida))
+    return tuple(secoes)
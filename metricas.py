@@ -0,0 +1,239 @@
+import bisect
+import functools
+import logging
+import time
+
+from telegram.ext import ConversationHandler
+from telegram.request import BaseRequest
+
+logger = logging.getLogger(__name__)
+
+# --- Métricas no formato de texto do Prometheus ---
+# Implementação mínima (contador, gauge e histograma) para não depender do prometheus_client.
+# Os rótulos são passados por posição e guardados como tupla: o custo no caminho quente é
+# um perf_counter e algumas operações de dicionário.
+
+REGISTRO = []
+COLETORES = []  # funções chamadas antes de cada exportação (ex: copiar estatísticas do cache)
+
+BALDES_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BALDES_BYTES = (1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072, 262144)
+
+def _formatar_rotulos(nomes, valores, extra=''):
+    pares = [f'{n}="{v}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+class _Metrica:
+    tipo = ''
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self._valores = {}
+        REGISTRO.append(self)
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        for rotulos, valor in sorted(self._valores.items()):
+            linhas.append(f"{self.nome}{_formatar_rotulos(self.rotulos, rotulos)} {valor}")
+        return linhas
+
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, *rotulos, valor=1):
+        self._valores[rotulos] = self._valores.get(rotulos, 0) + valor
+
+
+class Gauge(_Metrica):
+    tipo = 'gauge'
+
+    def set(self, valor, *rotulos):
+        self._valores[rotulos] = valor
+
+
+class Histograma(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), baldes=BALDES_LATENCIA):
+        super().__init__(nome, ajuda, rotulos)
+        self.baldes = tuple(baldes)
+
+    def observar(self, valor, *rotulos):
+        dados = self._valores.get(rotulos)
+        if dados is None:
+            # contagem por balde (não cumulativa; acumulada só na exportação), soma, total
+            dados = self._valores[rotulos] = [[0] * (len(self.baldes) + 1), 0.0, 0]
+        dados[0][bisect.bisect_left(self.baldes, valor)] += 1
+        dados[1] += valor
+        dados[2] += 1
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        for rotulos, (contagens, soma, total) in sorted(self._valores.items()):
+            acumulado = 0
+            for limite, contagem in zip(self.baldes + ('+Inf',), contagens):
+                acumulado += contagem
+                le = _formatar_rotulos(self.rotulos, rotulos, f'le="{limite}"')
+                linhas.append(f"{self.nome}_bucket{le} {acumulado}")
+            base = _formatar_rotulos(self.rotulos, rotulos)
+            linhas.append(f"{self.nome}_sum{base} {soma}")
+            linhas.append(f"{self.nome}_count{base} {total}")
+        return linhas
+
+
+def exportar():
+    for coletor in COLETORES:
+        coletor()
+    linhas = []
+    for metrica in REGISTRO:
+        linhas.extend(metrica.exportar())
+    return '\n'.join(linhas) + '\n'
+
+
+# --- Métricas do bot ---
+handler_duracao = Histograma('bot_handler_duracao_segundos', 'Tempo de execução de cada handler da conversa.', ('handler',))
+validacao_falhas = Contador('bot_validacao_falhas_total', 'Respostas recusadas (a conversa continuou no mesmo estado).', ('handler',))
+funil_entradas = Contador('bot_funil_entradas_total', 'Conversas que chegaram a cada etapa.', ('handler',))
+conversas_finalizadas = Contador('bot_conversas_finalizadas_total', 'Conversas encerradas, pelo handler que as encerrou.', ('handler',))
+conversas_ativas = Gauge('bot_conversas_ativas', 'Conversas em andamento na memória (as ociosas gravadas em disco contam em bot_sessoes).')
+handler_erros = Contador('bot_handler_erros_total', 'Exceções lançadas pelos handlers.', ('handler',))
+pdf_render_segundos = Histograma('bot_pdf_render_segundos', 'Tempo de renderização do PDF no worker.')
+pdf_fila_segundos = Histograma('bot_pdf_fila_segundos', 'Tempo de espera do PDF na fila do pool.')
+pdf_bytes = Histograma('bot_pdf_bytes', 'Tamanho dos PDFs gerados.', baldes=BALDES_BYTES)
+arquivos_gerados = Contador('bot_arquivos_gerados_total', 'Arquivos do currículo renderizados, por formato.', ('formato',))
+telegram_api_segundos = Histograma('telegram_api_duracao_segundos', 'Latência das chamadas à Bot API.', ('metodo',))
+telegram_api_erros = Contador('telegram_api_erros_total', 'Chamadas à Bot API que falharam.', ('metodo',))
+envio_espera_segundos = Histograma('bot_envio_espera_segundos', 'Tempo de espera na fila de envio (limites de taxa).', ('metodo',))
+envio_429 = Contador('bot_envio_429_total', 'Respostas 429 (flood limit) recebidas do Telegram.', ('metodo',))
+sessoes = Gauge('bot_sessoes', 'Sessões (user_data + estado da conversa) na memória e gravadas em disco.', ('local',))
+sessoes_movidas = Contador('bot_sessoes_movidas_total', 'Sessões gravadas em disco, restauradas ou expiradas.', ('acao',))
+fichas = Contador('bot_fichas_total', 'Fichas recebidas pelo caminho rápido (/rapido ou arquivo), por resultado.', ('resultado',))
+shard_fila = Gauge('bot_shard_fila', 'Updates na fila de cada shard, esperando o worker.', ('shard',))
+shard_updates = Contador('bot_shard_updates_total', 'Updates roteados pelo ingresso para cada shard.', ('shard',))
+shard_reinicios = Contador('bot_shard_reinicios_total', 'Workers reiniciados pelo ingresso depois de sair.', ('shard',))
+boot_segundos = Gauge('bot_boot_segundos', 'Duração de cada fase do boot do processo (e o total).', ('fase',))
+
+# ConversationHandlers (por nome; uma Application nova substitui a anterior) cujas conversas
+# vivas viram o bot_conversas_ativas na exportação: o próprio PTB tira a conversa de lá em
+# qualquer saída (fim, /cancel, /editar, ficha, sessão expirada)
+_conversas = {}
+
+def acompanhar_conversas(conversa):
+    _conversas[conversa.name] = conversa
+
+def _coletar_conversas():
+    conversas_ativas.set(sum(len(conversa._conversations) for conversa in _conversas.values()))
+
+COLETORES.append(_coletar_conversas)
+
+def instrumentar(callback, estado, nomes_estados):
+    """Envolve um handler da conversa medindo latência, falhas de validação e o funil."""
+    nome = callback.__name__
+
+    @functools.wraps(callback)
+    async def medido(update, context):
+        inicio = time.perf_counter()
+        try:
+            resultado = await callback(update, context)
+        except Exception:
+            handler_erros.inc(nome)
+            raise
+        finally:
+            handler_duracao.observar(time.perf_counter() - inicio, nome)
+
+        if resultado == ConversationHandler.END:
+            conversas_finalizadas.inc(nome)
+        elif resultado == estado:
+            validacao_falhas.inc(nome)
+        elif resultado in nomes_estados:
+            funil_entradas.inc(nomes_estados[resultado])
+        return resultado
+
+    return medido
+
+
+class LinhaDoTempo:
+    """Fases do boot: cada marcar(fase) fecha a fase com o tempo desde a marca anterior."""
+
+    def __init__(self, inicio):
+        self.inicio = self._ultima = inicio
+        self.fases = {}  # fase -> segundos, na ordem em que terminaram
+
+    def marcar(self, fase, final=False):
+        if fase in self.fases:  # só a primeira vez (a Application pode ser criada de novo, o getUpdates se repete)
+            return
+        agora = time.perf_counter()
+        self.fases[fase] = agora - self._ultima
+        self._ultima = agora
+        boot_segundos.set(round(self.fases[fase], 6), fase)
+        if final:
+            boot_segundos.set(round(self.total(), 6), 'total')
+            logger.info("Boot em %.0f ms: %s", self.total() * 1000, self.resumo())
+
+    def total(self):
+        return self._ultima - self.inicio
+
+    def resumo(self):
+        return ' | '.join(f"{fase} {segundos * 1000:.0f} ms" for fase, segundos in self.fases.items())
+
+
+class RequestMedida(BaseRequest):
+    """Repassa as chamadas da Bot API para outro BaseRequest, medindo a latência por método.
+
+    Com `boot`, o envio do primeiro getUpdates fecha a linha do tempo do boot.
+    """
+
+    def __init__(self, request, boot=None):
+        self.request = request
+        self.boot = boot
+
+    async def initialize(self):
+        await self.request.initialize()
+
+    async def shutdown(self):
+        await self.request.shutdown()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        metodo = url.rsplit('/', 1)[-1]
+        if self.boot is not None and metodo == 'getUpdates':
+            # O bot começou a receber updates (a resposta pode demorar o long polling inteiro)
+            self.boot.marcar('primeiro_getupdates', final=True)
+            self.boot = None
+        inicio = time.perf_counter()
+        try:
+            status, corpo = await self.request.do_request(
+                url, method, request_data, read_timeout=read_timeout, write_timeout=write_timeout,
+                connect_timeout=connect_timeout, pool_timeout=pool_timeout,
+            )
+        except Exception:
+            telegram_api_erros.inc(metodo)
+            raise
+        finally:
+            telegram_api_segundos.observar(time.perf_counter() - inicio, metodo)
+        if status >= 400:
+            telegram_api_erros.inc(metodo)
+        return status, corpo
+
+
+async def iniciar_servidor(host, porta):
+    """Sobe o endpoint /metrics local; devolve o runner do aiohttp para encerrar depois."""
+    from aiohttp import web
+
+    async def metrics(request):
+        return web.Response(text=exportar(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, porta).start()
+    logger.info("Métricas disponíveis em http://%s:%s/metrics", host, porta)
+    return runner
@@ -0,0 +1,103 @@
+from dataclasses import dataclass, field
+
+# --- Modelo do currículo ---
+# Registros com __slots__ no lugar dos dicts aninhados do user_data: cada item ocupa só os
+# ponteiros dos seus campos, sem o dicionário de chaves repetido em cada graduação,
+# experiência e idioma. A forma serializada (para_tupla) é posicional, na ordem dos campos.
+
+@dataclass(slots=True)
+class Graduacao:
+    faculdade: str = ''
+    curso: str = ''
+    situacao: str = ''
+    ano: str = ''
+
+
+@dataclass(slots=True)
+class Experiencia:
+    empresa: str = ''
+    cargo: str = ''
+    adm: str = ''
+    dem: str = ''
+    atividades: str = ''
+    resultados: str = ''
+
+
+@dataclass(slots=True)
+class Idioma:
+    instituicao: str = ''
+    nome_idioma: str = ''
+    nivel: str = ''
+    ini: str = ''
+    fim: str = ''
+
+
+@dataclass(slots=True)
+class Curriculo:
+    nome: str = ''
+    idade: str = ''
+    estado_civil: str = ''
+    telefone: str = ''
+    email: str = ''
+    forma_2grau: str = ''
+    ano_2grau: str = ''
+    graduacoes: list = field(default_factory=list)
+    pos_graduacoes: list = field(default_factory=list)
+    tipo_contrato: str = ''
+    mei_trabalhos: str = ''
+    experiencias: list = field(default_factory=list)
+    idiomas: list = field(default_factory=list)
+    cursos: str = ''
+
+    def para_tupla(self):
+        return tuple(
+            [_campos(item) for item in valor] if campo in LISTAS else valor
+            for campo, valor in zip(CAMPOS_CURRICULO, _campos(self))
+        )
+
+    @classmethod
+    def de_tupla(cls, valores):
+        return cls(*(
+            [LISTAS[campo](*item) for item in valor] if campo in LISTAS else valor
+            for campo, valor in zip(CAMPOS_CURRICULO, valores)
+        ))
+
+    def para_dict(self):
+        return {
+            campo: [dict(zip(item.__slots__, _campos(item))) for item in valor] if campo in LISTAS else valor
+            for campo, valor in zip(CAMPOS_CURRICULO, _campos(self))
+        }
+
+    @classmethod
+    def de_dict(cls, data):
+        """Monta o currículo a partir de um dict no formato do user_data (campos ausentes ficam vazios)."""
+        return cls(**{
+            campo: [_de_dict_item(LISTAS[campo], item) for item in data.get(campo) or ()] if campo in LISTAS
+            else _texto(data.get(campo))
+            for campo in CAMPOS_CURRICULO
+        })
+
+
+CAMPOS_CURRICULO = Curriculo.__slots__
+LISTAS = {'graduacoes': Graduacao, 'pos_graduacoes': Graduacao, 'experiencias': Experiencia, 'idiomas': Idioma}
+
+def _campos(registro):
+    return tuple(getattr(registro, campo) for campo in registro.__slots__)
+
+def _texto(valor):
+    return '' if valor is None else str(valor)
+
+def _de_dict_item(classe, item):
+    return classe(*(_texto(item.get(campo)) for campo in classe.__slots__))
+
+
+# Hooks do json para guardar o currículo dentro do user_data persistido
+def para_json(objeto):
+    if isinstance(objeto, Curriculo):
+        return {'__curriculo__': objeto.para_tupla()}
+    raise TypeError(f"{type(objeto).__name__} não é serializável em JSON")
+
+def de_json(data):
+    if '__curriculo__' in data:
+        return Curriculo.de_tupla(data['__curriculo__'])
+    return data
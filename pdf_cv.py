@@ -0,0 +1,197 @@
+import os
+from collections import OrderedDict
+
+from fpdf import FPDF
+from fpdf.enums import Align, TextEmphasis, XPos, YPos
+from fpdf.line_break import MultiLineBreak
+from fpdf.syntax import PDFContentStream
+
+import fontes
+from layout_cv import (
+    BRANCO, CINZA, DATA_PDF_FIXA, EL_MARCADOR, EL_TEXTO, EL_TITULO, LEFT_MARGIN, PDF_FONTE, PDF_FONTE_DIR,
+    PDF_PERFIL, PERFIS_SAIDA, PRETO, PRODUTOR_PDF, STEELBLUE, TITULO_CV, documento_cv,
+)
+
+# --- PDF Personalizado ---
+# O documento do currículo (layout_cv.documento_cv) desenhado com o fpdf2. É a parte pesada do bot
+# (fpdf2 e fontTools levam centenas de ms para importar): só os processos de render e a
+# geração em lote importam este módulo.
+
+def familia_pdf():
+    return fontes.carregar_familia(PDF_FONTE_DIR, PDF_FONTE) if PDF_FONTE else None
+
+def preparar_fontes():
+    """Lê a fonte e o recorte usado pelo perfil configurado (inicializador dos workers de render)."""
+    familia = familia_pdf()
+    if familia is not None:
+        familia.aquecer(PERFIS_SAIDA[PDF_PERFIL].hinting)
+
+class PDF(FPDF):
+    # Partes fixas do documento (faixa e título do cabeçalho, rodapé e títulos de seção) são
+    # desenhadas com text() em posições calculadas uma vez por processo, em vez de passar
+    # pelo cell(), que refaz medição, alinhamento e quebra de linha a cada página.
+    _posicoes = {}
+
+    def __init__(self, perfil=None):
+        super().__init__()
+        self.perfil = perfil or PERFIS_SAIDA[PDF_PERFIL]
+        if self.perfil.metadados_fixos:
+            self.set_creation_date(DATA_PDF_FIXA)
+            self.set_producer(PRODUTOR_PDF)
+        self._familia = familia_pdf()
+        self.fonte = self._familia.nome if self._familia is not None else 'helvetica'
+
+    def set_font(self, family=None, style='', size=0):
+        familia = self._familia
+        if familia is not None and family == familia.nome:
+            # add_page() repassa o estilo como TextEmphasis; o sublinhado não muda a fonte
+            pedido = TextEmphasis.coerce(style).style
+            estilo = familia.estilos[pedido.replace('U', '')]
+            if family + estilo not in self.fonts:
+                familia.registrar(self, estilo)
+            style = estilo + 'U' if 'U' in pedido else estilo
+        super().set_font(family, style, size)
+
+    def output(self, *args, **kwargs):
+        if self._familia is not None:
+            self._familia.preparar_saida(self, self.perfil.hinting)
+        # O fpdf2 lê o nível de um atributo de classe (interno, ver o pin em requirements.txt): vale
+        # só durante este output, e um render que falha não deixa o nível dele para os seguintes
+        anterior = PDFContentStream._COMPRESSION_LEVEL
+        PDFContentStream._COMPRESSION_LEVEL = self.perfil.compressao
+        try:
+            return super().output(*args, **kwargs)
+        finally:
+            PDFContentStream._COMPRESSION_LEVEL = anterior
+
+    def _posicao_centralizada(self, texto, x0, largura):
+        chave = (texto, self.font_family, self.font_style, self.font_size_pt, x0, largura)
+        x = PDF._posicoes.get(chave)
+        if x is None:
+            x = PDF._posicoes[chave] = x0 + (largura - self.get_string_width(texto)) / 2
+        return x
+
+    def header(self):
+        self.set_fill_color(*STEELBLUE)
+        self.rect(0, 0, self.w, 20, 'F')
+        self.set_font(self.fonte, 'B', 16)
+        self.set_text_color(*BRANCO)
+        # Centralizado na página (o cell() centralizava pela margem esquerda da página atual)
+        x = self._posicao_centralizada(TITULO_CV, 0, self.w)
+        self.text(x, self.t_margin + 5 + 0.3 * self.font_size, TITULO_CV)
+        self.set_y(self.t_margin + 10)
+
+    def footer(self):
+        self.set_font(self.fonte, 'I', 8)
+        self.set_text_color(CINZA)
+        texto = f'Página {self.page_no()}'
+        x = self._posicao_centralizada(texto, self.l_margin, self.w - self.l_margin - self.r_margin)
+        self.text(x, self.h - 10 + 0.3 * self.font_size, texto)
+
+    def titulo_secao(self, titulo, h=12):
+        # Equivale a cell(0, h, titulo) alinhado à esquerda, com a quebra de página automática
+        if self.will_page_break(h):
+            self.add_page()
+        self.text(self.l_margin + self.c_margin, self.y + h / 2 + 0.3 * self.font_size, titulo)
+        self.set_y(self.y + h)
+
+# --- Layout por seção, com cache ---
+# A renderização tem duas fases: _dispor faz a quebra de linha dos elementos do documento (a
+# parte cara, que mede cada trecho de texto) numa lista de linhas prontas, e _desenhar só as
+# coloca na página. A lista de cada seção fica num LRU do processo, pelos elementos da seção:
+# editar uma experiência refaz só a seção de experiências; as outras vêm prontas do cache.
+# O cache é de cada processo de render: o pool leva os PDFs de um usuário ao mesmo processo
+# quando ele está livre (afinidade, ver pool_render.py), mas com ele ocupado ou já trocado
+# (RENDER_MAX_PDFS, RENDER_MAX_RSS_MB) a edição é renderizada inteira.
+PDF_SECOES_CACHE = int(os.getenv("PDF_SECOES_CACHE", "4096"))
+
+# Linhas dispostas: (LINHA, x, h, estilo, cor, texto), (TITULO, h, estilo, cor, texto) e (LN, h)
+LINHA, TITULO, LN = range(3)
+
+_secoes_dispostas = OrderedDict()
+
+def _quebrar(pdf, texto, x):
+    # A quebra de linha do multi_cell(0, h, texto, align='L') a partir de x, só medindo: o
+    # dry_run do fpdf2 desenharia o texto numa página descartada (e escolheria os glifos do
+    # subset fora da ordem de desenho, mudando os bytes do PDF conforme o cache)
+    fragmentos = pdf._preload_font_styles(pdf.normalize_text(texto), False)
+    quebra = MultiLineBreak(fragmentos, pdf.w - pdf.r_margin - x, (pdf.c_margin, pdf.c_margin), align=Align.L)
+    linhas = []
+    linha = quebra.get_line()
+    while linha is not None:
+        linhas.append(''.join(fragmento.string for fragmento in linha.fragments))
+        linha = quebra.get_line()
+    return linhas or ['']
+
+def _dispor(pdf, elementos):
+    saida = []
+    for elemento in elementos:
+        tipo = elemento[0]
+        if tipo == EL_TEXTO:
+            _, recuo, h, estilo, cor, texto = elemento
+            saida.append((LINHA, LEFT_MARGIN + recuo, h, estilo, cor, texto))
+        elif tipo == EL_TITULO:
+            saida.append((TITULO, *elemento[1:]))
+        elif tipo == EL_MARCADOR:
+            _, recuo, h, estilo, cor, texto, quebra_linha = elemento
+            x = LEFT_MARGIN + recuo
+            if quebra_linha:
+                pdf.set_font(pdf.fonte, *estilo)
+                saida.extend((LINHA, x, h, estilo, cor, linha) for linha in _quebrar(pdf, f"- {texto}", x))
+            else:
+                saida.append((LINHA, x, h, estilo, cor, f"- {texto}"))
+        else: # EL_ESPACO
+            saida.append((LN, elemento[1]))
+    return tuple(saida)
+
+def _secao_disposta(pdf, elementos):
+    chave = (pdf.fonte, elementos)
+    linhas = _secoes_dispostas.get(chave)
+    if linhas is not None:
+        _secoes_dispostas.move_to_end(chave)
+        return linhas
+    linhas = _secoes_dispostas[chave] = _dispor(pdf, elementos)
+    if len(_secoes_dispostas) > PDF_SECOES_CACHE:
+        _secoes_dispostas.popitem(last=False)
+    return linhas
+
+def _desenhar(pdf, linhas, estado):
+    # estado = [estilo, cor] atuais do PDF: fonte e cor só são trocadas quando mudam
+    for linha in linhas:
+        tipo = linha[0]
+        if tipo == LN:
+            pdf.ln(linha[1])
+            continue
+        estilo, cor = linha[-3], linha[-2]
+        if estilo is not None and estilo != estado[0]:
+            pdf.set_font(pdf.fonte, *estilo)
+            estado[0] = estilo
+        if cor is not None and cor != estado[1]:
+            pdf.set_text_color(*cor)
+            estado[1] = cor
+        if tipo == TITULO:
+            pdf.titulo_secao(linha[4], linha[1])
+        else:
+            pdf.set_x(linha[1])
+            pdf.cell(0, linha[2], linha[5], new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+def pdf_do_documento(documento, perfil=None):
+    """Desenha um documento de layout_cv.documento_cv; devolve o FPDF pronto para o output()."""
+    pdf = PDF(perfil)
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.set_left_margin(LEFT_MARGIN)
+    # Estado atual de fonte/cor: o header deixa a fonte em B16 e branco
+    pdf.set_font(pdf.fonte, '', 12)
+    pdf.set_text_color(*PRETO)
+    estado = [('', 12), PRETO]
+    for elementos in documento:
+        linhas = _secao_disposta(pdf, elementos)
+        # A quebra de linha de uma seção refeita troca a fonte do PDF para medir; o set_font
+        # seguinte é refeito (e não grava nada se a fonte for a mesma)
+        estado[0] = None
+        _desenhar(pdf, linhas, estado)
+    return pdf
+
+def gerar_pdf(cv, perfil=None):
+    return pdf_do_documento(documento_cv(cv), perfil)
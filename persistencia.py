@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from modelo import de_json, para_json
+
+logger = logging.getLogger(__name__)
+
+# --- Persistência do estado da conversa ---
+# O Application chama update_* a cada update_interval só para os usuários que mudaram.
+# Essas chamadas são apenas enfileiradas em memória e gravadas juntas, numa única transação.
+
+class SQLitePersistence(BasePersistence):
+    """Guarda user_data e estados do ConversationHandler num SQLite em modo WAL.
+
+    O user_data de cada usuário só é lido do disco na primeira mensagem dele depois do restart
+    (refresh_user_data), em vez de carregar a base inteira no boot.
+    """
+
+    def __init__(self, caminho, flush_ms=1000):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=flush_ms / 1000,
+        )
+        self.caminho = caminho
+        self._conn = sqlite3.connect(caminho, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, dados TEXT NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversas (nome TEXT NOT NULL, chave TEXT NOT NULL, estado INTEGER NOT NULL, "
+            "PRIMARY KEY (nome, chave))"
+        )
+        self._carregados = set()
+        self._user_data_pendente = {}  # user_id -> JSON (None = apagar)
+        self._conversas_pendentes = {}  # (nome, chave) -> estado (None = apagar)
+        self._gravacao_agendada = None
+        # Custo de escrita acumulado, para acompanhar o preço por update
+        self.lotes_gravados = 0
+        self.linhas_gravadas = 0
+        self.tempo_gravacao = 0.0
+
+    # --- Leitura ---
+    async def get_user_data(self):
+        # Carregamento preguiçoso: cada usuário é lido em refresh_user_data
+        return {}
+
+    async def refresh_user_data(self, user_id, user_data):
+        if user_id in self._carregados:
+            return
+        self._carregados.add(user_id)
+        row = self._conn.execute("SELECT dados FROM user_data WHERE user_id = ?", (user_id,)).fetchone()
+        if row and not user_data:
+            user_data.update(json.loads(row[0], object_hook=de_json))
+
+    async def get_conversations(self, name):
+        rows = self._conn.execute("SELECT chave, estado FROM conversas WHERE nome = ?", (name,))
+        return {tuple(json.loads(chave)): estado for chave, estado in rows}
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    # --- Escrita (em lote) ---
+    async def update_user_data(self, user_id, data):
+        self._carregados.add(user_id)
+        self._user_data_pendente[user_id] = json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=para_json)
+        self._agendar_gravacao()
+
+    async def drop_user_data(self, user_id):
+        self._carregados.add(user_id)
+        self._user_data_pendente[user_id] = None
+        self._agendar_gravacao()
+
+    async def update_conversation(self, name, key, new_state):
+        self._conversas_pendentes[(name, json.dumps(list(key)))] = new_state
+        self._agendar_gravacao()
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    def _agendar_gravacao(self):
+        # Todas as chamadas de um mesmo update_persistence chegam no mesmo ciclo do loop,
+        # então uma única tarefa agendada grava o lote inteiro.
+        if self._gravacao_agendada is None:
+            self._gravacao_agendada = asyncio.get_running_loop().call_soon(self._gravar_pendentes)
+
+    def _gravar_pendentes(self):
+        self._gravacao_agendada = None
+        if not self._user_data_pendente and not self._conversas_pendentes:
+            return
+        user_data, self._user_data_pendente = self._user_data_pendente, {}
+        conversas, self._conversas_pendentes = self._conversas_pendentes, {}
+
+        inicio = time.perf_counter()
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO user_data (user_id, dados) VALUES (?, ?)",
+                [(uid, dados) for uid, dados in user_data.items() if dados is not None],
+            )
+            self._conn.executemany(
+                "DELETE FROM user_data WHERE user_id = ?",
+                [(uid,) for uid, dados in user_data.items() if dados is None],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO conversas (nome, chave, estado) VALUES (?, ?, ?)",
+                [(nome, chave, estado) for (nome, chave), estado in conversas.items() if estado is not None],
+            )
+            self._conn.executemany(
+                "DELETE FROM conversas WHERE nome = ? AND chave = ?",
+                [(nome, chave) for (nome, chave), estado in conversas.items() if estado is None],
+            )
+        duracao = time.perf_counter() - inicio
+
+        linhas = len(user_data) + len(conversas)
+        self.lotes_gravados += 1
+        self.linhas_gravadas += linhas
+        self.tempo_gravacao += duracao
+        logger.debug("Persistência: %d linhas gravadas em %.2f ms", linhas, duracao * 1000)
+
+    async def flush(self):
+        if self._gravacao_agendada is not None:
+            self._gravacao_agendada.cancel()
+        self._gravar_pendentes()
+        if self.linhas_gravadas:
+            logger.info(
+                "Persistência: %d lotes, %d linhas, %.3f ms por linha",
+                self.lotes_gravados, self.linhas_gravadas, self.tempo_gravacao * 1000 / self.linhas_gravadas,
+            )
+
+
+def criar_persistencia(url, flush_ms=1000):
+    """Cria o backend de persistência a partir de uma URL (ex: sqlite:///dados/bot.db).
+
+    URL vazia desativa a persistência.
+    """
+    if not url:
+        return None
+    esquema, _, caminho = url.partition("://")
+    if esquema == "sqlite":
+        # Mesma convenção do SQLAlchemy: sqlite:///relativo.db e sqlite:////caminho/absoluto.db
+        return SQLitePersistence(caminho[1:] if caminho.startswith("/") else caminho, flush_ms)
+    raise ValueError(f"Backend de persistência não suportado: {esquema}")
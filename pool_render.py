@@ -0,0 +1,289 @@
+import asyncio
+import collections
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metricas
+
+logger = logging.getLogger(__name__)
+
+# --- Pool de renderização pré-aquecido ---
+# Substitui o ProcessPoolExecutor na renderização dos PDFs. O ProcessPoolExecutor cria os processos sob
+# demanda, no primeiro pedido, e cada um paga a importação e o aquecimento (fontes, primeiro
+# PDF) dentro do pedido de um usuário. Aqui os processos sobem junto com o bot e só recebem
+# trabalho depois de rodar `aquecer`; um processo é trocado por outro, também já aquecido,
+# depois de `max_tarefas` tarefas ou quando a memória (RSS) cresce mais de `max_rss_mb` desde o
+# fim do aquecimento (a base não conta o heap herdado do bot pelo fork, que pode sozinho passar
+# do limite: o cache de PDFs, as sessões, o estado do PTB), o que
+# contém a fragmentação do heap de processos de vida longa. Cada processo fala com o pool por
+# um Pipe próprio; a espera pela resposta fica numa thread, fora do loop do asyncio.
+# Afinidade: cada processo ocupa uma vaga (0..workers-1), herdada pelo substituto, e uma
+# tarefa com `afinidade` (o user_id) prefere a vaga dela quando está livre; ocupada, vai para
+# qualquer processo livre (a afinidade nunca faz a tarefa esperar). Os caches do processo
+# (o layout por seção do pdf_cv) servem às renderizações seguintes do mesmo usuário, até
+# o processo ser trocado.
+
+BALDES_TAREFAS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000)
+BALDES_VIDA = (1, 10, 60, 300, 900, 3600, 4 * 3600, 24 * 3600)
+
+workers_estado = metricas.Gauge('bot_render_workers', 'Processos de renderização, prontos ou aquecendo.', ('estado',))
+workers_reciclados = metricas.Contador('bot_render_workers_reciclados_total', 'Processos de renderização trocados, pelo motivo.', ('motivo',))
+workers_tarefas = metricas.Histograma('bot_render_worker_tarefas', 'Tarefas atendidas por processo de renderização, ao longo da vida.', baldes=BALDES_TAREFAS)
+workers_vida = metricas.Histograma('bot_render_worker_vida_segundos', 'Tempo de vida dos processos de renderização.', baldes=BALDES_VIDA)
+workers_aquecimento = metricas.Histograma('bot_render_worker_aquecimento_segundos', 'Tempo de aquecimento de cada processo de renderização.')
+
+
+class WorkerPerdido(Exception):
+    """O processo saiu no meio de uma tarefa (ex: morto pelo OOM killer)."""
+
+
+def rss_mb():
+    """Memória residente anônima do processo (heap, pilhas), sem as páginas de arquivos mapeados.
+
+    O campo "shared" do statm conta as páginas de arquivos (código, bibliotecas), não as páginas
+    anônimas herdadas do pai pelo fork: essas, mesmo ainda compartilhadas, entram na conta.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            campos = f.read().split()
+        return (int(campos[1]) - int(campos[2])) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _principal(conexao, funcao, aquecer):
+    # Corpo de cada processo do pool. O Ctrl+C chega a todo o grupo de processos; quem
+    # encerra o pool é o processo principal.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    inicio = time.perf_counter()
+    if aquecer is not None:
+        aquecer()
+    conexao.send(('pronto', time.perf_counter() - inicio, rss_mb()))
+    while True:
+        try:
+            args = conexao.recv()
+        except EOFError:
+            return
+        if args is None:
+            return
+        try:
+            resultado = funcao(*args)
+        except Exception as e:
+            conexao.send(('erro', e, rss_mb()))
+        else:
+            conexao.send(('ok', resultado, rss_mb()))
+
+
+class _Worker:
+    __slots__ = ('vaga', 'processo', 'conexao', 'iniciado', 'tarefas', 'rss_mb', 'rss_base_mb')
+
+    def __init__(self, vaga, contexto, funcao, aquecer):
+        self.vaga = vaga
+        self.conexao, conexao_filho = contexto.Pipe()
+        self.processo = contexto.Process(target=_principal, args=(conexao_filho, funcao, aquecer), daemon=True)
+        self.processo.start()
+        # Sem esta cópia no pai, a morte do filho vira EOFError no recv
+        conexao_filho.close()
+        self.iniciado = time.monotonic()
+        self.tarefas = 0
+        self.rss_mb = 0.0
+        self.rss_base_mb = 0.0  # rss_mb() logo depois do aquecimento
+
+    def receber(self):
+        try:
+            return self.conexao.recv()
+        except (EOFError, OSError):
+            raise WorkerPerdido(f"o processo {self.processo.pid} saiu (código {self.processo.exitcode})") from None
+
+    def executar(self, args):
+        try:
+            self.conexao.send(args)
+        except OSError:
+            raise WorkerPerdido(f"o processo {self.processo.pid} saiu (código {self.processo.exitcode})") from None
+        return self.receber()
+
+    def encerrar(self, timeout=5):
+        try:
+            self.conexao.send(None)
+        except OSError:
+            pass
+        self.processo.join(timeout)
+        if self.processo.exitcode is None:
+            self.processo.kill()
+            self.processo.join()
+        self.conexao.close()
+
+
+class PoolAquecido:
+    """`workers` processos que rodam `funcao(*args)`, cada um aquecido por `aquecer()` antes da primeira tarefa.
+
+    max_tarefas e max_rss_mb (0 = sem limite) disparam a troca do processo depois da tarefa; max_rss_mb
+    é o crescimento da memória desde o aquecimento, não o total.
+    """
+
+    def __init__(self, workers, funcao, aquecer=None, max_tarefas=0, max_rss_mb=0, contexto=None):
+        self.workers = max(1, workers)
+        self.funcao = funcao
+        self.aquecer = aquecer
+        self.max_tarefas = max_tarefas
+        self.max_rss_mb = max_rss_mb
+        self._contexto = contexto or multiprocessing.get_context()
+        self._livres = None  # vaga -> processo pronto e sem tarefa; criado em iniciar()
+        self._esperando = collections.deque()  # futures de quem espera um processo livre
+        self._aquecendo = set()
+        self._ativos = set()
+        self._tarefas_fundo = set()
+        self._threads = None
+        self.estatisticas = {'iniciados': 0, 'tarefas': 0, 'reciclados_tarefas': 0, 'reciclados_rss': 0,
+                             'perdidos': 0, 'aquecimento_s': 0.0}
+        metricas.COLETORES.append(self._coletar)
+
+    def iniciar(self):
+        """Sobe todos os processos (o aquecimento segue em paralelo); chamado no boot, dentro do loop."""
+        if self._livres is not None:
+            return
+        self._livres = {}
+        # Threads só para esperar as respostas (uma por processo, mais os substitutos aquecendo),
+        # sem disputar o executor padrão do loop
+        self._threads = ThreadPoolExecutor(max_workers=2 * self.workers, thread_name_prefix='pool-render')
+        for vaga in range(self.workers):
+            self._novo_worker(vaga)
+
+    async def aguardar_prontos(self):
+        """Espera o aquecimento de todos os processos iniciados."""
+        while self._aquecendo:
+            await asyncio.sleep(0.01)
+
+    def _novo_worker(self, vaga):
+        worker = _Worker(vaga, self._contexto, self.funcao, self.aquecer)
+        self.estatisticas['iniciados'] += 1
+        self._aquecendo.add(worker)
+        self._em_fundo(self._aguardar_aquecimento(worker))
+
+    def _em_fundo(self, aguardavel):
+        tarefa = asyncio.ensure_future(aguardavel)
+        self._tarefas_fundo.add(tarefa)
+        tarefa.add_done_callback(self._tarefas_fundo.discard)
+
+    async def _aguardar_aquecimento(self, worker):
+        loop = asyncio.get_running_loop()
+        try:
+            _, segundos, worker.rss_mb = await loop.run_in_executor(self._threads, worker.receber)
+            worker.rss_base_mb = worker.rss_mb
+        except WorkerPerdido as e:
+            self._aquecendo.discard(worker)
+            self.estatisticas['perdidos'] += 1
+            logger.error("Processo de renderização falhou no aquecimento: %s", e)
+            await loop.run_in_executor(None, worker.encerrar)
+            await asyncio.sleep(1)
+            self._novo_worker(worker.vaga)
+            return
+        self._aquecendo.discard(worker)
+        self._ativos.add(worker)
+        self.estatisticas['aquecimento_s'] += segundos
+        workers_aquecimento.observar(segundos)
+        logger.info("Processo de renderização %d pronto (aquecimento %.0f ms, %.0f MB)",
+                    worker.processo.pid, segundos * 1000, worker.rss_mb)
+        self._devolver(worker)
+
+    def _devolver(self, worker):
+        self._livres[worker.vaga] = worker
+        self._acordar()
+
+    def _acordar(self):
+        while self._esperando:
+            espera = self._esperando.popleft()
+            if not espera.done():
+                espera.set_result(None)
+                return
+
+    async def _pegar(self, vaga):
+        acordado = False
+        while not self._livres:
+            espera = asyncio.get_running_loop().create_future()
+            # Quem já foi acordado e perdeu a vez volta para o começo da fila
+            if acordado:
+                self._esperando.appendleft(espera)
+            else:
+                self._esperando.append(espera)
+            try:
+                await espera
+            except asyncio.CancelledError:
+                if espera.done() and not espera.cancelled():
+                    self._acordar()  # acordado e cancelado em seguida: a vez passa para o próximo
+                raise
+            acordado = True
+        worker = self._livres.pop(vaga, None)
+        if worker is None:
+            worker = self._livres.pop(next(iter(self._livres)))
+        return worker
+
+    async def executar(self, *args, afinidade=None):
+        """Roda a tarefa num processo livre (e aquecido), de preferência o da vaga de `afinidade`.
+
+        Pode levantar WorkerPerdido.
+        """
+        if self._livres is None:
+            self.iniciar()
+        worker = await self._pegar(None if afinidade is None else hash(afinidade) % self.workers)
+        loop = asyncio.get_running_loop()
+        try:
+            tipo, resultado, worker.rss_mb = await loop.run_in_executor(self._threads, worker.executar, args)
+        except WorkerPerdido:
+            self.estatisticas['perdidos'] += 1
+            self._reciclar(worker, 'perdido')
+            raise
+        worker.tarefas += 1
+        self.estatisticas['tarefas'] += 1
+        if self.max_tarefas and worker.tarefas >= self.max_tarefas:
+            self._reciclar(worker, 'tarefas')
+        elif self.max_rss_mb and worker.rss_mb - worker.rss_base_mb >= self.max_rss_mb:
+            self._reciclar(worker, 'rss')
+        else:
+            self._devolver(worker)
+        if tipo == 'erro':
+            raise resultado
+        return resultado
+
+    def _reciclar(self, worker, motivo):
+        vida = time.monotonic() - worker.iniciado
+        self._ativos.discard(worker)
+        if motivo != 'perdido':
+            self.estatisticas[f'reciclados_{motivo}'] += 1
+        workers_reciclados.inc(motivo)
+        workers_tarefas.observar(worker.tarefas)
+        workers_vida.observar(vida)
+        logger.info("Processo de renderização %d trocado (%s): %d tarefas, %.0f s de vida, %.0f MB",
+                    worker.processo.pid, motivo, worker.tarefas, vida, worker.rss_mb)
+        # O substituto começa a aquecer antes de o antigo terminar de sair, na mesma vaga
+        self._novo_worker(worker.vaga)
+        self._em_fundo(asyncio.get_running_loop().run_in_executor(None, worker.encerrar))
+
+    def _coletar(self):
+        workers_estado.set(len(self._ativos), 'pronto')
+        workers_estado.set(len(self._aquecendo), 'aquecendo')
+
+    def shutdown(self):
+        if self._livres is None:
+            return
+        e = self.estatisticas
+        if e['tarefas']:
+            logger.info("Processos de renderização: %d iniciados, %d tarefas, trocados %d por tarefas e %d por memória, "
+                        "%d perdidos; aquecimento médio %.0f ms", e['iniciados'], e['tarefas'], e['reciclados_tarefas'],
+                        e['reciclados_rss'], e['perdidos'], e['aquecimento_s'] * 1000 / max(1, e['iniciados']))
+        for worker in list(self._ativos) + list(self._aquecendo):
+            worker.encerrar()
+        for tarefa in self._tarefas_fundo:
+            if not tarefa.done():
+                tarefa.cancel()
+        self._ativos.clear()
+        self._aquecendo.clear()
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        self._threads = None
+        self._livres = None
+        self._esperando.clear()
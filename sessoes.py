@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import zlib
+
+import metricas
+from modelo import de_json, para_json
+
+logger = logging.getLogger(__name__)
+
+# --- Ciclo de vida das sessões ---
+# O user_data e o estado do ConversationHandler de quem para de responder ficariam na memória
+# para sempre. Depois de `ocioso` segundos sem mensagens, a sessão é comprimida e gravada em
+# disco (um arquivo por usuário) e sai da memória; depois de `ttl` segundos o arquivo é apagado.
+# Quando o usuário volta, a sessão é restaurada antes do update chegar aos handlers, no mesmo
+# estado em que parou. Sem diretório, as sessões ficam na memória até expirar.
+
+class GerenciadorSessoes:
+    def __init__(self, application, conversas, diretorio, ocioso=900, ttl=3 * 24 * 3600, intervalo=60):
+        self.application = application
+        self.conversas = {conversa.name: conversa for conversa in conversas}
+        self.diretorio = diretorio
+        self.ocioso = ocioso
+        self.ttl = ttl
+        self.intervalo = intervalo
+        self._ultimo_acesso = {}  # user_id -> time.monotonic() da última mensagem (só residentes)
+        self._tarefa = None
+        self.em_disco = 0
+        if diretorio and os.path.isdir(diretorio):
+            self.em_disco = sum(1 for e in os.scandir(diretorio) if e.name.endswith('.sessao'))
+
+    def tocar(self, user_id):
+        self._ultimo_acesso[user_id] = time.monotonic()
+
+    def iniciar(self):
+        if self._tarefa is None:
+            self._tarefa = asyncio.get_running_loop().create_task(self._varrer_sempre())
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+
+    async def _varrer_sempre(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                self.varrer()
+            except Exception:
+                logger.exception("Falha na varredura de sessões ociosas")
+
+    # --- Estado do ConversationHandler ---
+    @staticmethod
+    def _estados(conversa):
+        # Com persistência o PTB usa um TrackingDict; mexer no .data não marca a chave para
+        # gravação, então tirar e devolver a sessão da memória não gera escrita no banco
+        estados = conversa._conversations
+        return getattr(estados, 'data', estados)
+
+    def _conversas_do_usuario(self, usuarios):
+        por_usuario = {}
+        for nome, conversa in self.conversas.items():
+            for chave, estado in self._estados(conversa).items():
+                if chave[-1] in usuarios:
+                    por_usuario.setdefault(chave[-1], []).append([nome, list(chave), estado])
+        return por_usuario
+
+    def _caminho(self, user_id):
+        return os.path.join(self.diretorio, f"{user_id}.sessao")
+
+    # --- Varredura ---
+    def varrer(self):
+        agora = time.monotonic()
+        limite = agora - (self.ocioso if self.diretorio else self.ttl)
+        # Quem tem update em andamento ou user_data ainda não gravado na persistência fica para a próxima
+        ocupados = set(getattr(self.application, '_filas_usuario', ()))
+        if self.application.persistence is not None:
+            ocupados |= self.application._user_ids_to_be_updated_in_persistence
+        ociosos = {uid for uid, visto in self._ultimo_acesso.items() if visto < limite and uid not in ocupados}
+
+        if ociosos:
+            conversas = self._conversas_do_usuario(ociosos)
+            for user_id in ociosos:
+                if self.diretorio:
+                    self._gravar(user_id, conversas.get(user_id, []))
+                else:
+                    self._expirar_residente(user_id, conversas.get(user_id, []))
+        if self.diretorio:
+            self._expirar_em_disco()
+
+        metricas.sessoes.set(len(self.application.user_data), 'memoria')
+        metricas.sessoes.set(self.em_disco, 'disco')
+
+    def _gravar(self, user_id, conversas):
+        dados = {'user_data': self.application.user_data.get(user_id, {}), 'conversas': conversas}
+        try:
+            comprimido = zlib.compress(
+                json.dumps(dados, ensure_ascii=False, separators=(',', ':'), default=para_json).encode('utf-8')
+            )
+            os.makedirs(self.diretorio, exist_ok=True)
+            temporario = self._caminho(user_id) + '.tmp'
+            with open(temporario, 'wb') as f:
+                f.write(comprimido)
+            os.replace(temporario, self._caminho(user_id))
+        except (OSError, TypeError, ValueError):
+            logger.exception("Falha ao gravar a sessão do usuário %s em disco", user_id)
+            return
+        self.application._user_data.pop(user_id, None)
+        for nome, chave, _ in conversas:
+            self._estados(self.conversas[nome]).pop(tuple(chave), None)
+        del self._ultimo_acesso[user_id]
+        self.em_disco += 1
+        metricas.sessoes_movidas.inc('gravada')
+
+    def restaurar(self, user_id):
+        """Devolve a sessão gravada em disco para a memória; False se não havia sessão gravada."""
+        if not self.diretorio or user_id in self.application.user_data:
+            return False
+        caminho = self._caminho(user_id)
+        try:
+            with open(caminho, 'rb') as f:
+                expirada = os.fstat(f.fileno()).st_mtime < time.time() - self.ttl
+                conteudo = f.read()
+            os.remove(caminho)
+        except FileNotFoundError:
+            return False
+        self.em_disco -= 1
+        dados = json.loads(zlib.decompress(conteudo), object_hook=de_json)
+        if expirada:
+            self._marcar_expirada(user_id, dados['conversas'])
+            return False
+
+        self.application._user_data[user_id] = dados['user_data']
+        for nome, chave, estado in dados['conversas']:
+            if nome in self.conversas:
+                self._estados(self.conversas[nome])[tuple(chave)] = estado
+        metricas.sessoes_movidas.inc('restaurada')
+        return True
+
+    # --- Expiração ---
+    def _expirar_residente(self, user_id, conversas):
+        # drop_user_data e o pop no TrackingDict avisam a persistência para apagar também
+        self.application.drop_user_data(user_id)
+        for nome, chave, _ in conversas:
+            self.conversas[nome]._conversations.pop(tuple(chave), None)
+        del self._ultimo_acesso[user_id]
+        metricas.sessoes_movidas.inc('expirada')
+
+    def _expirar_em_disco(self):
+        limite = time.time() - self.ttl
+        try:
+            arquivos = [e for e in os.scandir(self.diretorio) if e.name.endswith('.sessao')]
+        except FileNotFoundError:
+            return
+        for entrada in arquivos:
+            try:
+                if entrada.stat().st_mtime >= limite:
+                    continue
+                conversas = []
+                if self.application.persistence is not None:
+                    with open(entrada.path, 'rb') as f:
+                        conversas = json.loads(zlib.decompress(f.read()))['conversas']
+                os.remove(entrada.path)
+            except (OSError, ValueError, zlib.error):
+                logger.exception("Falha ao expirar a sessão %s", entrada.name)
+                continue
+            self.em_disco -= 1
+            self._marcar_expirada(int(entrada.name[:-len('.sessao')]), conversas)
+
+    def _marcar_expirada(self, user_id, conversas):
+        if self.application.persistence is not None:
+            self.application.drop_user_data(user_id)
+            for nome, chave, _ in conversas:
+                estados = self.conversas[nome]._conversations if nome in self.conversas else None
+                if hasattr(estados, 'mark_as_accessed'):
+                    # Chave ausente + marcada = o PTB manda apagar o estado na persistência
+                    estados.mark_as_accessed(tuple(chave))
+        metricas.sessoes_movidas.inc('expirada')
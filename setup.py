@@ -3,9 +3,13 @@ from setuptools import setup
 setup(
     name="telegram-bot-curriculo",
     version="1.0.0",
-    py_modules=["bot_curriculo"],
+    py_modules=["bot_curriculo", "cache_pdf", "envio", "ficha", "fontes", "formatos", "layout_cv", "metricas", "modelo", "pdf_cv", "persistencia", "pool_render", "sessoes", "shards"],
     install_requires=[
         "python-telegram-bot==20.0",
-        "fpdf2",
+        "fpdf2>=2.8.9,<2.9",
+        "aiohttp",
     ],
+    extras_require={
+        "redis": ["redis>=4.2"],  # fila dos shards no Redis (SHARD_FILA_URL)
+    },
 )
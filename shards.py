@@ -0,0 +1,209 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import queue
+
+from telegram import Update
+
+import metricas
+
+logger = logging.getLogger(__name__)
+
+# --- Shards: um ingresso, N workers ---
+# Um único processo (o ingresso) recebe os updates do Telegram e os distribui por hash
+# consistente do user_id entre N filas, uma por shard; cada worker é um processo com a
+# Application inteira do bot (o mesmo ConversationHandler) consumindo a fila do seu shard.
+# O mesmo usuário cai sempre no mesmo shard, então o estado da conversa só existe num worker
+# e a ordem dos updates de cada usuário é mantida. A fila é uma lista do Redis (ou de um
+# servidor compatível) ou, numa máquina só, uma Queue do multiprocessing no lugar dele.
+#
+# Afinidade depois de reiniciar: o anel depende só do número de shards, e cada shard tem a
+# sua persistência (sqlite:///bot.db -> bot.shard3.db) e o seu diretório de sessões; o worker
+# que volta recebe os mesmos usuários e recarrega o estado deles. Os updates que chegam
+# enquanto ele está fora esperam na fila. Mudar o número de shards move ~1/N dos usuários
+# (o hash consistente mantém o resto no lugar); as conversas em andamento desses recomeçam.
+
+SHARD_VNODES = 256  # pontos de cada shard no anel: com 8 shards, cada um fica a ±7% da média
+
+def _hash(texto):
+    # Estável entre processos e execuções (o hash() do Python muda a cada processo)
+    return int.from_bytes(hashlib.blake2b(texto.encode(), digest_size=8).digest(), 'big')
+
+
+class AnelShards:
+    """Hash consistente: chave (user_id) -> shard."""
+
+    def __init__(self, shards, vnodes=SHARD_VNODES):
+        self.shards = max(1, shards)
+        pontos = sorted((_hash(f"shard{s}#{v}"), s) for s in range(self.shards) for v in range(vnodes))
+        self._pontos = [ponto for ponto, _ in pontos]
+        self._donos = [shard for _, shard in pontos]
+
+    def shard(self, chave):
+        i = bisect.bisect(self._pontos, _hash(str(chave)))
+        return self._donos[i % len(self._donos)]
+
+
+def chave_do_update(data):
+    """user_id do update (JSON da Bot API); sem usuário, o chat; sem os dois, o update_id."""
+    for valor in data.values():
+        if isinstance(valor, dict):
+            usuario = valor.get('from') or valor.get('user')
+            if usuario:
+                return usuario['id']
+            chat = valor.get('chat')
+            if chat:
+                return chat['id']
+    return data.get('update_id', 0)
+
+
+def url_do_shard(url, shard):
+    """sqlite:///curriculos.db -> sqlite:///curriculos.shard2.db (vazio continua vazio)."""
+    if not url:
+        return url
+    raiz, extensao = os.path.splitext(url)
+    return f"{raiz}.shard{shard}{extensao}"
+
+
+# --- Filas ---
+# Interface comum: enviar(shard, itens), receber(shard, maximo, timeout) -> lista e
+# profundidade(shard). Os itens são o JSON do update, em bytes. receber bloqueia (é chamado
+# numa thread do worker) e devolve um lote, para o custo de acordar a thread ser dividido.
+
+class FilaLocal:
+    """Uma Queue do multiprocessing por shard: ingresso e workers na mesma máquina, sem Redis."""
+
+    def __init__(self, shards, contexto):
+        self._filas = [contexto.Queue() for _ in range(shards)]
+
+    def enviar(self, shard, itens):
+        fila = self._filas[shard]
+        for item in itens:
+            fila.put(item)
+
+    def receber(self, shard, maximo, timeout):
+        fila = self._filas[shard]
+        try:
+            lote = [fila.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(lote) < maximo:
+            try:
+                lote.append(fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def profundidade(self, shard):
+        return self._filas[shard].qsize()
+
+
+class FilaRedis:
+    """Uma lista por shard num Redis (ou compatível): LPUSH no ingresso, BRPOP/RPOP nos workers.
+
+    Os updates ficam no servidor: sobrevivem ao reinício do ingresso e dos workers, que podem
+    rodar em máquinas diferentes.
+    """
+
+    def __init__(self, url, prefixo='bot_curriculo:shard:'):
+        import redis
+
+        self.url = url
+        self.prefixo = prefixo
+        self._redis = redis.Redis.from_url(url)
+
+    # Vai para o processo do worker só a configuração; a conexão é aberta lá
+    def __getstate__(self):
+        return {'url': self.url, 'prefixo': self.prefixo}
+
+    def __setstate__(self, estado):
+        self.__init__(**estado)
+
+    def enviar(self, shard, itens):
+        self._redis.lpush(f"{self.prefixo}{shard}", *itens)
+
+    def receber(self, shard, maximo, timeout):
+        chave = f"{self.prefixo}{shard}"
+        item = self._redis.brpop(chave, timeout=max(1, round(timeout)))
+        if item is None:
+            return []
+        lote = [item[1]]
+        if maximo > 1:
+            lote.extend(self._redis.rpop(chave, maximo - 1) or ())
+        return lote
+
+    def profundidade(self, shard):
+        return self._redis.llen(f"{self.prefixo}{shard}")
+
+
+def criar_fila(url, shards, contexto):
+    """Fila dos shards a partir de uma URL (redis://...); vazia, a fila local do multiprocessing."""
+    if not url:
+        return FilaLocal(shards, contexto)
+    esquema = url.partition("://")[0]
+    if esquema in ("redis", "rediss", "unix"):
+        return FilaRedis(url)
+    raise ValueError(f"Fila de shards não suportada: {esquema}")
+
+
+# --- Ingresso ---
+
+class Ingresso:
+    """Roteia os updates para as filas dos shards e exporta a profundidade de cada fila."""
+
+    def __init__(self, fila, shards, fila_max):
+        self.fila = fila
+        self.anel = AnelShards(shards)
+        self.fila_max = fila_max
+        metricas.COLETORES.append(self._coletar)
+
+    def rotear(self, updates):
+        """Põe cada update (dict da Bot API) na fila do shard do usuário, na ordem recebida."""
+        por_shard = {}
+        for data in updates:
+            shard = self.anel.shard(chave_do_update(data))
+            por_shard.setdefault(shard, []).append(json.dumps(data, separators=(',', ':')).encode())
+        for shard, itens in por_shard.items():
+            self.fila.enviar(shard, itens)
+            metricas.shard_updates.inc(str(shard), valor=len(itens))
+
+    def aceitar(self, data):
+        """Roteia um update do webhook; False se a fila do shard dele está cheia (o Telegram reenvia)."""
+        if self.cheio(data):
+            return False
+        self.rotear([data])
+        return True
+
+    def profundidades(self):
+        return [self.fila.profundidade(shard) for shard in range(self.anel.shards)]
+
+    def cheio(self, data=None):
+        """Alguma fila (ou a do shard deste update) chegou ao limite: hora de segurar a entrada."""
+        if data is not None:
+            return self.fila.profundidade(self.anel.shard(chave_do_update(data))) >= self.fila_max
+        return max(self.profundidades()) >= self.fila_max
+
+    def _coletar(self):
+        for shard, profundidade in enumerate(self.profundidades()):
+            metricas.shard_fila.set(profundidade, str(shard))
+
+
+# --- Worker ---
+SHARD_LOTE = 64  # updates tirados da fila por vez
+
+async def consumir(application, fila, shard, parar, pendentes_max):
+    """Loop do worker: passa os updates do shard para a update_queue da Application até `parar`."""
+    loop = asyncio.get_running_loop()
+    while not parar.is_set():
+        # Com a Application atrasada, os updates esperam na fila do shard (visível no ingresso).
+        # pendentes() e não a update_queue: o PTB tira cada update dela na hora, como task
+        vagas = pendentes_max - application.pendentes()
+        if vagas <= 0:
+            await asyncio.sleep(0.01)
+            continue
+        itens = await loop.run_in_executor(None, fila.receber, shard, min(SHARD_LOTE, vagas), 0.5)
+        for item in itens:
+            await application.update_queue.put(Update.de_json(json.loads(item), application.bot))